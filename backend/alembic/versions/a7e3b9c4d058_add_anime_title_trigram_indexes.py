@@ -0,0 +1,44 @@
+"""add trigram indexes on anime titles
+
+Revision ID: a7e3b9c4d058
+Revises: f5c8d2a3e617
+Create Date: 2026-10-19 09:18:03.671420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3b9c4d058'
+down_revision: Union[str, Sequence[str], None] = 'f5c8d2a3e617'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm ships with Postgres contrib and is available on Supabase
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GIN over GiST: faster lookups, slower writes — the catalog is written once a night and read on every keystroke
+    op.create_index(
+        'ix_anime_title_trgm', 'anime', ['title'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_anime_title_english_trgm', 'anime', ['title_english'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'title_english': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_anime_title_english_trgm', table_name='anime')
+    op.drop_index('ix_anime_title_trgm', table_name='anime')
+    # Extension left in place — dropping it would break anything else that came to rely on it
@@ -0,0 +1,40 @@
+"""add taste_compatibility_cache table
+
+Revision ID: a9d3e5f17b28
+Revises: f2b86d3a7c41
+Create Date: 2026-10-18 17:12:40.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e5f17b28'
+down_revision: Union[str, Sequence[str], None] = 'f2b86d3a7c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Starts empty — the first compute_taste_compatibility run fills it
+    op.create_table('taste_compatibility_cache',
+    sa.Column('user_a', sa.UUID(), nullable=False),
+    sa.Column('user_b', sa.UUID(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.CheckConstraint('user_a < user_b', name='ck_taste_compatibility_ordered_pair'),
+    sa.ForeignKeyConstraint(['user_a'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_b'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_a', 'user_b')
+    )
+    op.create_index(op.f('ix_taste_compatibility_cache_user_b'), 'taste_compatibility_cache', ['user_b'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_taste_compatibility_cache_user_b'), table_name='taste_compatibility_cache')
+    op.drop_table('taste_compatibility_cache')
@@ -0,0 +1,37 @@
+"""add mood_tag_vote_changes table
+
+Revision ID: b3e1f4a9c2d7
+Revises: 578a6aad5494
+Create Date: 2026-10-18 09:12:40.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e1f4a9c2d7'
+down_revision: Union[str, Sequence[str], None] = '578a6aad5494'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Change log consumed by incremental aggregate_vibe_tags. Starts empty —
+    # the first full rebuild establishes the baseline, deltas apply on top of it.
+    op.create_table('mood_tag_vote_changes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('anime_id', sa.UUID(), nullable=False),
+    sa.Column('mood_tag_id', sa.UUID(), nullable=False),
+    sa.Column('delta', sa.SmallInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('mood_tag_vote_changes')
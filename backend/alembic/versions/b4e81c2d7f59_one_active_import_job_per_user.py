@@ -0,0 +1,47 @@
+"""one active import job per user
+
+Revision ID: b4e81c2d7f59
+Revises: d7e3b5a18c64
+Create Date: 2026-10-20 10:04:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e81c2d7f59'
+down_revision: Union[str, Sequence[str], None] = 'd7e3b5a18c64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Two POSTs racing past the old SELECT check could leave a user with several active jobs.
+    # Keep the newest, fail the rest the way a restart would, or the index can't be built.
+    op.execute("""
+        UPDATE import_jobs
+        SET status = 'failed',
+            error = 'Import was interrupted by a server restart. Please run it again.',
+            finished_at = now()
+        WHERE status IN ('queued', 'running')
+          AND id NOT IN (
+              SELECT DISTINCT ON (user_id) id
+              FROM import_jobs
+              WHERE status IN ('queued', 'running')
+              ORDER BY user_id, created_at DESC
+          )
+    """)
+    op.create_index(
+        'uq_import_jobs_one_active_per_user', 'import_jobs', ['user_id'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_import_jobs_one_active_per_user', table_name='import_jobs')
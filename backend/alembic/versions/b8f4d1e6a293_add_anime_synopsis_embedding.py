@@ -0,0 +1,38 @@
+"""add anime.synopsis_embedding with hnsw index
+
+Revision ID: b8f4d1e6a293
+Revises: a7e3b9c4d058
+Create Date: 2026-10-19 14:02:37.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f4d1e6a293'
+down_revision: Union[str, Sequence[str], None] = 'a7e3b9c4d058'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable, no default — existing rows stay NULL until python -m app.synopsis_embedding fills them
+    op.add_column('anime', sa.Column('synopsis_embedding', pgvector.sqlalchemy.vector.VECTOR(dim=256), nullable=True))
+    # Built on the empty column, so this is instant; HNSW needs no training step and fills in as rows are embedded
+    op.create_index(
+        'ix_anime_synopsis_embedding_hnsw', 'anime', ['synopsis_embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'synopsis_embedding': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_anime_synopsis_embedding_hnsw', table_name='anime')
+    op.drop_column('anime', 'synopsis_embedding')
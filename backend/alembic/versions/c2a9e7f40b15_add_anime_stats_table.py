@@ -0,0 +1,63 @@
+"""add anime_stats table
+
+Revision ID: c2a9e7f40b15
+Revises: b8f4d1e6a293
+Create Date: 2026-10-19 16:41:52.306718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a9e7f40b15'
+down_revision: Union[str, Sequence[str], None] = 'b8f4d1e6a293'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AXES = ('story', 'art', 'sound', 'characters', 'enjoyment')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('anime_stats',
+    sa.Column('anime_id', sa.UUID(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Float(), nullable=False),
+    *[
+        sa.Column(f'{axis}_{part}', sa.Integer(), nullable=False)
+        for axis in AXES for part in ('count', 'sum')
+    ],
+    sa.Column('histogram', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['anime_id'], ['anime.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('anime_id')
+    )
+
+    # Backfill from existing list entries — same rules as app/anime_stats.py (bucket = half-up rounding, clamped 1-10)
+    bucket = "LEAST(GREATEST(floor(computed_overall + 0.5)::int, 1), 10)"
+    axis_aggregates = ", ".join(
+        f"count(score_{axis}), COALESCE(sum(score_{axis}), 0)" for axis in AXES
+    )
+    histogram = ", ".join(f"count(*) FILTER (WHERE {bucket} = {k})" for k in range(1, 11))
+    op.execute(f"""
+        INSERT INTO anime_stats (
+            anime_id, rating_count, rating_sum,
+            {", ".join(f"{axis}_count, {axis}_sum" for axis in AXES)},
+            histogram, updated_at
+        )
+        SELECT anime_id, count(computed_overall), COALESCE(sum(computed_overall), 0),
+               {axis_aggregates},
+               ARRAY[{histogram}], now()
+        FROM user_anime_relationships
+        WHERE computed_overall IS NOT NULL
+           OR num_nonnulls({", ".join(f"score_{axis}" for axis in AXES)}) > 0
+        GROUP BY anime_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('anime_stats')
@@ -0,0 +1,36 @@
+"""add llm_suggestion_cache table
+
+Revision ID: c61f4b8e2a95
+Revises: a9d3e5f17b28
+Create Date: 2026-10-18 19:04:11.582930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61f4b8e2a95'
+down_revision: Union[str, Sequence[str], None] = 'a9d3e5f17b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_suggestion_cache',
+    sa.Column('input_hash', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('vocabulary', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('labels', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('input_hash')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('llm_suggestion_cache')
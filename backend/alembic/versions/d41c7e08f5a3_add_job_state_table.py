@@ -0,0 +1,35 @@
+"""add job_state table
+
+Revision ID: d41c7e08f5a3
+Revises: b3e1f4a9c2d7
+Create Date: 2026-10-18 11:03:52.907514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7e08f5a3'
+down_revision: Union[str, Sequence[str], None] = 'b3e1f4a9c2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_state',
+    sa.Column('job_id', sa.String(length=100), nullable=False),
+    sa.Column('generation', sa.BigInteger(), nullable=False),
+    sa.Column('checkpoint', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_state')
@@ -0,0 +1,37 @@
+"""add user_profile_summaries table
+
+Revision ID: d7e3b5a18c64
+Revises: c2a9e7f40b15
+Create Date: 2026-10-19 18:12:26.904351
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e3b5a18c64'
+down_revision: Union[str, Sequence[str], None] = 'c2a9e7f40b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # No backfill — a missing row reads as dirty, so each profile is computed on its first view
+    op.create_table('user_profile_summaries',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('computed_version', sa.BigInteger(), nullable=True),
+    sa.Column('summary', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_profile_summaries')
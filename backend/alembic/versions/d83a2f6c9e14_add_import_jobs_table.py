@@ -0,0 +1,48 @@
+"""add import_jobs table
+
+Revision ID: d83a2f6c9e14
+Revises: c61f4b8e2a95
+Create Date: 2026-10-18 20:31:52.114070
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83a2f6c9e14'
+down_revision: Union[str, Sequence[str], None] = 'c61f4b8e2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('import_jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('processed', sa.Integer(), nullable=True),
+    sa.Column('total_in_file', sa.Integer(), nullable=True),
+    sa.Column('imported', sa.Integer(), nullable=True),
+    sa.Column('skipped', sa.Integer(), nullable=True),
+    sa.Column('unmatched_count', sa.Integer(), nullable=True),
+    sa.Column('unmatched_titles', postgresql.ARRAY(sa.String()), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_import_jobs_user_id'), 'import_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_import_jobs_user_id'), table_name='import_jobs')
+    op.drop_table('import_jobs')
@@ -0,0 +1,34 @@
+"""add merge mode to import_jobs
+
+Revision ID: e4b7c1d92f36
+Revises: d83a2f6c9e14
+Create Date: 2026-10-18 22:04:17.539812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7c1d92f36'
+down_revision: Union[str, Sequence[str], None] = 'd83a2f6c9e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # server_default fills existing rows — every import before this was a skip-mode import
+    op.add_column('import_jobs', sa.Column('mode', sa.String(length=10), nullable=False, server_default='skip'))
+    op.add_column('import_jobs', sa.Column('updated', sa.Integer(), nullable=True, server_default='0'))
+    op.add_column('import_jobs', sa.Column('field_changes', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('import_jobs', 'field_changes')
+    op.drop_column('import_jobs', 'updated')
+    op.drop_column('import_jobs', 'mode')
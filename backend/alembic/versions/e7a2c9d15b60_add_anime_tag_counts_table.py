@@ -0,0 +1,51 @@
+"""add anime_tag_counts table
+
+Revision ID: e7a2c9d15b60
+Revises: d41c7e08f5a3
+Create Date: 2026-10-18 13:27:09.441873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c9d15b60'
+down_revision: Union[str, Sequence[str], None] = 'd41c7e08f5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.constants.SYSTEM_USER_ID — migrations never import app code
+SYSTEM_USER_ID = '00000000-0000-0000-0000-000000000001'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('anime_tag_counts',
+    sa.Column('anime_id', sa.UUID(), nullable=False),
+    sa.Column('mood_tag_id', sa.UUID(), nullable=False),
+    sa.Column('real_votes', sa.Integer(), nullable=False),
+    sa.Column('system_votes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['anime_id'], ['anime.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['mood_tag_id'], ['mood_tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('anime_id', 'mood_tag_id')
+    )
+    op.create_index(op.f('ix_anime_tag_counts_mood_tag_id'), 'anime_tag_counts', ['mood_tag_id'], unique=False)
+
+    # Backfill from existing votes
+    op.execute(f"""
+        INSERT INTO anime_tag_counts (anime_id, mood_tag_id, real_votes, system_votes)
+        SELECT anime_id, mood_tag_id,
+               count(*) FILTER (WHERE user_id <> '{SYSTEM_USER_ID}'),
+               count(*) FILTER (WHERE user_id = '{SYSTEM_USER_ID}')
+        FROM user_anime_mood_tags
+        GROUP BY anime_id, mood_tag_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_anime_tag_counts_mood_tag_id'), table_name='anime_tag_counts')
+    op.drop_table('anime_tag_counts')
@@ -0,0 +1,37 @@
+"""add hnsw index on users.taste_vector
+
+Revision ID: f2b86d3a7c41
+Revises: e7a2c9d15b60
+Create Date: 2026-10-18 15:46:21.730958
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b86d3a7c41'
+down_revision: Union[str, Sequence[str], None] = 'e7a2c9d15b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # HNSW over IVFFlat: no training step, so it can be built on an empty or
+    # still-filling table and stays accurate as taste vectors are recomputed daily.
+    # Requires pgvector >= 0.5.0 (Supabase and pgvector/pgvector:pg16 both ship newer).
+    op.create_index(
+        'ix_users_taste_vector_hnsw', 'users', ['taste_vector'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'taste_vector': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_taste_vector_hnsw', table_name='users')
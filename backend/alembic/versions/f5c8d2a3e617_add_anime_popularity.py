@@ -0,0 +1,29 @@
+"""add anime popularity
+
+Revision ID: f5c8d2a3e617
+Revises: e4b7c1d92f36
+Create Date: 2026-10-18 23:12:45.208331
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c8d2a3e617'
+down_revision: Union[str, Sequence[str], None] = 'e4b7c1d92f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL until the next catalog sync fills it in
+    op.add_column('anime', sa.Column('popularity', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('anime', 'popularity')
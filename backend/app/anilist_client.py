@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Shared AniList GraphQL client for list imports (importers.py) and catalog seeding (seed_anime.py).
+# One long-lived connection pool per process instead of a fresh AsyncClient (and TLS handshake) per call,
+# and one rate limiter, so concurrent imports and a seed run share AniList's per-IP budget instead of
+# each assuming they have all of it. Queries and response shaping stay with the callers.
+
+# Overridable so tests and local runs can point at a mock server
+ANILIST_API_URL = os.getenv("ANILIST_API_URL", "https://graphql.anilist.co")
+ANILIST_CONCURRENCY = int(os.getenv("ANILIST_CONCURRENCY", "3"))  # Requests in flight at once, process-wide
+
+# AniList allows 90 requests/minute per IP (temporarily lowered to 30 at times), reported back on
+# every response as X-RateLimit-Limit / X-RateLimit-Remaining. A 429 carries Retry-After.
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+RATE_LIMIT_RESERVE = 5            # Below this many requests left, start spacing requests across the window
+DEFAULT_RATE_LIMIT = 90
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 30.0
+
+_client: Optional[httpx.AsyncClient] = None
+_limiter: Optional["AniListRateLimiter"] = None
+
+
+class AniListError(Exception):
+    """A query that failed for good — rejected by AniList, or retries exhausted.
+    status is AniList's HTTP/GraphQL status (404 = no such user/media), None if AniList was unreachable."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class AniListRateLimiter:
+    """Paces requests from the rate-limit headers AniList sends back.
+    While Remaining is healthy requests go out as fast as the concurrency cap allows; once it drops to
+    RATE_LIMIT_RESERVE, requests are spaced window / limit apart so the budget refills as fast as it's spent.
+    A 429 pauses every caller until its Retry-After has passed.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.slots = asyncio.Semaphore(concurrency or ANILIST_CONCURRENCY)
+        self._spacing = 0.0
+        self._not_before = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._not_before = max(self._not_before, time.monotonic() + seconds)
+
+    def observe(self, response: httpx.Response) -> None:
+        remaining = _int_header(response, "x-ratelimit-remaining")
+        if remaining is None:
+            return
+        if remaining > RATE_LIMIT_RESERVE:
+            self._spacing = 0.0
+            return
+        limit = _int_header(response, "x-ratelimit-limit") or DEFAULT_RATE_LIMIT
+        self._spacing = RATE_LIMIT_WINDOW_SECONDS / limit
+        self.pause(self._spacing)
+
+    async def acquire(self) -> None:
+        # Holding the lock while sleeping keeps waiters FIFO and stops them all waking at once
+        async with self._lock:
+            # Loop, not a single sleep — a 429 elsewhere may push _not_before out while we wait
+            while (delay := self._not_before - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            self._not_before = time.monotonic() + self._spacing
+
+
+def _int_header(response: httpx.Response, name: str) -> Optional[int]:
+    try:
+        return int(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter: uniform in [0, 2^attempt], capped."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, 2 ** attempt))
+
+
+def _error_message(payload: dict) -> tuple[str, Optional[int]]:
+    errors = payload.get("errors") or [{}]
+    return errors[0].get("message") or "AniList query failed", errors[0].get("status")
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=ANILIST_CONCURRENCY, max_keepalive_connections=ANILIST_CONCURRENCY),
+            headers={"Content-Type": "application/json", "Accept": "application/json"},
+        )
+    return _client
+
+
+def get_limiter() -> AniListRateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = AniListRateLimiter()
+    return _limiter
+
+
+async def close_client() -> None:
+    """Called from main.py's lifespan shutdown, and at the end of standalone scripts.
+    The limiter goes too — its asyncio primitives belong to the loop that's ending."""
+    global _client, _limiter
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _limiter = None
+
+
+async def query(graphql: str, variables: dict, max_retries: int = 3) -> dict:
+    """Run one GraphQL query and return its "data". Raises AniListError.
+
+    Every attempt (retries included) waits its turn in the shared limiter and takes one of the
+    ANILIST_CONCURRENCY slots. Retries happen on network errors and RETRYABLE_STATUS, Retry-After
+    winning over computed backoff. Other 4xx and GraphQL errors are raised straight away — resending won't help.
+    """
+    client, limiter = get_client(), get_limiter()
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        wait = None
+        try:
+            async with limiter.slots:
+                response = await client.post(ANILIST_API_URL, json={"query": graphql, "variables": variables})
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            limiter.observe(response)
+            if response.status_code not in RETRYABLE_STATUS:
+                try:
+                    payload = response.json()
+                except ValueError:
+                    raise AniListError(f"Malformed AniList response (HTTP {response.status_code})", response.status_code)
+                if response.status_code >= 400 or payload.get("errors"):
+                    message, status = _error_message(payload)
+                    raise AniListError(message, status or response.status_code)
+                return payload["data"]
+            error = f"HTTP {response.status_code}"
+            wait = _retry_after_seconds(response)
+            if response.status_code == 429:
+                limiter.pause(wait if wait is not None else _backoff(attempt))
+
+        if attempt == max_retries:
+            logger.warning(f"AniList query failed after {max_retries + 1} attempts: {error}")
+            raise AniListError("Could not reach AniList. Try again.")
+        wait = wait if wait is not None else _backoff(attempt)
+        logger.warning(f"AniList query failed (attempt {attempt + 1}), retrying in {wait:.1f}s: {error}")
+        await asyncio.sleep(wait)
+
+
+async def query_many(graphql: str, variables: list[dict]) -> list[dict]:
+    """Run the same query for several variable sets concurrently (e.g. pages 2..N), results in input order.
+    Concurrency and pacing are still governed by the shared limiter. The first failure is raised."""
+    return list(await asyncio.gather(*(query(graphql, v) for v in variables)))
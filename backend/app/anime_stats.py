@@ -0,0 +1,256 @@
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, bindparam, Integer, Float
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# anime_stats — per-anime Arcanum score aggregates, so the detail page reads one row instead of
+# averaging every relationship for the anime on every view.
+#
+# Maintained in the same transaction as every list write:
+#   routers/anime_list.py  — record_entry_change() on add / update / delete
+#   importers.py           — the import's whole change set through apply_entry_changes(), once, just before
+#                            its single commit, so shared anime_stats rows aren't locked for the whole import
+# Every write is one INSERT ... ON CONFLICT DO UPDATE SET x = x + delta — atomic, never read-modify-write
+# in Python, so concurrent list edits on the same anime can't lose an update. Rows are written in anime_id
+# order, so two writers whose change sets overlap lock them in the same order and can't deadlock.
+# rebuild_anime_stats() is the drift safety net (cascade deletes of users and anime bypass the handlers):
+# it finds anime whose row no longer matches user_anime_relationships and recounts only those,
+# without a table lock. It runs daily from scheduler.py.
+#
+# Histogram bucket k (1-10) counts computed_overall in [k - 0.5, k + 0.5), clamped to 1..10.
+# floor(x + 0.5) rather than round(): Postgres' round(double precision) breaks ties platform-dependently.
+
+AXES = ("story", "art", "sound", "characters", "enjoyment")
+HISTOGRAM_BUCKETS = 10
+
+STATS_COLUMNS = (
+    "rating_count", "rating_sum",
+    *(f"{axis}_{part}" for axis in AXES for part in ("count", "sum")),
+    "histogram",
+)
+
+
+_BUCKET = f"LEAST(GREATEST(floor(c.computed_overall + 0.5)::int, 1), {HISTOGRAM_BUCKETS})"
+
+# Aggregates over a change set c(anime_id, sign, computed_overall, score_story, ..., score_enjoyment).
+# sign is +1 for a row's contribution arriving and -1 for one leaving; a full rebuild is all +1.
+_AGGREGATES = ",\n               ".join([
+    "COALESCE(sum(c.sign) FILTER (WHERE c.computed_overall IS NOT NULL), 0)",
+    "COALESCE(sum(c.sign * c.computed_overall), 0)",
+    *(
+        expression
+        for axis in AXES
+        for expression in (
+            f"COALESCE(sum(c.sign) FILTER (WHERE c.score_{axis} IS NOT NULL), 0)",
+            f"COALESCE(sum(c.sign * c.score_{axis}), 0)",
+        )
+    ),
+    "ARRAY[" + ", ".join(
+        f"COALESCE(sum(c.sign) FILTER (WHERE {_BUCKET} = {k}), 0)" for k in range(1, HISTOGRAM_BUCKETS + 1)
+    ) + "]",
+])
+
+# Element-wise histogram addition. ORDER BY ordinality — ARRAY(subquery) has no order without it
+_ADD_HISTOGRAMS = (
+    "ARRAY(SELECT h.a + h.b FROM unnest(anime_stats.histogram, EXCLUDED.histogram) "
+    "WITH ORDINALITY AS h(a, b, i) ORDER BY h.i)"
+)
+
+
+def upsert_stats_sql(changes: str, replace: bool = False) -> str:
+    """INSERT ... ON CONFLICT that folds a change set into anime_stats.
+
+    changes: a FROM item aliased c with columns anime_id, sign, computed_overall, score_<axis> —
+    a subquery, a CTE name or an unnest(). Embeddable as a data-modifying CTE in a larger statement.
+    replace=False adds the deltas to the stored aggregates; replace=True overwrites them (full rebuild).
+    """
+    if replace:
+        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in STATS_COLUMNS)
+        where = (
+            f"WHERE ({', '.join(f'anime_stats.{column}' for column in STATS_COLUMNS)}) "
+            f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{column}' for column in STATS_COLUMNS)})"
+        )
+    else:
+        assignments = ", ".join(
+            f"{column} = anime_stats.{column} + EXCLUDED.{column}" for column in STATS_COLUMNS if column != "histogram"
+        ) + f", histogram = {_ADD_HISTOGRAMS}"
+        where = ""
+    return f"""
+        INSERT INTO anime_stats (anime_id, {", ".join(STATS_COLUMNS)}, updated_at)
+        SELECT c.anime_id,
+               {_AGGREGATES},
+               now()
+        FROM {changes}
+        GROUP BY c.anime_id
+        ORDER BY c.anime_id
+        ON CONFLICT (anime_id) DO UPDATE SET {assignments}, updated_at = now()
+        {where}
+    """
+
+
+class EntryScores(NamedTuple):
+    """The part of a list entry that anime_stats counts."""
+    anime_id: UUID
+    computed_overall: Optional[float]
+    story: Optional[int]
+    art: Optional[int]
+    sound: Optional[int]
+    characters: Optional[int]
+    enjoyment: Optional[int]
+
+    def is_scored(self) -> bool:
+        return any(value is not None for value in self[1:])
+
+
+def entry_scores(entry) -> EntryScores:
+    """Snapshot a UserAnimeRelationship's scores — take it before mutating the entry."""
+    return EntryScores(
+        entry.anime_id, entry.computed_overall,
+        entry.score_story, entry.score_art, entry.score_sound, entry.score_characters, entry.score_enjoyment,
+    )
+
+
+_APPLY_ENTRY_CHANGES = text(upsert_stats_sql(
+    "unnest(:anime_ids, :signs, :overall, :story, :art, :sound, :characters, :enjoyment) "
+    "AS c(anime_id, sign, computed_overall, score_story, score_art, score_sound, score_characters, score_enjoyment)"
+)).bindparams(
+    bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("signs", type_=ARRAY(Integer)),
+    bindparam("overall", type_=ARRAY(Float)),
+    *(bindparam(axis, type_=ARRAY(Integer)) for axis in AXES),
+)
+
+
+def imported_scores(anime_id: UUID, computed_overall: Optional[float]) -> EntryScores:
+    """Imports only ever set computed_overall — the per-axis scores are ours, never touched by an import."""
+    return EntryScores(anime_id, computed_overall, None, None, None, None, None)
+
+
+async def apply_entry_changes(db: AsyncSession, changes: list[tuple[EntryScores, int]]) -> None:
+    """Fold (scores, sign) pairs into anime_stats in one statement — sign +1 for a contribution arriving,
+    -1 for one leaving. Unscored entries may be included; they count for nothing. Caller commits.
+    """
+    changes = [(scores, sign) for scores, sign in changes if scores.is_scored()]
+    if not changes:
+        return
+    await db.execute(_APPLY_ENTRY_CHANGES, {
+        "anime_ids": [scores.anime_id for scores, _ in changes],
+        "signs": [sign for _, sign in changes],
+        "overall": [scores.computed_overall for scores, _ in changes],
+        **{axis: [getattr(scores, axis) for scores, _ in changes] for axis in AXES},
+    })
+
+
+async def record_entry_change(db: AsyncSession, before: Optional[EntryScores], after: Optional[EntryScores]) -> None:
+    """Move anime_stats from an entry's old scores to its new ones. before=None for an add, after=None
+    for a delete. No statement at all when the scores didn't change. Caller commits.
+    """
+    if before == after:
+        return
+    await apply_entry_changes(db, [
+        (scores, sign) for scores, sign in ((before, -1), (after, +1)) if scores is not None
+    ])
+
+
+_SCORE_COLUMNS = ", ".join(f"score_{axis}" for axis in AXES)
+_IS_SCORED = f"(computed_overall IS NOT NULL OR num_nonnulls({_SCORE_COLUMNS}) > 0)"
+
+# Drift check. anime_stats is written in the same transaction as the entries it counts, so inside one
+# snapshot the two agree unless something bypassed the handlers (cascade deletes of users and anime).
+# FULL JOIN ... USING merges anime_id: a row missing on either side is drift. rating_sum is a float built
+# up by additions and subtractions, so it is compared with a tolerance rather than exactly.
+_FIND_DRIFTED_ANIME_STATS = text(f"""
+    SELECT anime_id
+    FROM (
+        SELECT c.anime_id, {_AGGREGATES}
+        FROM (
+            SELECT anime_id, 1 AS sign, computed_overall, {_SCORE_COLUMNS}
+            FROM user_anime_relationships
+            WHERE {_IS_SCORED}
+        ) AS c
+        GROUP BY c.anime_id
+    ) AS fresh(anime_id, {", ".join(STATS_COLUMNS)})
+    FULL JOIN anime_stats AS s USING (anime_id)
+    WHERE fresh.anime_id IS NULL OR s.anime_id IS NULL
+       OR abs(fresh.rating_sum - s.rating_sum) > 1e-6
+       OR ({", ".join(f"fresh.{column}" for column in STATS_COLUMNS if column not in ("rating_sum", "histogram"))},
+           fresh.histogram::int[])
+          IS DISTINCT FROM
+          ({", ".join(f"s.{column}" for column in STATS_COLUMNS if column not in ("rating_sum", "histogram"))},
+           s.histogram)
+    ORDER BY anime_id
+""")
+
+# Correction of a chunk of drifted anime, one transaction:
+#   1. make sure each has a row — ON CONFLICT DO NOTHING waits out a list write inserting the same row
+#   2. lock the rows in anime_id order — list writes on these anime now wait for us, or we wait for their commit
+#   3. recount just these anime and overwrite; 4. drop rows of anime nobody scores any more
+# The lock must come before the recount: an upsert that only blocks on the row lock would keep the
+# aggregates its SELECT read before the wait, and miss the write it waited for.
+_INSERT_MISSING_ANIME_STATS = text(f"""
+    INSERT INTO anime_stats (anime_id, {", ".join(STATS_COLUMNS)}, updated_at)
+    SELECT ids.anime_id,
+           {", ".join(f"array_fill(0, ARRAY[{HISTOGRAM_BUCKETS}])" if column == "histogram" else "0" for column in STATS_COLUMNS)},
+           now()
+    FROM unnest(:anime_ids) AS ids(anime_id)
+    ORDER BY ids.anime_id
+    ON CONFLICT (anime_id) DO NOTHING
+""").bindparams(bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+_LOCK_ANIME_STATS = text("""
+    SELECT 1 FROM anime_stats WHERE anime_id = ANY(:anime_ids) ORDER BY anime_id FOR UPDATE
+""").bindparams(bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+_RECOUNT_ANIME_STATS = text(upsert_stats_sql(
+    f"""(
+        SELECT anime_id, 1 AS sign, computed_overall, {_SCORE_COLUMNS}
+        FROM user_anime_relationships
+        WHERE anime_id = ANY(:anime_ids) AND {_IS_SCORED}
+    ) AS c""",
+    replace=True,
+)).bindparams(bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+_DELETE_UNSCORED_ANIME_STATS = text(f"""
+    DELETE FROM anime_stats AS s
+    WHERE s.anime_id = ANY(:anime_ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM user_anime_relationships
+          WHERE anime_id = s.anime_id AND {_IS_SCORED}
+      )
+""").bindparams(bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+CORRECTION_CHUNK_SIZE = 1000  # Drifted anime per correction transaction
+
+
+async def rebuild_anime_stats() -> None:
+    """Recount anime_stats from user_anime_relationships and fix whatever drifted. No table lock:
+    drift is found by comparing both tables in one REPEATABLE READ snapshot, then only the drifted
+    anime are recounted, under their anime_stats row locks, CORRECTION_CHUNK_SIZE per transaction.
+    List writes on every other anime never wait. Anime nobody scores any more lose their row.
+    """
+    logger.info("Starting anime_stats drift check...")
+    async with AsyncSessionLocal() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        drifted = list((await db.execute(_FIND_DRIFTED_ANIME_STATS)).scalars())
+        await db.commit()
+
+        for start in range(0, len(drifted), CORRECTION_CHUNK_SIZE):
+            params = {"anime_ids": drifted[start:start + CORRECTION_CHUNK_SIZE]}
+            await db.execute(_INSERT_MISSING_ANIME_STATS, params)
+            await db.execute(_LOCK_ANIME_STATS, params)
+            await db.execute(_RECOUNT_ANIME_STATS, params)
+            await db.execute(_DELETE_UNSCORED_ANIME_STATS, params)
+            await db.commit()
+    logger.info(f"anime_stats drift check complete. {len(drifted)} anime corrected.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_anime_stats())
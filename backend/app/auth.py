@@ -1,7 +1,12 @@
+import asyncio
 import bcrypt
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import NamedTuple, Optional
+from uuid import UUID
 import os
 from dotenv import load_dotenv
 
@@ -11,12 +16,42 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+TOKEN_CACHE_SIZE = 10_000        # Verified tokens kept in memory. ~1 entry per active client
+TOKEN_CACHE_TTL_SECONDS = 300    # How long a cached is_active is trusted before the DB is asked again
 
-def verify_password(plain: str, hashed: str) -> bool:
+# bcrypt cost factor for new hashes. Existing hashes at a different cost are upgraded on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Max bcrypt operations running at once. Each one pins a core for ~100-300ms at cost 12,
+# so keep this at or below the cores the container actually gets. Extra requests queue.
+BCRYPT_MAX_WORKERS = int(os.getenv("BCRYPT_MAX_WORKERS", "2"))
+
+# bcrypt releases the GIL while hashing, so plain threads run it in parallel without a process pool.
+# Never call bcrypt directly from a request handler — it blocks the event loop for every other request.
+_password_pool = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+
+def _hash_password_sync(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+def _verify_password_sync(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, _hash_password_sync, password)
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, _verify_password_sync, plain, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    """True if a stored hash was made with a different cost than BCRYPT_ROUNDS.
+    bcrypt hashes look like $2b$12$<salt+hash> — the cost is the second field."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def shutdown_password_pool():
+    _password_pool.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -24,8 +59,75 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
+    claims = decode_token_claims(token)
+    return claims.get("sub") if claims else None
+
+def decode_token_claims(token: str) -> Optional[dict]:
+    """Full signature + expiry check. None if the token is invalid or expired."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+
+class CachedPrincipal(NamedTuple):
+    user_id: UUID
+    exp: float          # Token expiry, unix seconds — from the JWT, never extended
+    is_active: bool
+    checked_at: float   # time.monotonic() of the DB is_active lookup
+
+
+class TokenCache:
+    """Bounded LRU of tokens whose signature has already been verified → CachedPrincipal.
+
+    A hit skips HS256 verification and the is_active query. Entries die at the earliest of:
+    token expiry, TOKEN_CACHE_TTL_SECONDS after the is_active check, LRU eviction, or revoke().
+    Nothing pushes account changes in, so a deactivated user keeps working for up to the TTL.
+
+    In-process only, revocations included: a logout holds on the process that served it and is
+    forgotten on restart. Fine with the single uvicorn process in the Procfile — see DEPLOY.md.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CachedPrincipal] = OrderedDict()
+        # Logged-out tokens → their expiry. A revoked token stays rejected until it would have expired anyway.
+        self._revoked: dict[str, float] = {}
+
+    def get(self, token: str) -> Optional[CachedPrincipal]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        if entry.exp <= time.time() or time.monotonic() - entry.checked_at > self.ttl:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return entry
+
+    def put(self, token: str, user_id: UUID, exp: float, is_active: bool) -> CachedPrincipal:
+        entry = CachedPrincipal(user_id, exp, is_active, time.monotonic())
+        self._entries[token] = entry
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def is_revoked(self, token: str) -> bool:
+        return token in self._revoked
+
+    def revoke(self, token: str, exp: float) -> None:
+        now = time.time()
+        # Prune on write — expired tokens fail signature-time checks on their own
+        for revoked, revoked_exp in list(self._revoked.items()):
+            if revoked_exp <= now:
+                del self._revoked[revoked]
+        self._revoked[token] = exp
+        self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._revoked.clear()
+
+
+token_cache = TokenCache()
\ No newline at end of file
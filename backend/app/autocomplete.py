@@ -0,0 +1,150 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import re
+import unicodedata
+from array import array
+from typing import Optional
+
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models import Anime
+from app.job_state import CATALOG_SYNC_JOB, get_generation
+
+logger = logging.getLogger(__name__)
+
+# In-process title autocomplete for GET /anime/autocomplete — no DB round trip per keystroke.
+#
+# Built from the catalog at startup, then rebuilt whenever catalog_sync lands a new generation
+# (checked every AUTOCOMPLETE_REFRESH_SECONDS — the sync may run in another process). A rebuild happens
+# off the event loop and replaces the module-level index with one assignment, so a request sees either
+# the old index or the new one, never a half-built one. Per process: each uvicorn worker holds its own copy.
+#
+# Matching is word-prefix: "frie" and "sousou no f" both find "Sousou no Frieren". Case, accents and
+# punctuation are ignored. Results come back most popular first.
+# Measured at 50k titles (benchmarks/bench_autocomplete.py): see the numbers in that file's docstring.
+
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "60"))
+AUTOCOMPLETE_MIN_QUERY = 2
+AUTOCOMPLETE_MAX_LIMIT = 20
+# Prefixes this short match thousands of keys, too many to rank per request — their top
+# AUTOCOMPLETE_MAX_LIMIT results are computed once at build time instead
+PRECOMPUTED_PREFIX_LEN = 3
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+_index: Optional["AutocompleteIndex"] = None
+_generation: Optional[int] = None
+_refresher: Optional[asyncio.Task] = None
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents, turn punctuation into spaces: "Re:Zero − Starting Life" → "re zero starting life"."""
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class AutocompleteIndex:
+    """Immutable word-prefix index over anime titles.
+
+    entries are stored most popular first, so an entry's position doubles as its rank: the best
+    results for a prefix are simply the smallest entry numbers among its matching keys.
+    keys holds every word-suffix of every title ("sousou no frieren", "no frieren", "frieren"),
+    sorted, with key_entry the entry each key came from — a prefix lookup is two bisects.
+    """
+
+    __slots__ = ("entries", "keys", "key_entry", "top")
+
+    def __init__(self, rows: list[dict]):
+        # rows: id, title, title_english, cover_url, average_score, popularity
+        self.entries = sorted(rows, key=lambda r: (-(r["popularity"] or 0), r["title"]))
+        pairs = []
+        self.top: dict[str, list[int]] = {}
+        for number, entry in enumerate(self.entries):
+            # Alternative titles slot in here once the catalog stores them
+            for title in {entry["title"], entry["title_english"]} - {None}:
+                words = normalize(title).split()
+                for i in range(len(words)):
+                    key = " ".join(words[i:])
+                    pairs.append((key, number))
+                    # Entries arrive in rank order, so the first AUTOCOMPLETE_MAX_LIMIT distinct
+                    # entries seen for a short prefix are its best results
+                    for length in range(AUTOCOMPLETE_MIN_QUERY, min(len(key), PRECOMPUTED_PREFIX_LEN) + 1):
+                        best = self.top.setdefault(key[:length], [])
+                        if len(best) < AUTOCOMPLETE_MAX_LIMIT and (not best or best[-1] != number):
+                            best.append(number)
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_entry = array("I", (number for _, number in pairs))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, query: str, limit: int) -> list[dict]:
+        prefix = normalize(query)
+        if len(prefix) < AUTOCOMPLETE_MIN_QUERY:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LEN:
+            numbers = self.top.get(prefix, [])[:limit]
+        else:
+            start = bisect.bisect_left(self.keys, prefix)
+            # Every key with this prefix sorts before prefix + the highest code point
+            end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+            numbers = heapq.nsmallest(limit, set(self.key_entry[start:end]))
+        return [self.entries[n] for n in numbers]
+
+
+def current_index() -> Optional[AutocompleteIndex]:
+    return _index
+
+
+async def _load_rows() -> tuple[int, list[dict]]:
+    async with AsyncSessionLocal() as db:
+        # Generation read first: a sync landing mid-read makes the next check rebuild again, never miss it
+        generation = await get_generation(db, CATALOG_SYNC_JOB)
+        result = await db.execute(
+            select(Anime.id, Anime.title, Anime.title_english, Anime.cover_url, Anime.average_score, Anime.popularity)
+        )
+        return generation, [dict(row._mapping) for row in result.all()]
+
+
+async def rebuild_index() -> None:
+    """Load the catalog, build a new index in a worker thread, swap it in."""
+    global _index, _generation
+    generation, rows = await _load_rows()
+    index = await asyncio.to_thread(AutocompleteIndex, rows)
+    _index, _generation = index, generation
+    logger.info(f"Autocomplete index built: {len(index)} titles, {len(index.keys)} keys (catalog generation {generation}).")
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(AUTOCOMPLETE_REFRESH_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                generation = await get_generation(db, CATALOG_SYNC_JOB)
+            if generation != _generation:
+                await rebuild_index()
+        except Exception:
+            # Keep serving the old index — a stale title list beats no autocomplete
+            logger.exception("Autocomplete index refresh failed")
+
+
+async def start_autocomplete() -> None:
+    global _refresher
+    try:
+        await rebuild_index()
+    except Exception:
+        # GET /anime/autocomplete falls back to the DB search until the refresher gets a build through
+        logger.exception("Initial autocomplete index build failed")
+    _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_autocomplete() -> None:
+    if _refresher is not None:
+        _refresher.cancel()
+        await asyncio.gather(_refresher, return_exceptions=True)
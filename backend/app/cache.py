@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class GenerationCache:
+    """In-process cache whose entries belong to one generation of a job's output.
+
+    Entries are never expired by time. The moment a caller presents a newer generation
+    (see job_state.get_generation), everything cached under the old one is dropped.
+    Bounded LRU so unexpected keys can't grow it without limit.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._generation: Optional[int] = None
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, generation: int, key: Hashable) -> Optional[Any]:
+        if generation != self._generation:
+            return None
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, generation: int, key: Hashable, value: Any) -> None:
+        # A slow request that started before a new generation landed must not evict the newer entries
+        if self._generation is not None and generation < self._generation:
+            return
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._generation = None
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+
+from sqlalchemy import tuple_, literal_column, case, or_, null
+from sqlalchemy.dialects.postgresql import insert
+from app import anilist_client
+from app.anilist_client import AniListError
+from app.database import AsyncSessionLocal
+from app.models import Anime
+from app.job_state import CATALOG_SYNC_JOB, bump_generation, get_checkpoint, save_checkpoint
+
+logger = logging.getLogger(__name__)
+
+# Mirrors AniList's anime catalog into our anime table. Replaces the old 500-title seed.
+# Runs nightly from scheduler.py, and standalone (python -m app.catalog_sync, or seed_anime.py for a fresh DB).
+#
+# - Pages through the whole catalog sorted by AniList ID. ID order is stable while a run is in progress:
+#   new titles land at the end, and popularity/score changes don't reshuffle pages we've already read.
+# - Fetches ANILIST_CONCURRENCY pages per wave through the shared client (rate-limit aware, retries).
+# - Each wave is upserted on anilist_id and committed together with the next page number in
+#   job_state.checkpoint, so a crash or deploy resumes from the last committed wave, never skipping one.
+#   A run that completes clears the checkpoint; the next run starts a fresh pass from page 1.
+# - Existing rows are refreshed (scores, episode counts, covers...) rather than skipped, and only
+#   rows that actually changed are written. cached_vibe_tags is ours and never touched by the sync.
+# - A changed synopsis or genre list clears synopsis_embedding; the embedding job that runs after the
+#   sync (app/synopsis_embedding.py) re-embeds exactly those rows.
+# - Bumps the catalog generation with every wave that changed anything — in-process catalog caches key on it.
+
+PER_PAGE = 50               # AniList's maximum page size
+UPSERT_CHUNK_SIZE = 1000    # Rows per INSERT — ~15 params each, well under the 32k bind-parameter limit
+
+# isAdult: false — adult titles are out of scope for the catalog
+CATALOG_QUERY = """
+query ($page: Int, $perPage: Int) {
+  Page(page: $page, perPage: $perPage) {
+    pageInfo {
+      hasNextPage
+    }
+    media(type: ANIME, sort: ID, isAdult: false) {
+      id
+      idMal
+      title {
+        romaji
+        english
+      }
+      description(asHtml: false)
+      coverImage {
+        large
+      }
+      genres
+      episodes
+      averageScore
+      popularity
+      season
+      seasonYear
+    }
+  }
+}
+"""
+
+# Columns the sync owns. Everything else on anime (cached_vibe_tags, created_at) is left alone,
+# apart from synopsis_embedding being cleared when its inputs change.
+SYNCED_COLUMNS = (
+    "mal_id", "title", "title_english", "synopsis", "cover_url", "genres",
+    "episode_count", "average_score", "popularity", "season", "season_year",
+)
+
+
+def media_row(media: dict) -> dict:
+    """One AniList Media object → anime column values."""
+    return {
+        "anilist_id": media["id"],
+        "mal_id": media.get("idMal"),
+        "title": media["title"]["romaji"],
+        "title_english": media["title"].get("english"),
+        "synopsis": media.get("description"),
+        "cover_url": media["coverImage"]["large"] if media.get("coverImage") else None,
+        "genres": media.get("genres") or [],
+        "episode_count": media.get("episodes"),
+        "average_score": media.get("averageScore"),
+        "popularity": media.get("popularity"),
+        "season": media.get("season"),
+        "season_year": media.get("seasonYear"),
+    }
+
+
+async def upsert_anime(db, rows: list[dict]) -> tuple[int, int]:
+    """Insert new titles and refresh changed ones, UPSERT_CHUNK_SIZE rows per statement.
+    Returns (inserted, updated). Unchanged rows are not written at all. Caller commits.
+    """
+    # A title can show up on two pages if the catalog shifted mid-run; ON CONFLICT DO UPDATE
+    # may only touch a row once per statement, so keep one copy
+    rows = list({row["anilist_id"]: row for row in rows}.values())
+    inserted = updated = 0
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+        stmt = insert(Anime).values([{**row, "cached_vibe_tags": {}} for row in chunk])
+        embedding_stale = or_(
+            Anime.synopsis.is_distinct_from(stmt.excluded.synopsis),
+            Anime.genres.is_distinct_from(stmt.excluded.genres),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Anime.anilist_id],
+            set_={
+                **{column: stmt.excluded[column] for column in SYNCED_COLUMNS},
+                "synopsis_embedding": case((embedding_stale, null()), else_=Anime.synopsis_embedding),
+            },
+            where=tuple_(*(Anime.__table__.c[column] for column in SYNCED_COLUMNS)).is_distinct_from(
+                tuple_(*(stmt.excluded[column] for column in SYNCED_COLUMNS))
+            ),
+        ).returning(literal_column("xmax = 0"))  # xmax = 0 only on a freshly inserted row version
+        result = await db.execute(stmt)
+        flags = result.scalars().all()
+        inserted += sum(flags)
+        updated += len(flags) - sum(flags)
+    return inserted, updated
+
+
+async def sync_catalog(max_pages: int | None = None) -> dict:
+    """Sync the AniList catalog into anime, resuming from the last checkpoint if a previous run was cut short.
+    max_pages caps this run (e.g. a quick local seed); the checkpoint is kept so the next run carries on.
+    Returns {"pages", "inserted", "updated"} for this run.
+    """
+    pages = inserted = updated = 0
+    async with AsyncSessionLocal() as db:
+        checkpoint = await get_checkpoint(db, CATALOG_SYNC_JOB)
+        page = checkpoint["next_page"] if checkpoint else 1
+        if page > 1:
+            logger.info(f"Resuming catalog sync from page {page}.")
+
+        finished = False
+        while not finished and (max_pages is None or pages < max_pages):
+            wave_size = anilist_client.ANILIST_CONCURRENCY
+            if max_pages is not None:
+                wave_size = min(wave_size, max_pages - pages)
+            try:
+                wave = await anilist_client.query_many(
+                    CATALOG_QUERY, [{"page": p, "perPage": PER_PAGE} for p in range(page, page + wave_size)]
+                )
+            except AniListError as e:
+                # Checkpoint already points at this wave — the next run retries it
+                logger.error(f"Catalog sync stopped at page {page}: {e}")
+                break
+
+            rows = []
+            for data in wave:
+                rows.extend(media_row(media) for media in data["Page"]["media"])
+                page += 1
+                pages += 1
+                if not data["Page"]["pageInfo"]["hasNextPage"]:
+                    finished = True
+                    break
+
+            wave_inserted, wave_updated = await upsert_anime(db, rows)
+            inserted += wave_inserted
+            updated += wave_updated
+            # Checkpoint and generation go in the same transaction as the rows they cover —
+            # a run that dies after this commit has still announced what it changed
+            await save_checkpoint(db, CATALOG_SYNC_JOB, None if finished else {"next_page": page})
+            if wave_inserted or wave_updated:
+                await bump_generation(db, CATALOG_SYNC_JOB)
+            await db.commit()
+            logger.info(f"Catalog sync: {pages} pages, {inserted} new, {updated} refreshed so far.")
+
+    logger.info(
+        f"Catalog sync {'complete' if finished else 'paused'} at page {page}. "
+        f"{inserted} new, {updated} refreshed."
+    )
+    return {"pages": pages, "inserted": inserted, "updated": updated}
+
+
+async def _main():
+    logging.basicConfig(level=logging.INFO)
+    try:
+        await sync_catalog()
+    finally:
+        await anilist_client.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import update
+from app.database import AsyncSessionLocal
+from app.models import ImportJob
+from app.importers import ImportFailed, import_mal_file, import_anilist_user
+
+logger = logging.getLogger(__name__)
+
+# Background execution for list imports. POST /import/* only validates, stores the input and enqueues;
+# IMPORT_WORKERS coroutines started in main.py's lifespan run the imports one job each.
+# In-process on purpose — same single uvicorn process as APScheduler, no broker to run.
+# The queue is not durable: anything queued or running when the process stops is marked failed
+# on next startup (fail_orphaned_jobs) and the user simply re-runs it.
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))  # Imports running at once. Each holds one DB connection
+IMPORT_QUEUE_SIZE = 50                                   # Waiting jobs beyond this get a 503
+# MAL uploads are copied here so the job can read them after the request has finished
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "arcanum-imports")
+
+ACTIVE_STATUSES = ("queued", "running")  # Mirrored by the partial unique index uq_import_jobs_one_active_per_user
+
+_queue: Optional[asyncio.Queue] = None
+_workers: list[asyncio.Task] = []
+
+
+class ImportQueueFull(Exception):
+    pass
+
+
+def upload_path(job_id: UUID) -> str:
+    return os.path.join(UPLOAD_DIR, f"{job_id}.xml")
+
+
+async def _update_job(job_id: UUID, **values) -> None:
+    """Progress/status writes use their own short session — the import's own transaction
+    stays uncommitted until the very end, so progress can't be written through it."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+        await db.commit()
+
+
+async def _run_job(job_id: UUID, user_id: UUID, source: str, payload: str, merge: bool) -> None:
+    await _update_job(job_id, status="running", started_at=datetime.now(timezone.utc))
+
+    async def on_progress(progress: dict):
+        await _update_job(job_id, **progress)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            if source == "mal":
+                with open(payload, "rb") as f:
+                    result = await import_mal_file(db, user_id, f, on_progress, merge)
+            else:
+                result = await import_anilist_user(db, user_id, payload, on_progress, merge)
+        await _update_job(job_id, status="completed", finished_at=datetime.now(timezone.utc), **result)
+        logger.info(f"Import {job_id} ({source}) completed: {result['imported']} imported.")
+    except ImportFailed as e:
+        await _update_job(job_id, status="failed", error=str(e), finished_at=datetime.now(timezone.utc))
+    except Exception:
+        logger.exception(f"Import {job_id} ({source}) crashed")
+        await _update_job(
+            job_id, status="failed", error="Import failed unexpectedly. Please try again.",
+            finished_at=datetime.now(timezone.utc),
+        )
+    finally:
+        if source == "mal":
+            try:
+                os.remove(payload)
+            except FileNotFoundError:
+                pass
+
+
+async def _worker(n: int) -> None:
+    while True:
+        job = await _queue.get()
+        try:
+            await _run_job(*job)
+        except Exception:
+            # _run_job records its own failures; this only fires if even that DB write failed
+            logger.exception(f"Import worker {n} could not record job {job[0]}")
+        finally:
+            _queue.task_done()
+
+
+def enqueue_import(job_id: UUID, user_id: UUID, source: str, payload: str, merge: bool = False) -> None:
+    """payload: the upload path for "mal", the AniList username for "anilist". Raises ImportQueueFull."""
+    try:
+        _queue.put_nowait((job_id, user_id, source, payload, merge))
+    except asyncio.QueueFull:
+        raise ImportQueueFull()
+
+
+async def fail_orphaned_jobs() -> None:
+    """Jobs queued or running when the process last stopped will never finish — say so, and drop their uploads."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(ImportJob)
+            .where(ImportJob.status.in_(ACTIVE_STATUSES))
+            .values(
+                status="failed",
+                error="Import was interrupted by a server restart. Please run it again.",
+                finished_at=datetime.now(timezone.utc),
+            )
+        )
+        await db.commit()
+    if result.rowcount:
+        logger.warning(f"Marked {result.rowcount} interrupted import jobs as failed.")
+    if os.path.isdir(UPLOAD_DIR):
+        for name in os.listdir(UPLOAD_DIR):
+            os.remove(os.path.join(UPLOAD_DIR, name))
+
+
+async def start_import_workers() -> None:
+    global _queue
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    await fail_orphaned_jobs()
+    _queue = asyncio.Queue(maxsize=IMPORT_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_worker(n)) for n in range(IMPORT_WORKERS))
+    logger.info(f"Import workers started ({IMPORT_WORKERS}).")
+
+
+async def stop_import_workers() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,561 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text, bindparam, Integer, Float, Text, DateTime
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
+from app.models import Anime, WatchStatus
+from uuid import UUID, uuid4
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Awaitable, BinaryIO, Callable, Iterator, Optional
+from xml.etree.ElementTree import ParseError
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import iterparse
+from fastapi.concurrency import run_in_threadpool
+from app import anilist_client
+from app.anilist_client import AniListError
+from app.anime_stats import EntryScores, apply_entry_changes, imported_scores
+from app.profile_summary import mark_profile_dirty
+
+# List imports (MAL XML, AniList) — parsing, matching and the shared write path.
+# Runs inside background import jobs (app/import_jobs.py), never inside a request.
+# import_mal_file / import_anilist_user own their transaction; bulk_insert_list_entries leaves the commit to the caller.
+
+IMPORT_CHUNK_SIZE = 1000      # Entries parsed, matched and inserted per round — bounds import memory
+UNMATCHED_TITLES_KEPT = 20    # Unmatched titles reported back. The count is always exact.
+
+MAL_STATUS_MAP = {
+    "Completed": WatchStatus.completed,
+    "Watching": WatchStatus.watching,
+    "Plan to Watch": WatchStatus.plan_to_watch,
+    "Dropped": WatchStatus.dropped,
+    "On-Hold": WatchStatus.on_hold,
+}
+
+ANILIST_STATUS_MAP = {
+    "COMPLETED": WatchStatus.completed,
+    "CURRENT": WatchStatus.watching,
+    "PLANNING": WatchStatus.plan_to_watch,
+    "DROPPED": WatchStatus.dropped,
+    "PAUSED": WatchStatus.on_hold,
+    "REPEATING": WatchStatus.watching,
+}
+
+ANILIST_QUERY = """
+query ($username: String, $page: Int) {
+  MediaListCollection(userName: $username, type: ANIME, chunk: $page, perChunk: 500) {
+    lists {
+      entries {
+        mediaId
+        status
+        score(format: POINT_10)
+        progress
+        startedAt { year month day }
+        completedAt { year month day }
+        repeat
+        updatedAt
+        media {
+          title { romaji }
+        }
+      }
+    }
+    hasNextChunk
+  }
+}
+"""
+
+
+
+class ImportFailed(Exception):
+    """Import can't go ahead — the message is shown to the user as-is."""
+
+
+# Called after every chunk with running counters: processed, total_in_file (None until known),
+# imported, updated, skipped, unmatched_count, field_changes. Lets the job record progress for GET /import/jobs/{id}.
+ProgressCallback = Callable[[dict], Awaitable[None]]
+
+
+def parse_anilist_date(date_obj: dict | None) -> datetime | None:
+    """Parse AniList date object {year, month, day} into datetime."""
+    if not date_obj or not date_obj.get("year"):
+        return None
+    try:
+        return datetime(date_obj["year"], date_obj["month"] or 1, date_obj["day"] or 1)
+    except (ValueError, TypeError):
+        return None
+    
+def parse_date(date_str: str):
+    """Returns None if date is 0000-00-00 or invalid."""
+    if not date_str or date_str == "0000-00-00":
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _mal_entry(anime) -> dict | None:
+    """One <anime> element → entry dict. None if it has no id or status."""
+    def get(tag):
+        el = anime.find(tag)
+        return el.text.strip() if el is not None and el.text else None
+
+    mal_id = get("series_animedb_id")
+    status = get("my_status")
+    score = get("my_score")
+    watched_eps = get("my_watched_episodes")
+    rewatch_count = get("my_times_watched")
+    title = get("series_title")
+
+    if not mal_id or not status:
+        return None
+
+    return {
+        "mal_id": int(mal_id),
+        "title": title,
+        "status": MAL_STATUS_MAP.get(status),
+        "score": int(score) if score and score != "0" else None,
+        "watched_eps": int(watched_eps) if watched_eps else None,
+        "start_date": parse_date(get("my_start_date")),
+        "finish_date": parse_date(get("my_finish_date")),
+        "rewatch_count": int(rewatch_count) if rewatch_count else 0,
+        "updated_at": None,  # MAL exports carry no per-entry timestamp
+    }
+
+def iter_mal_entries(source: BinaryIO) -> Iterator[dict]:
+    """Stream-parse a MAL XML export from a file object, yielding one entry dict per <anime>.
+
+    defusedxml's iterparse keeps the entity-expansion and external-entity protection of fromstring,
+    but never builds the whole tree: each <anime> is cleared from the root as soon as it's read,
+    so memory stays flat no matter how large the export is.
+    Raises ValueError if this isn't a MAL export.
+    """
+    root = None
+    saw_anime = False
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            # Sanity check — verify this is actually a MAL export before reading any further
+            if root is None:
+                root = elem
+                if root.tag != "myanimelist":
+                    raise ValueError("This doesn't appear to be a MAL export file")
+            continue
+        if elem.tag == "anime":
+            saw_anime = True
+            entry = _mal_entry(elem)
+            root.clear()  # Drop every processed child — <myinfo> and the <anime> just read
+            if entry:
+                yield entry
+    if not saw_anime:
+        raise ValueError("This doesn't appear to be a MAL export file")
+
+def next_chunk(entries: Iterator[dict], size: int) -> list[dict]:
+    """Pull up to `size` entries off the stream. Empty list = end of file.
+    Called through run_in_threadpool — XML parsing is CPU work and must not block the event loop."""
+    return list(islice(entries, size))
+
+
+# One statement per batch, whatever its size: every column travels as one array parameter and
+# unnest() turns them back into rows — no 32k bind-parameter ceiling like multi-row VALUES.
+# ON CONFLICT DO NOTHING skips anime already on the list (and repeats within the batch),
+# RETURNING tells us exactly which rows went in — no pre-fetch of the user's list needed —
+# and the scores they brought, for the import's anime_stats change set.
+_BULK_INSERT_LIST_ENTRIES = text("""
+    INSERT INTO user_anime_relationships (
+        id, user_id, anime_id, status, currently_watching_ep,
+        date_started, date_completed, computed_overall, rewatch_count, created_at, updated_at
+    )
+    SELECT v.id, :user_id, v.anime_id, CAST(v.status AS watchstatus), v.ep,
+           v.started, v.completed, v.overall, v.rewatch, now(), now()
+    FROM unnest(:ids, :anime_ids, :statuses, :eps, :started, :completed, :overall, :rewatch)
+        AS v(id, anime_id, status, ep, started, completed, overall, rewatch)
+    ON CONFLICT (user_id, anime_id) DO NOTHING
+    RETURNING anime_id, computed_overall
+""").bindparams(
+    bindparam("user_id", type_=PG_UUID(as_uuid=True)),
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("statuses", type_=ARRAY(Text)),
+    bindparam("eps", type_=ARRAY(Integer)),
+    bindparam("started", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("completed", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("overall", type_=ARRAY(Float)),
+    bindparam("rewatch", type_=ARRAY(Integer)),
+)
+
+
+def _list_entry_params(user_id: UUID, rows: list[dict]) -> dict:
+    """Column arrays for the unnest() in the insert/merge statements."""
+    return {
+        "user_id": user_id,
+        "ids": [uuid4() for _ in rows],
+        "anime_ids": [row["anime_id"] for row in rows],
+        "statuses": [row["status"].name for row in rows],
+        "eps": [row["watched_eps"] for row in rows],
+        "started": [row["start_date"] for row in rows],
+        "completed": [row["finish_date"] for row in rows],
+        # TODO: add score_source enum (multi_axis, imported_mal, imported_anilist)
+        # so stats page can distinguish real multi-axis scores from imported single scores
+        "overall": [None if row["score"] is None else float(row["score"]) for row in rows],
+        "rewatch": [row["rewatch_count"] or 0 for row in rows],
+    }
+
+
+async def bulk_insert_list_entries(
+    db: AsyncSession, user_id: UUID, rows: list[dict]
+) -> tuple[int, int, list[tuple[EntryScores, int]]]:
+    """Insert matched import entries into the user's list in one round trip.
+
+    rows: dicts with anime_id, status (WatchStatus), watched_eps, start_date, finish_date, score, rewatch_count.
+    Returns (inserted, skipped, score_changes) — counts as seen by the DB, skipped = already on the list or
+    repeated in rows. score_changes is for apply_entry_changes(); applying it is left to the caller.
+    """
+    if not rows:
+        return 0, 0, []
+    inserted = (await db.execute(_BULK_INSERT_LIST_ENTRIES, _list_entry_params(user_id, rows))).all()
+    score_changes = [(imported_scores(anime_id, overall), +1) for anime_id, overall in inserted]
+    return len(inserted), len(rows) - len(inserted), score_changes
+
+
+# Merge mode (opt-in): anime already on the list are updated from the import instead of skipped.
+# Still one statement per batch. Conflict rules, all enforced inside the statement:
+#   - Newer wins: an entry whose source timestamp (AniList updatedAt) is older than our row's
+#     updated_at is left alone — the user has edited it here since. MAL exports have no timestamps;
+#     choosing merge with a fresh export is taken as "the export is newer".
+#   - Multi-axis scores are never overwritten: if any score_* axis is set, computed_overall is theirs
+#     to derive, and the imported single score is ignored for that row.
+#   - Missing values never erase: a NULL progress/date/score in the import keeps ours.
+#     rewatch_count only goes up.
+#   - Rows that would not change are not written at all — no dead tuples, no updated_at bump, no feed noise.
+# Per-field change counts come from comparing RETURNING (after) with the `before` CTE — every part of
+# one statement sees the same snapshot, so `before` still holds the pre-merge values.
+MERGED_FIELDS = ("status", "progress", "date_started", "date_completed", "score", "rewatch_count")
+
+_BULK_MERGE_LIST_ENTRIES = text("""
+    WITH incoming AS (
+        -- ON CONFLICT DO UPDATE may touch a row only once per statement: keep the last copy of a repeat
+        SELECT DISTINCT ON (v.anime_id) v.*
+        FROM unnest(:ids, :anime_ids, :statuses, :eps, :started, :completed, :overall, :rewatch, :source_updated)
+            WITH ORDINALITY AS v(id, anime_id, status, ep, started, completed, overall, rewatch, source_updated, ord)
+        ORDER BY v.anime_id, v.ord DESC
+    ),
+    before AS (
+        SELECT r.anime_id, r.status, r.currently_watching_ep, r.date_started, r.date_completed,
+               r.computed_overall, r.rewatch_count, r.updated_at
+        FROM user_anime_relationships r
+        JOIN incoming i ON i.anime_id = r.anime_id
+        WHERE r.user_id = :user_id
+    ),
+    merged AS (
+        INSERT INTO user_anime_relationships AS r (
+            id, user_id, anime_id, status, currently_watching_ep,
+            date_started, date_completed, computed_overall, rewatch_count, created_at, updated_at
+        )
+        SELECT i.id, :user_id, i.anime_id, CAST(i.status AS watchstatus), i.ep,
+               i.started, i.completed, i.overall, i.rewatch, now(), now()
+        FROM incoming i
+        LEFT JOIN before b ON b.anime_id = i.anime_id
+        -- Newer wins
+        WHERE b.anime_id IS NULL OR i.source_updated IS NULL OR i.source_updated > b.updated_at
+        ON CONFLICT (user_id, anime_id) DO UPDATE SET
+            status = EXCLUDED.status,
+            currently_watching_ep = COALESCE(EXCLUDED.currently_watching_ep, r.currently_watching_ep),
+            date_started = COALESCE(EXCLUDED.date_started, r.date_started),
+            date_completed = COALESCE(EXCLUDED.date_completed, r.date_completed),
+            computed_overall = CASE
+                WHEN num_nonnulls(r.score_story, r.score_art, r.score_sound, r.score_characters, r.score_enjoyment) > 0
+                THEN r.computed_overall
+                ELSE COALESCE(EXCLUDED.computed_overall, r.computed_overall)
+            END,
+            rewatch_count = GREATEST(EXCLUDED.rewatch_count, r.rewatch_count),
+            updated_at = now()
+        WHERE (r.status, r.currently_watching_ep, r.date_started, r.date_completed, r.computed_overall, r.rewatch_count)
+            IS DISTINCT FROM (
+                EXCLUDED.status,
+                COALESCE(EXCLUDED.currently_watching_ep, r.currently_watching_ep),
+                COALESCE(EXCLUDED.date_started, r.date_started),
+                COALESCE(EXCLUDED.date_completed, r.date_completed),
+                CASE
+                    WHEN num_nonnulls(r.score_story, r.score_art, r.score_sound, r.score_characters, r.score_enjoyment) > 0
+                    THEN r.computed_overall
+                    ELSE COALESCE(EXCLUDED.computed_overall, r.computed_overall)
+                END,
+                GREATEST(EXCLUDED.rewatch_count, r.rewatch_count)
+            )
+        -- xmax = 0 only on a freshly inserted row version
+        RETURNING r.anime_id, (r.xmax = 0) AS inserted, r.status, r.currently_watching_ep,
+                  r.date_started, r.date_completed, r.computed_overall, r.rewatch_count
+    ),
+    -- anime_stats moves by each row's score change: the new score in, the old one (if any) out.
+    -- Returned as arrays, not applied here — the import applies its whole change set once, at the end
+    score_changes AS (
+        SELECT m.anime_id, 1 AS sign, m.computed_overall
+        FROM merged m LEFT JOIN before b ON b.anime_id = m.anime_id
+        WHERE m.inserted OR m.computed_overall IS DISTINCT FROM b.computed_overall
+        UNION ALL
+        SELECT b.anime_id, -1, b.computed_overall
+        FROM merged m JOIN before b ON b.anime_id = m.anime_id
+        WHERE NOT m.inserted AND m.computed_overall IS DISTINCT FROM b.computed_overall
+    )
+    SELECT
+        count(*) FILTER (WHERE m.inserted) AS inserted,
+        count(*) FILTER (WHERE NOT m.inserted) AS updated,
+        count(*) FILTER (WHERE NOT m.inserted AND m.status IS DISTINCT FROM b.status) AS status,
+        count(*) FILTER (WHERE NOT m.inserted AND m.currently_watching_ep IS DISTINCT FROM b.currently_watching_ep) AS progress,
+        count(*) FILTER (WHERE NOT m.inserted AND m.date_started IS DISTINCT FROM b.date_started) AS date_started,
+        count(*) FILTER (WHERE NOT m.inserted AND m.date_completed IS DISTINCT FROM b.date_completed) AS date_completed,
+        count(*) FILTER (WHERE NOT m.inserted AND m.computed_overall IS DISTINCT FROM b.computed_overall) AS score,
+        count(*) FILTER (WHERE NOT m.inserted AND m.rewatch_count IS DISTINCT FROM b.rewatch_count) AS rewatch_count,
+        (SELECT array_agg(anime_id ORDER BY anime_id, sign) FROM score_changes WHERE computed_overall IS NOT NULL)
+            AS change_anime_ids,
+        (SELECT array_agg(sign ORDER BY anime_id, sign) FROM score_changes WHERE computed_overall IS NOT NULL)
+            AS change_signs,
+        (SELECT array_agg(computed_overall ORDER BY anime_id, sign) FROM score_changes WHERE computed_overall IS NOT NULL)
+            AS change_scores
+    FROM merged m
+    LEFT JOIN before b ON b.anime_id = m.anime_id
+""").bindparams(
+    bindparam("user_id", type_=PG_UUID(as_uuid=True)),
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("anime_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("statuses", type_=ARRAY(Text)),
+    bindparam("eps", type_=ARRAY(Integer)),
+    bindparam("started", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("completed", type_=ARRAY(DateTime(timezone=True))),
+    bindparam("overall", type_=ARRAY(Float)),
+    bindparam("rewatch", type_=ARRAY(Integer)),
+    bindparam("source_updated", type_=ARRAY(DateTime(timezone=True))),
+)
+
+
+async def bulk_merge_list_entries(db: AsyncSession, user_id: UUID, rows: list[dict]) -> dict:
+    """Insert new entries and merge changed ones into existing rows, in one round trip.
+
+    rows: as for bulk_insert_list_entries, plus updated_at (source timestamp or None).
+    Returns {"inserted", "updated", "skipped", "field_changes": {field: rows changed}, "score_changes"} —
+    skipped = unchanged, older than ours, or repeated in rows. score_changes as for bulk_insert_list_entries.
+    """
+    if not rows:
+        return {
+            "inserted": 0, "updated": 0, "skipped": 0,
+            "field_changes": dict.fromkeys(MERGED_FIELDS, 0), "score_changes": [],
+        }
+    result = await db.execute(_BULK_MERGE_LIST_ENTRIES, {
+        **_list_entry_params(user_id, rows),
+        "source_updated": [row.get("updated_at") for row in rows],
+    })
+    counts = result.one()._mapping
+    return {
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+        "skipped": len(rows) - counts["inserted"] - counts["updated"],
+        "field_changes": {field: counts[field] for field in MERGED_FIELDS},
+        "score_changes": [
+            (imported_scores(anime_id, overall), sign)
+            for anime_id, sign, overall in zip(
+                counts["change_anime_ids"] or [], counts["change_signs"] or [], counts["change_scores"] or []
+            )
+        ],
+    }
+
+
+class _ImportTally:
+    """Running counters for one import. Keeps only the first UNMATCHED_TITLES_KEPT unmatched titles."""
+
+    def __init__(self):
+        self.processed = 0
+        self.total_in_file: Optional[int] = None
+        self.imported = 0
+        self.updated = 0   # Merge mode only
+        self.skipped = 0
+        self.field_changes: Optional[dict[str, int]] = None  # Merge mode only
+        self.unmatched_count = 0
+        self.unmatched_titles: list[str] = []
+        # anime_stats deltas of every chunk so far — applied once, just before the import commits.
+        # Not part of as_dict(): never reported, never stored on the job
+        self.score_changes: list[tuple[EntryScores, int]] = []
+
+    def unmatched(self, title: Optional[str]) -> None:
+        self.unmatched_count += 1
+        if len(self.unmatched_titles) < UNMATCHED_TITLES_KEPT and title:
+            self.unmatched_titles.append(title)
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "total_in_file": self.total_in_file,
+            "imported": self.imported,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "field_changes": self.field_changes,
+            "unmatched_count": self.unmatched_count,
+            "unmatched_titles": self.unmatched_titles,
+        }
+
+
+async def _import_chunk(
+    db: AsyncSession, user_id: UUID, chunk: list[dict], id_column, id_key: str, tally: _ImportTally,
+    merge: bool = False,
+) -> None:
+    """Match one chunk of parsed entries to our catalog and bulk insert (or merge) them. 2 DB calls per chunk."""
+    # --- Bulk fetch per chunk: anime matching this chunk's external IDs ---
+    external_ids = [e[id_key] for e in chunk]
+    anime_result = await db.execute(
+        select(Anime.id, id_column).where(id_column.in_(external_ids))
+    )
+    anime_id_by_external_id = {external_id: anime_id for anime_id, external_id in anime_result.all()}
+
+    # --- Pure Python loop — no DB calls inside ---
+    rows = []
+    for entry in chunk:
+        if entry["status"] is None:
+            continue
+
+        anime_id = anime_id_by_external_id.get(entry[id_key])
+        if not anime_id:
+            tally.unmatched(entry["title"])
+            continue
+
+        rows.append({**entry, "anime_id": anime_id})
+
+    # --- One statement per chunk — already-listed anime are skipped, or merged in merge mode ---
+    if merge:
+        counts = await bulk_merge_list_entries(db, user_id, rows)
+        tally.imported += counts["inserted"]
+        tally.updated += counts["updated"]
+        tally.skipped += counts["skipped"]
+        tally.field_changes = {
+            field: (tally.field_changes or {}).get(field, 0) + changed
+            for field, changed in counts["field_changes"].items()
+        }
+        tally.score_changes.extend(counts["score_changes"])
+    else:
+        imported, skipped, score_changes = await bulk_insert_list_entries(db, user_id, rows)
+        tally.imported += imported
+        tally.skipped += skipped
+        tally.score_changes.extend(score_changes)
+    tally.processed += len(chunk)
+
+
+async def _finish_import(db: AsyncSession, user_id: UUID, tally: _ImportTally) -> None:
+    """Shared-row writes go last, then the import's one commit. anime_stats rows are shared with every
+    other list writer: touching them here, not per chunk, holds their row locks for one statement and a
+    commit instead of the whole import.
+    """
+    await apply_entry_changes(db, tally.score_changes)
+    if tally.imported or tally.updated:
+        await mark_profile_dirty(db, user_id)
+    await db.commit()
+
+
+async def import_mal_file(
+    db: AsyncSession, user_id: UUID, source: BinaryIO, on_progress: Optional[ProgressCallback] = None,
+    merge: bool = False,
+) -> dict:
+    """Import a MAL XML export from an open file into the user's list.
+
+    Streams the file: entries are parsed IMPORT_CHUNK_SIZE at a time and each chunk is
+    matched and bulk inserted before the next is read. Peak memory is one chunk, not one file.
+    DB calls: 2 per chunk (match, insert) — never per entry. Inserted/skipped counts come from
+    the INSERT ... ON CONFLICT DO NOTHING RETURNING itself (see bulk_insert_list_entries).
+    One commit at the end, so a bad file halfway through imports nothing.
+    merge: update anime already on the list instead of skipping them (see _BULK_MERGE_LIST_ENTRIES).
+    """
+    tally = _ImportTally()
+    entries = iter_mal_entries(source)
+    while True:
+        try:
+            chunk = await run_in_threadpool(next_chunk, entries, IMPORT_CHUNK_SIZE)
+        except (ValueError, ParseError, DefusedXmlException) as e:
+            await db.rollback()
+            raise ImportFailed(str(e) if isinstance(e, ValueError) else "Could not parse MAL export file")
+        if not chunk:
+            break
+        await _import_chunk(db, user_id, chunk, Anime.mal_id, "mal_id", tally, merge)
+        if on_progress:
+            await on_progress(tally.as_dict())
+
+    if not tally.processed:
+        raise ImportFailed("No anime entries found in file")
+
+    await _finish_import(db, user_id, tally)
+    tally.total_in_file = tally.processed
+    return tally.as_dict()
+
+
+def _anilist_entries(collection: dict) -> list[dict]:
+    entries = []
+    for lst in collection["lists"]:
+        for entry in lst["entries"]:
+            status = ANILIST_STATUS_MAP.get(entry["status"])
+            if not status:
+                continue
+            score = entry.get("score")
+            entries.append({
+                "anilist_id": entry["mediaId"],
+                "title": entry["media"]["title"]["romaji"],
+                "status": status,
+                "score": int(score) if score and score > 0 else None,
+                "watched_eps": entry.get("progress"),
+                "start_date": parse_anilist_date(entry.get("startedAt")),
+                "finish_date": parse_anilist_date(entry.get("completedAt")),
+                "rewatch_count": entry.get("repeat") or 0,
+                "updated_at": datetime.fromtimestamp(entry["updatedAt"], timezone.utc) if entry.get("updatedAt") else None,
+            })
+    return entries
+
+
+async def fetch_anilist_entries(username: str) -> list[dict]:
+    """Fetch all entries from AniList GraphQL API.
+    Uses pagination (chunks of 500) to handle large lists.
+    AniList IDs match our anilist_id column directly — no ID mapping needed.
+    Unlike MAL import, no file parsing required — API returns structured JSON.
+
+    MediaListCollection doesn't say how many chunks there are, so chunk 1 goes alone (most lists
+    fit in it) and later chunks are fetched ANILIST_CONCURRENCY at a time. A wave can overshoot the
+    end by a few empty chunks — cheaper than fetching a 5000-entry list one chunk after another.
+    """
+    def variables(page: int) -> dict:
+        return {"username": username, "page": page}
+
+    try:
+        collections = [(await anilist_client.query(ANILIST_QUERY, variables(1)))["MediaListCollection"]]
+        page = 2
+        while collections[-1]["hasNextChunk"]:
+            wave = await anilist_client.query_many(
+                ANILIST_QUERY, [variables(p) for p in range(page, page + anilist_client.ANILIST_CONCURRENCY)]
+            )
+            for data in wave:
+                collections.append(data["MediaListCollection"])
+                if not collections[-1]["hasNextChunk"]:
+                    break
+            page += len(wave)
+    except AniListError as e:
+        if e.status == 404:
+            raise ImportFailed(f"AniList user '{username}' not found.")
+        if e.status is None:
+            raise ImportFailed(str(e))
+        raise ImportFailed(f"AniList rejected the request: {e}")
+
+    return [entry for collection in collections for entry in _anilist_entries(collection)]
+
+
+async def import_anilist_user(
+    db: AsyncSession, user_id: UUID, username: str, on_progress: Optional[ProgressCallback] = None,
+    merge: bool = False,
+) -> dict:
+    """Import anime list directly from AniList using username.
+    Uses anilist_id for matching — direct lookup, no ID mapping needed.
+    Same chunked match-then-insert as MAL, one commit at the end.
+    """
+    entries = await fetch_anilist_entries(username)
+    if not entries:
+        raise ImportFailed("No anime entries found for this AniList user.")
+
+    tally = _ImportTally()
+    tally.total_in_file = len(entries)
+    for start in range(0, len(entries), IMPORT_CHUNK_SIZE):
+        await _import_chunk(db, user_id, entries[start:start + IMPORT_CHUNK_SIZE], Anime.anilist_id, "anilist_id", tally, merge)
+        if on_progress:
+            await on_progress(tally.as_dict())
+
+    await _finish_import(db, user_id, tally)
+    return tally.as_dict()
@@ -0,0 +1,58 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from app.models import JobState
+from datetime import datetime, timezone
+from typing import Optional
+
+# Job IDs match the APScheduler job ids in scheduler.py
+VIBE_AGGREGATION_JOB = "aggregate_vibe_tags"
+CATALOG_SYNC_JOB = "sync_catalog"
+# No APScheduler job of its own — runs inside the nightly sync_catalog job, keeps only a checkpoint here
+SYNOPSIS_EMBEDDING_JOB = "embed_synopses"
+
+
+async def get_generation(db: AsyncSession, job_id: str) -> int:
+    """Current generation for a job. 0 if the job has never landed data.
+    Single primary key lookup — cheap enough to run on every request.
+    """
+    result = await db.execute(
+        select(JobState.generation).where(JobState.job_id == job_id)
+    )
+    return result.scalar() or 0
+
+
+async def bump_generation(db: AsyncSession, job_id: str) -> None:
+    """Increment a job's generation. Call inside the transaction that commits the job's output,
+    so readers never see the new generation before the new data. Caller commits.
+    """
+    stmt = insert(JobState).values(job_id=job_id, generation=1, updated_at=datetime.now(timezone.utc))
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[JobState.job_id],
+            set_={"generation": JobState.generation + 1, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+
+
+async def get_checkpoint(db: AsyncSession, job_id: str) -> Optional[dict]:
+    """Resume state a job saved with save_checkpoint. None if it has none (never ran, or finished cleanly)."""
+    result = await db.execute(
+        select(JobState.checkpoint).where(JobState.job_id == job_id)
+    )
+    return result.scalar()
+
+
+async def save_checkpoint(db: AsyncSession, job_id: str, checkpoint: Optional[dict]) -> None:
+    """Store (or with None, clear) a job's resume state. Call inside the transaction that commits
+    the work the checkpoint covers, so a crash can never skip past uncommitted data. Caller commits.
+    """
+    stmt = insert(JobState).values(
+        job_id=job_id, generation=0, checkpoint=checkpoint, updated_at=datetime.now(timezone.utc)
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[JobState.job_id],
+            set_={"checkpoint": stmt.excluded.checkpoint, "updated_at": stmt.excluded.updated_at},
+        )
+    )
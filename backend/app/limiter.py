@@ -1,4 +1,6 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+import os
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+# RATE_LIMIT_ENABLED=false is for local load tests only (benchmarks/) — never set it in Railway
+limiter = Limiter(key_func=get_remote_address, enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false")
\ No newline at end of file
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Shared plumbing for background jobs that call the Anthropic Messages API (currently llm_suggest.py).
+# Prompts and response parsing stay in the job — this module only knows how to send a request politely.
+
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+# Overridable so tests and local runs can point at a stub server
+ANTHROPIC_API_URL = os.getenv("ANTHROPIC_API_URL", "https://api.anthropic.com/v1/messages")
+LLM_MODEL = "claude-haiku-4-5-20251001"
+
+# Org rate limits for the model tier we're on. Keep a little under the real limits —
+# the bucket is only an estimate and the API has the final say (429 + retry-after).
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "45"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "45000"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}  # 529 = API overloaded
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity`, refills at rate_per_minute / 60 per second.
+    acquire(n) waits until n units are available, so callers are paced rather than rejected.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        # A single request bigger than the bucket would wait forever — let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        # Holding the lock while sleeping keeps waiters FIFO — nobody jumps the queue with a small request
+        async with self._lock:
+            self._refill()
+            while self._available < amount:
+                await asyncio.sleep((amount - self._available) / self.rate)
+                self._refill()
+            self._available -= amount
+
+
+class LLMRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets, plus a shared pause.
+    A 429 on one in-flight call pauses every caller until its retry-after has passed.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough input + output token count for the TPM bucket. ~4 characters per token for English."""
+    return len(prompt) // 4 + max_tokens
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None  # HTTP-date form — never sent by the Anthropic API, fall back to backoff
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter: uniform in [0, 2^attempt], capped."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, 2 ** attempt))
+
+
+async def create_message(
+    client: httpx.AsyncClient,
+    prompt: str,
+    max_tokens: int,
+    limiter: Optional[LLMRateLimiter] = None,
+    max_retries: int = 3,
+    label: str = "",
+) -> Optional[str]:
+    """Send one single-turn Messages API request. Returns the text of the first content block,
+    or None once retries are exhausted or the request is rejected outright.
+
+    Every attempt (retries included) goes through the limiter. Retries happen on network errors
+    and RETRYABLE_STATUS. A retry-after header wins over computed backoff, and a 429 pauses the
+    whole limiter so the other workers back off too. Other 4xx are not retried — resending won't help.
+    """
+    estimated = estimate_tokens(prompt, max_tokens)
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            await limiter.acquire(estimated)
+
+        wait = None
+        try:
+            response = await client.post(
+                ANTHROPIC_API_URL,
+                headers={
+                    "x-api-key": ANTHROPIC_API_KEY or "",
+                    "anthropic-version": "2023-06-01",
+                    "content-type": "application/json",
+                },
+                json={
+                    "model": LLM_MODEL,
+                    "max_tokens": max_tokens,
+                    "messages": [{"role": "user", "content": prompt}],
+                },
+                timeout=30.0,
+            )
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if response.status_code < 400:
+                try:
+                    return response.json()["content"][0]["text"].strip()
+                except (ValueError, KeyError, IndexError) as e:
+                    logger.warning(f"Malformed API response for {label}: {e}")
+                    return None
+            if response.status_code not in RETRYABLE_STATUS:
+                logger.warning(f"API call for {label} rejected with {response.status_code}: {response.text[:200]}")
+                return None
+            error = f"HTTP {response.status_code}"
+            wait = _retry_after_seconds(response)
+            if response.status_code == 429 and limiter is not None:
+                limiter.pause(wait if wait is not None else _backoff(attempt))
+
+        if attempt == max_retries:
+            logger.warning(f"API call failed for {label} after {max_retries + 1} attempts: {error}")
+            return None
+        wait = wait if wait is not None else _backoff(attempt)
+        logger.warning(f"API call failed for {label} (attempt {attempt + 1}), retrying in {wait:.1f}s: {error}")
+        await asyncio.sleep(wait)
+    return None
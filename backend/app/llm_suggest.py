@@ -3,23 +3,35 @@ import json
 import os
 import httpx
 import re
+import time
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, cast, exists, String, Text
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, ARRAY
 from app.database import AsyncSessionLocal
-from app.models import Anime, MoodTag, UserAnimeMoodTag
+from app.models import Anime, MoodTag, UserAnimeMoodTag, AnimeTagCount, LLMSuggestionCache
 from uuid import UUID
 import logging
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from app.constants import SYSTEM_USER_ID
+from app.tag_votes import add_votes
+from app.llm_client import LLMRateLimiter, create_message, LLM_MODEL
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 MIN_CONFIRMED_TAGS = 3  # Skip anime that already have 3+ confirmed community tags
 MAX_ANIME_PER_RUN = 150 # Process top 150 by popularity per run
 COMMIT_BATCH_SIZE = 25  # Commit every N anime to avoid 150 individual commits
+LLM_CONCURRENCY = int(os.getenv("LLM_SUGGEST_CONCURRENCY", "4"))  # Max API calls in flight
+# Anime per request. The 65-tag vocabulary is most of every prompt, so K anime per call pays for it
+# once instead of K times. 1 = original one-anime-per-call mode.
+LLM_BATCH_SIZE = int(os.getenv("LLM_SUGGEST_BATCH_SIZE", "8"))
+TOKENS_PER_ANIME_ANSWER = 80  # max_tokens budget per anime in a batch — 2-6 short labels plus JSON keys
+# Bump when the prompt wording changes in a way that should invalidate every cached answer
+PROMPT_VERSION = 1
 
 
 async def get_all_tag_labels(db: AsyncSession) -> list[str]:
@@ -29,120 +41,307 @@ async def get_all_tag_labels(db: AsyncSession) -> list[str]:
     )
     return result.scalars().all()
 
-async def get_anime_needing_suggestions(db: AsyncSession) -> list[Anime]:
+# Content address of everything the model sees about an anime, plus model and prompt version — the
+# llm_suggestion_cache key. Same inputs → same key, whichever run or batch the anime lands in.
+# Computed in SQL so get_anime_needing_suggestions can look the cache up while picking anime; jsonb's
+# text form is canonical, and genres are sorted so AniList reordering them doesn't change the key.
+# The vocabulary is deliberately not part of the key — see cached_labels.
+_genre = func.unnest(Anime.genres).column_valued("genre")
+SUGGESTION_CACHE_KEY = func.encode(
+    func.sha256(func.convert_to(cast(func.jsonb_build_array(
+        PROMPT_VERSION, LLM_MODEL, Anime.title, Anime.title_english,
+        func.coalesce(
+            select(func.jsonb_agg(aggregate_order_by(_genre, _genre.collate("C")))).scalar_subquery(),
+            func.jsonb_build_array(),
+        ),
+        func.left(func.coalesce(Anime.synopsis, ""), 500),
+    ), Text), "UTF8")),
+    "hex",
+).label("cache_key")
+
+
+def cached_labels(entry: LLMSuggestionCache, all_tags: list[str]) -> Optional[list[str]]:
+    """Labels from a cache entry if it's still valid for the current vocabulary, else None.
+    Tags removed since the answer → still valid, removed labels are filtered out.
+    Tags added or renamed since → invalid: the model never got to consider the new ones.
+    So a vocabulary change only invalidates answers that could actually differ.
+    """
+    current = set(all_tags)
+    if not current <= set(entry.vocabulary):
+        return None
+    return [label for label in entry.labels if label in current]
+
+
+async def get_anime_needing_suggestions(db: AsyncSession, all_tags: list[str]) -> list[tuple[Anime, str]]:
     """Fetch anime with fewer than MIN_CONFIRMED_TAGS real community votes
-    AND no existing system user tags.
+    AND no existing system user tags, each with its SUGGESTION_CACHE_KEY.
     Excludes anime already tagged by system user — prevents re-processing same anime every run.
-    Ordered by average_score desc — suggest for popular anime first.
+    Also excludes anime whose cached answer is still valid for all_tags but names none of them:
+    serving it writes no system vote, so without this they'd be picked again every run and crowd
+    the popular anime still needing an answer out of MAX_ANIME_PER_RUN.
+    Ordered by popularity desc (average_score for ties and unsynced rows) — suggest for popular anime first.
+    The catalog is the whole of AniList now, so average_score alone would favour obscure high scorers.
     """
-    # Subquery: real community vote counts (excludes system user)
-    confirmed_counts = (
+    # Subquery: real and system vote totals per anime, summed from maintained anime_tag_counts
+    vote_totals = (
         select(
-            UserAnimeMoodTag.anime_id,
-            func.count(UserAnimeMoodTag.user_id).label("vote_count")
+            AnimeTagCount.anime_id,
+            func.sum(AnimeTagCount.real_votes).label("vote_count"),
+            func.sum(AnimeTagCount.system_votes).label("system_votes"),
         )
-        .where(UserAnimeMoodTag.user_id != SYSTEM_USER_ID)
-        .group_by(UserAnimeMoodTag.anime_id)
+        .group_by(AnimeTagCount.anime_id)
         .subquery()
     )
-
-    # Subquery: anime already tagged by system user
-    system_tagged = (
-        select(UserAnimeMoodTag.anime_id)
-        .where(UserAnimeMoodTag.user_id == SYSTEM_USER_ID)
-        .distinct()
-        .subquery()
+    # Same validity rule as cached_labels, plus "nothing left to vote for"
+    current_tags = cast(all_tags, ARRAY(String))
+    answered_with_no_tags = exists().where(
+        LLMSuggestionCache.input_hash == SUGGESTION_CACHE_KEY,
+        LLMSuggestionCache.vocabulary.contains(current_tags),
+        ~LLMSuggestionCache.labels.overlap(current_tags),
     )
 
     result = await db.execute(
-        select(Anime)
-        .outerjoin(confirmed_counts, confirmed_counts.c.anime_id == Anime.id)
-        .outerjoin(system_tagged, system_tagged.c.anime_id == Anime.id)
+        select(Anime, SUGGESTION_CACHE_KEY)
+        .outerjoin(vote_totals, vote_totals.c.anime_id == Anime.id)
         .where(
-            ((confirmed_counts.c.vote_count < MIN_CONFIRMED_TAGS) |
-             (confirmed_counts.c.vote_count == None)) &
-            (system_tagged.c.anime_id == None)  # Not yet tagged by system
+            ((vote_totals.c.vote_count < MIN_CONFIRMED_TAGS) |
+             (vote_totals.c.vote_count == None)) &
+            # Not yet tagged by system
+            ((vote_totals.c.system_votes == 0) |
+             (vote_totals.c.system_votes == None)) &
+            ~answered_with_no_tags
         )
-        .order_by(Anime.average_score.desc().nullslast())
+        .order_by(Anime.popularity.desc().nullslast(), Anime.average_score.desc().nullslast())
         .limit(MAX_ANIME_PER_RUN)
     )
-    return result.scalars().all()
+    return [tuple(row) for row in result.all()]
 
 
-async def suggest_tags_for_anime(
-    anime: Anime,
-    all_tags: list[str],
-    client: httpx.AsyncClient,
-    max_retries: int = 2
-) -> list[str]:
-    """Call Claude API to suggest tags for a single anime.
-    Returns list of tag labels from the approved vocabulary only.
-    LLM picks from existing tags — it does not create new ones.
-    Retries up to max_retries times with exponential backoff on network failure.
-    """
-    tag_list = "\n".join(f"- {tag}" for tag in all_tags)
-    prompt = f"""You are tagging anime for a community database. Given this anime's details, select which tags from the approved list apply. Return ONLY a JSON array of tag labels. No explanation, no new tags — only pick from the list.
-
-Anime: {anime.title}
+def _describe_anime(anime: Anime) -> str:
+    return f"""Anime: {anime.title}
 {f'English title: {anime.title_english}' if anime.title_english else ''}
 Genres: {', '.join(anime.genres) if anime.genres else 'Unknown'}
-Synopsis: {(anime.synopsis or '')[:500]}
+Synopsis: {(anime.synopsis or '')[:500]}"""
+
+
+def build_prompt(anime: Anime, all_tags: list[str]) -> str:
+    tag_list = "\n".join(f"- {tag}" for tag in all_tags)
+    return f"""You are tagging anime for a community database. Given this anime's details, select which tags from the approved list apply. Return ONLY a JSON array of tag labels. No explanation, no new tags — only pick from the list.
+
+{_describe_anime(anime)}
 
 Approved tags (pick only from these):
 {tag_list}
 
 Return format: ["tag one", "tag two", "tag three"]
 Return between 2 and 6 tags. Only return the JSON array."""
-    
-    # try up to 3 times total (1 initial + 2 retries) before giving up
-    for attempt in range(max_retries + 1):
-        try:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": ANTHROPIC_API_KEY,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json",
-                },
-                json={
-                    "model": "claude-haiku-4-5-20251001",
-                    "max_tokens": 200,
-                    "messages": [{"role": "user", "content": prompt}]
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            break  # Success — exit retry loop
-        except (httpx.HTTPError, httpx.ReadError) as e:
-            if attempt == max_retries:
-                logger.warning(f"API call failed for {anime.title} after {max_retries + 1} attempts: {e}")
-                return []
-            wait = 2 ** attempt  # 1s, then 2s
-            logger.warning(f"API call failed for {anime.title} (attempt {attempt + 1}), retrying in {wait}s: {e}")
-            await asyncio.sleep(wait)
-
-    # Parse response — separate try/except from network errors
-    try:
-        data = response.json()
-        raw = data["content"][0]["text"].strip()
-    except (json.JSONDecodeError, KeyError) as e:
-        logger.warning(f"Invalid JSON response for {anime.title}: {e}")
-        return []
 
-    # Parse LLM output — handles backtick wrapping and thinking out loud
+
+def parse_tag_labels(raw: str, all_tags: list[str]) -> Optional[list[str]]:
+    """Parse the model's JSON array and keep only approved labels.
+    Handles backtick wrapping and thinking out loud. None if nothing parseable came back."""
     try:
         # Strip markdown code fences if LLM wraps response
         clean = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
         match = re.search(r'\[.*?\]', clean, re.DOTALL)
-        if match:
-            suggested = json.loads(match.group())
-        else:
-            suggested = json.loads(clean)
-        approved_set = set(all_tags)
-        return [tag for tag in suggested if tag in approved_set]
-    except (json.JSONDecodeError, KeyError):
+        suggested = json.loads(match.group() if match else clean)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(suggested, list):
+        return None
+    approved_set = set(all_tags)
+    return [tag for tag in suggested if isinstance(tag, str) and tag in approved_set]
+
+
+def build_batch_prompt(anime_batch: list[Anime], all_tags: list[str]) -> str:
+    """One prompt for several anime — the vocabulary is sent once. Anime are keyed "1".."K"
+    rather than by UUID: short keys cost fewer tokens and the model copies them back reliably."""
+    tag_list = "\n".join(f"- {tag}" for tag in all_tags)
+    entries = "\n\n".join(
+        f"[{key}]\n{_describe_anime(anime)}" for key, anime in enumerate(anime_batch, start=1)
+    )
+    example = ", ".join(f'"{key}": ["tag one", "tag two"]' for key in range(1, min(len(anime_batch), 2) + 1))
+    return f"""You are tagging anime for a community database. For EACH anime below, select which tags from the approved list apply. Return ONLY a JSON object mapping each anime's number to a JSON array of tag labels. No explanation, no new tags — only pick from the list.
+
+{entries}
+
+Approved tags (pick only from these):
+{tag_list}
+
+Return format: {{{example}}}
+Include every anime number from 1 to {len(anime_batch)}. Return between 2 and 6 tags per anime. Only return the JSON object."""
+
+
+def parse_batch_labels(raw: str, count: int, all_tags: list[str]) -> dict[int, list[str]]:
+    """Parse a keyed batch response into {position: approved labels}, positions 0-based.
+    Every label is validated against the approved set, same as single mode.
+    Keys that are missing, unknown or not a list are simply absent — the caller retries those one by one.
+    """
+    clean = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    match = re.search(r'\{.*\}', clean, re.DOTALL)
+    try:
+        parsed = json.loads(match.group() if match else clean)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+
+    approved_set = set(all_tags)
+    labels = {}
+    for key, suggested in parsed.items():
+        try:
+            position = int(str(key).strip("[] ")) - 1
+        except ValueError:
+            continue
+        if 0 <= position < count and isinstance(suggested, list):
+            labels[position] = [tag for tag in suggested if isinstance(tag, str) and tag in approved_set]
+    return labels
+
+
+async def suggest_tags_for_batch(
+    anime_batch: list[Anime],
+    all_tags: list[str],
+    client: httpx.AsyncClient,
+    limiter: Optional[LLMRateLimiter] = None,
+    max_retries: int = 3,
+) -> dict[UUID, list[str]]:
+    """One API call for a batch of anime. Returns {anime_id: labels} for every anime the response
+    answered validly — anime missing from the result need a per-anime fallback call.
+    """
+    raw = await create_message(
+        client, build_batch_prompt(anime_batch, all_tags),
+        max_tokens=TOKENS_PER_ANIME_ANSWER * len(anime_batch) + 50,
+        limiter=limiter, max_retries=max_retries,
+        label=f"batch of {len(anime_batch)} starting {anime_batch[0].title}",
+    )
+    if raw is None:
+        return {}
+    by_position = parse_batch_labels(raw, len(anime_batch), all_tags)
+    if len(by_position) < len(anime_batch):
+        logger.warning(f"Batch response answered {len(by_position)}/{len(anime_batch)} anime: {raw[:300]}")
+    return {anime_batch[position].id: labels for position, labels in by_position.items()}
+
+
+async def suggest_tags_for_anime(
+    anime: Anime,
+    all_tags: list[str],
+    client: httpx.AsyncClient,
+    limiter: Optional[LLMRateLimiter] = None,
+    max_retries: int = 3,
+) -> Optional[list[str]]:
+    """Call Claude API to suggest tags for a single anime.
+    Returns list of tag labels from the approved vocabulary only — possibly empty if none applied.
+    None means no usable answer (API failure or unparseable output) — nothing is cached for it.
+    LLM picks from existing tags — it does not create new ones.
+    Pacing, retries and retry-after handling live in llm_client.create_message.
+    """
+    raw = await create_message(
+        client, build_prompt(anime, all_tags), max_tokens=200,
+        limiter=limiter, max_retries=max_retries, label=anime.title,
+    )
+    if raw is None:
+        return None
+    labels = parse_tag_labels(raw, all_tags)
+    if labels is None:
         logger.warning(f"Failed to parse LLM response for {anime.title}: {raw}")
-        return []
+    return labels
+
+
+async def suggest_concurrently(
+    anime_list: list[Anime],
+    all_tags: list[str],
+    client: httpx.AsyncClient,
+    limiter: LLMRateLimiter,
+    results: asyncio.Queue,
+    concurrency: int = LLM_CONCURRENCY,
+    batch_size: int = LLM_BATCH_SIZE,
+) -> None:
+    """Producer stage. At most `concurrency` API calls in flight; the limiter paces them under RPM/TPM.
+    Anime are sent batch_size per request. Any anime a batch response didn't answer validly
+    (or the whole batch, if the call failed) falls back to one call per anime.
+    Each finished anime goes onto `results` as (anime_id, labels) in completion order, labels None on failure.
+    A bounded queue gives backpressure — a slow DB stage holds the API calls back instead of buffering everything.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def single(anime: Anime, labels_by_id: dict[UUID, Optional[list[str]]]):
+        async with semaphore:
+            labels_by_id[anime.id] = await suggest_tags_for_anime(anime, all_tags, client, limiter)
+
+    async def worker(batch: list[Anime]):
+        labels_by_id: dict[UUID, Optional[list[str]]] = {}
+        if len(batch) > 1:
+            async with semaphore:
+                labels_by_id = await suggest_tags_for_batch(batch, all_tags, client, limiter)
+        missing = [anime for anime in batch if anime.id not in labels_by_id]
+        await asyncio.gather(*(single(anime, labels_by_id) for anime in missing))
+        for anime in batch:
+            await results.put((anime.id, labels_by_id[anime.id]))
+
+    batch_size = max(batch_size, 1)
+    await asyncio.gather(*(
+        worker(anime_list[start:start + batch_size]) for start in range(0, len(anime_list), batch_size)
+    ))
+
+
+async def store_suggestions(
+    db: AsyncSession,
+    results: asyncio.Queue,
+    tag_meta: dict[str, UUID],
+    existing_suggestions: set[tuple[UUID, UUID]],
+    total: int,
+    cache_keys: Optional[dict[UUID, str]] = None,
+    all_tags: Optional[list[str]] = None,
+) -> int:
+    """Consumer stage — the only place the job touches the DB while API calls are running.
+    Reads (anime_id, labels) until a None sentinel. Commits every COMMIT_BATCH_SIZE anime.
+    Fresh API answers (anime_id in cache_keys) are written to llm_suggestion_cache in the same
+    transaction as their votes. Returns the number of votes added.
+    """
+    cache_keys = cache_keys or {}
+    added = 0
+    done = 0
+    while (item := await results.get()) is not None:
+        anime_id, labels = item
+        done += 1
+        if labels is None:
+            continue  # Failed call — nothing to vote, nothing to cache. Tried again next run.
+
+        if anime_id in cache_keys:
+            stmt = insert(LLMSuggestionCache).values(
+                input_hash=cache_keys[anime_id], model=LLM_MODEL,
+                vocabulary=all_tags, labels=labels, created_at=datetime.now(timezone.utc),
+            )
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[LLMSuggestionCache.input_hash],
+                set_={"vocabulary": stmt.excluded.vocabulary, "labels": stmt.excluded.labels,
+                      "created_at": stmt.excluded.created_at},
+            ))
+
+        new_pairs = []
+        for label in labels:
+            if label not in tag_meta:
+                continue
+            tag_id = tag_meta[label]
+
+            if (anime_id, tag_id) in existing_suggestions:
+                continue
+
+            new_pairs.append((anime_id, tag_id))
+            existing_suggestions.add((anime_id, tag_id))
+
+        # Vote rows + anime_tag_counts + change log in one go — one count upsert per anime
+        await add_votes(db, SYSTEM_USER_ID, new_pairs)
+        added += len(new_pairs)
+
+        # Batch commit every COMMIT_BATCH_SIZE anime
+        if done % COMMIT_BATCH_SIZE == 0:
+            await db.commit()
+            logger.info(f"Committed batch at anime {done}/{total}")
+
+    # Final commit for remainder
+    await db.commit()
+    return added
 
 
 async def run_llm_suggest():
@@ -153,12 +352,21 @@ async def run_llm_suggest():
     We do NOT modify MoodTag.is_suggested — that flag means "LLM-created tag",
     not "LLM-suggested application". All 65 tags are hand-curated.
 
-    Commits in batches of COMMIT_BATCH_SIZE to avoid 150 individual commits.
+    Two-stage pipeline joined by a bounded queue:
+    1. suggest_concurrently — LLM_BATCH_SIZE anime per call, up to LLM_CONCURRENCY calls in flight,
+       paced by the RPM/TPM limiter; per-anime fallback for anything a batch didn't answer
+    2. store_suggestions — single consumer that owns the session, commits every COMMIT_BATCH_SIZE anime
+    Wall time is bounded by the rate limits instead of the sum of every request's latency.
+
+    Answers are memoized in llm_suggestion_cache by SUGGESTION_CACHE_KEY. Cache hits skip stage 1
+    entirely and go straight to the DB stage. Hit/miss counts are logged per run.
     """
     logger.info("Starting LLM tag suggestion job...")
+    started = time.monotonic()
     async with AsyncSessionLocal() as db:
         all_tags = await get_all_tag_labels(db)
-        anime_list = await get_anime_needing_suggestions(db)
+        candidates = await get_anime_needing_suggestions(db, all_tags)
+        anime_list = [anime for anime, _ in candidates]
         logger.info(f"Processing {len(anime_list)} anime...")
 
         # Bulk fetch existing system suggestions — explicit tuple cast for safety
@@ -175,39 +383,51 @@ async def run_llm_suggest():
         )
         tag_meta = {label: tag_id for label, tag_id in tag_meta_result.all()}
 
-        added = 0
-        async with httpx.AsyncClient() as client:
-            for i, anime in enumerate(anime_list):
-                suggested_labels = await suggest_tags_for_anime(anime, all_tags, client)
-
-                for label in suggested_labels:
-                    if label not in tag_meta:
-                        continue
-                    tag_id = tag_meta[label]
-
-                    if (anime.id, tag_id) in existing_suggestions:
-                        continue
-
-                    vote = UserAnimeMoodTag(
-                        user_id=SYSTEM_USER_ID,
-                        anime_id=anime.id,
-                        mood_tag_id=tag_id,
-                    )
-                    db.add(vote)
-                    existing_suggestions.add((anime.id, tag_id))
-                    added += 1
+        # Memoized answers — an anime whose inputs haven't changed costs zero API calls
+        cache_keys = {anime.id: cache_key for anime, cache_key in candidates}
+        cache_result = await db.execute(
+            select(LLMSuggestionCache).where(LLMSuggestionCache.input_hash.in_(set(cache_keys.values())))
+        )
+        cache_entries = {entry.input_hash: entry for entry in cache_result.scalars().all()}
+        cached: list[tuple[UUID, list[str]]] = []
+        misses: list[Anime] = []
+        for anime in anime_list:
+            entry = cache_entries.get(cache_keys[anime.id])
+            labels = cached_labels(entry, all_tags) if entry else None
+            if labels is None:
+                misses.append(anime)
+            else:
+                cached.append((anime.id, labels))
+        logger.info(f"Suggestion cache: {len(cached)} hits, {len(misses)} misses.")
+        miss_keys = {anime.id: cache_keys[anime.id] for anime in misses}
 
-                # Batch commit every COMMIT_BATCH_SIZE anime
-                if (i + 1) % COMMIT_BATCH_SIZE == 0:
-                    await db.commit()
-                    logger.info(f"Committed batch at anime {i + 1}/{len(anime_list)}")
+        async def produce():
+            for item in cached:
+                await results.put(item)
+            await suggest_concurrently(misses, all_tags, client, limiter, results)
 
-                await asyncio.sleep(0.5)
+        results: asyncio.Queue = asyncio.Queue(maxsize=LLM_CONCURRENCY * 2)
+        limiter = LLMRateLimiter()
+        async with httpx.AsyncClient() as client:
+            consumer = asyncio.create_task(
+                store_suggestions(db, results, tag_meta, existing_suggestions, len(anime_list), miss_keys, all_tags)
+            )
+            producer = asyncio.create_task(produce())
+            # If the DB stage dies, producers would block forever on the full queue — stop them
+            await asyncio.wait({producer, consumer}, return_when=asyncio.FIRST_COMPLETED)
+            if consumer.done():
+                producer.cancel()
+                await consumer  # Re-raises the DB error
+            try:
+                await producer
+            except BaseException:
+                consumer.cancel()
+                raise
+            await results.put(None)
+            added = await consumer
 
-        # Final commit for remainder
-        await db.commit()
-        logger.info(f"LLM suggestion job complete. {added} suggestions added.")
+        logger.info(f"LLM suggestion job complete. {added} suggestions added ({time.monotonic() - started:.1f}s).")
 
 
 if __name__ == "__main__":
-    asyncio.run(run_llm_suggest())
\ No newline at end of file
+    asyncio.run(run_llm_suggest())
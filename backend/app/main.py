@@ -7,15 +7,27 @@ from app.scheduler import start_scheduler, scheduler
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from app.limiter import limiter
+from app.auth import shutdown_password_pool
+from app.import_jobs import start_import_workers, stop_import_workers
+from app import anilist_client
+from app.autocomplete import start_autocomplete, stop_autocomplete
 
 # Placement at top guarantees the cleanup happens at the right moment, even if the server crashes or gets a kill signal.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     start_scheduler()
+    # Background import workers — also fails any import left queued/running by the last process
+    await start_import_workers()
+    # Title autocomplete index — built now, rebuilt whenever the catalog sync lands new data
+    await start_autocomplete()
     # Everything above yield runs when app starts up. Everything below yield runs when app shuts down.
     yield
     # APScheduler stops cleanly, no orphaned jobs
     scheduler.shutdown()
+    await stop_import_workers()
+    await stop_autocomplete()
+    await anilist_client.close_client()
+    shutdown_password_pool()
 
 app = FastAPI(title="Arcanum API", version="0.1.0", lifespan=lifespan)
 
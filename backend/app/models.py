@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, Float, Text, ForeignKey, Enum as SQLAlchemyEnum, UniqueConstraint
+from sqlalchemy import text, Column, String, DateTime, Boolean, Integer, BigInteger, SmallInteger, Float, Text, ForeignKey, Enum as SQLAlchemyEnum, UniqueConstraint, Index, CheckConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from app.database import Base
 import uuid
@@ -11,6 +11,16 @@ from pgvector.sqlalchemy import Vector
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # HNSW ANN index for "people with taste like yours" — cosine ops to match the <=> operator.
+        # NULL vectors (<5 scored anime) are simply not indexed.
+        Index(
+            "ix_users_taste_vector_hnsw", "taste_vector",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"taste_vector": "vector_cosine_ops"},
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username = Column(String(50), unique=True, nullable=False, index=True)
@@ -21,12 +31,27 @@ class User(Base):
     # taste_vector: 128-dim taste fingerprint.
     # Segments: 18 genre dims (weight 0.40) + 5 score axis dims (weight 0.20) + 65 mood tag dims (weight 0.40) + 40 buffer zeros
     # NULL for users with <5 scored anime — vector meaningless below this threshold.
-    # Recomputed every 24hrs by APScheduler. Phase 3.4 uses <=> cosine distance for compatibility.
+    # Recomputed every 24hrs by APScheduler (app/taste_vector.py). Phase 3.4 uses <=> cosine distance for compatibility.
     taste_vector = Column(Vector(128), nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class Anime(Base):
     __tablename__ = "anime"
+    __table_args__ = (
+        # pg_trgm GIN indexes for GET /anime/search — serve ILIKE '%q%' and the word-similarity operator (<%)
+        Index("ix_anime_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index(
+            "ix_anime_title_english_trgm", "title_english",
+            postgresql_using="gin", postgresql_ops={"title_english": "gin_trgm_ops"},
+        ),
+        # HNSW for GET /anime/semantic — cosine ops to match <=>. Same build parameters as the taste vector index.
+        Index(
+            "ix_anime_synopsis_embedding_hnsw", "synopsis_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"synopsis_embedding": "vector_cosine_ops"},
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     anilist_id = Column(Integer, unique=True, nullable=False, index=True)
@@ -39,8 +64,12 @@ class Anime(Base):
     episode_count = Column(Integer, nullable=True)
     cached_vibe_tags = Column(JSONB, default=dict)
     average_score = Column(Integer, nullable=True)
+    popularity = Column(Integer, nullable=True)  # AniList list count — refreshed nightly by catalog_sync.py
     season = Column(String(50), nullable=True)
     season_year = Column(Integer, nullable=True)
+    # synopsis_embedding: 256-dim hashed TF-IDF of synopsis + genres, computed offline by app/synopsis_embedding.py.
+    # NULL until embedded. catalog_sync.py clears it when synopsis or genres change, and the nightly job refills it.
+    synopsis_embedding = Column(Vector(256), nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 class WatchStatus(enum.Enum):
@@ -115,6 +144,72 @@ class UserAnimeMoodTag(Base):
     mood_tag_id = Column(UUID(as_uuid=True), ForeignKey("mood_tags.id", ondelete="CASCADE"), primary_key=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+class AnimeTagCount(Base):
+    __tablename__ = "anime_tag_counts"
+
+    # Denormalized vote counts per (anime, tag) — readers use this instead of GROUP BY over user_anime_mood_tags.
+    # Maintained by app/tag_votes.py in the same transaction as every vote insert/delete.
+    # Unlike usage_count, incrementing here is safe: each write is a single atomic
+    # INSERT ... ON CONFLICT DO UPDATE SET x = x + delta, never read-modify-write in Python.
+    # real_votes excludes the system user; system_votes counts LLM suggestions (0 or 1 per pair).
+    # The full aggregation run recounts any pair that drifted from raw votes as a safety net.
+    anime_id = Column(UUID(as_uuid=True), ForeignKey("anime.id", ondelete="CASCADE"), primary_key=True)
+    mood_tag_id = Column(UUID(as_uuid=True), ForeignKey("mood_tags.id", ondelete="CASCADE"), primary_key=True, index=True)
+    real_votes = Column(Integer, nullable=False, default=0)
+    system_votes = Column(Integer, nullable=False, default=0)
+
+class AnimeStats(Base):
+    __tablename__ = "anime_stats"
+
+    # Arcanum score aggregates per anime — the detail page reads this row instead of AVG over every relationship.
+    # Maintained by app/anime_stats.py in the same transaction as every list write (handlers and imports),
+    # always as INSERT ... ON CONFLICT DO UPDATE SET x = x + delta. A daily drift check recounts any anime that drifted.
+    # Sums, not averages, so a change is a constant-time delta: mean = rating_sum / rating_count.
+    # No row = nobody has scored the anime.
+    anime_id = Column(UUID(as_uuid=True), ForeignKey("anime.id", ondelete="CASCADE"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)  # Entries with a computed_overall
+    rating_sum = Column(Float, nullable=False, default=0)
+    # Per axis: entries that scored the axis, and the sum of those scores
+    story_count = Column(Integer, nullable=False, default=0)
+    story_sum = Column(Integer, nullable=False, default=0)
+    art_count = Column(Integer, nullable=False, default=0)
+    art_sum = Column(Integer, nullable=False, default=0)
+    sound_count = Column(Integer, nullable=False, default=0)
+    sound_sum = Column(Integer, nullable=False, default=0)
+    characters_count = Column(Integer, nullable=False, default=0)
+    characters_sum = Column(Integer, nullable=False, default=0)
+    enjoyment_count = Column(Integer, nullable=False, default=0)
+    enjoyment_sum = Column(Integer, nullable=False, default=0)
+    # histogram[k-1] = entries whose computed_overall rounds (half up) to k, k = 1..10
+    histogram = Column(ARRAY(Integer), nullable=False, default=lambda: [0] * 10)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class MoodTagVoteChange(Base):
+    __tablename__ = "mood_tag_vote_changes"
+
+    # Append-only change log for incremental vibe aggregation.
+    # Every vote insert writes delta=+1, every vote delete writes delta=-1, in the same transaction as the vote.
+    # aggregate_vibe_tags consumes the rows visible in its snapshot, recomputes only the touched
+    # anime and tags, then deletes exactly those rows by id (ids are not assigned in commit order).
+    # No FKs on purpose — keeps the hot tagging path lock-free, and a deleted anime/tag just recomputes to nothing.
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    anime_id = Column(UUID(as_uuid=True), nullable=False)
+    mood_tag_id = Column(UUID(as_uuid=True), nullable=False)
+    delta = Column(SmallInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class JobState(Base):
+    __tablename__ = "job_state"
+
+    # One row per background job. Lets the web process see what a job last did without talking to it —
+    # jobs run either inside APScheduler here or as a separate Railway cron process.
+    # generation: bumped every time a job lands new data. In-process caches key on it.
+    # checkpoint: free-form resume state for long-running jobs (e.g. a page cursor).
+    job_id = Column(String(100), primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+    checkpoint = Column(JSONB, nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
 class Follow(Base):
     __tablename__ = "follows"
 
@@ -125,4 +220,80 @@ class Follow(Base):
     # Phase 4+: add weight column for "power follow" multiplier on taste scores.
     follower_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     following_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class TasteCompatibility(Base):
+    __tablename__ = "taste_compatibility_cache"
+    __table_args__ = (CheckConstraint("user_a < user_b", name="ck_taste_compatibility_ordered_pair"),)
+
+    # Precomputed taste_vector cosine similarity per user pair — feed and circle listings JOIN this
+    # instead of doing vector math per request. Filled by app/taste_compatibility.py after taste vectors land.
+    # Each unordered pair is stored once with user_a < user_b. Look up with least()/greatest().
+    # Covers every follow edge plus each user's top-k nearest neighbors. Pairs where either side
+    # has no taste_vector have no row — readers treat a missing row as "unknown", not zero.
+    user_a = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    user_b = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+    similarity = Column(Float, nullable=False)  # Cosine similarity, -1 to 1
+    computed_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class UserProfileSummary(Base):
+    __tablename__ = "user_profile_summaries"
+
+    # Materialized GET /users/{username} stats — a profile view is one primary key lookup, not an aggregate
+    # over the whole list. Maintained by app/profile_summary.py.
+    # Dirty versioning: every list write (list endpoints, imports) bumps version in its own transaction.
+    # A read that finds computed_version != version recomputes, and stores the summary tagged with the
+    # version it read — a write landing mid-recompute leaves the row dirty for the next read, never stale.
+    # No row = never viewed and never written since this table was added; treated as dirty.
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    computed_version = Column(BigInteger, nullable=True)  # NULL = never computed
+    summary = Column(JSONB, nullable=True)  # stats, genre_breakdown, score_distribution + format number
+    computed_at = Column(DateTime(timezone=True), nullable=True)
+
+class LLMSuggestionCache(Base):
+    __tablename__ = "llm_suggestion_cache"
+
+    # Memoized LLM tag suggestions — app/llm_suggest.py checks here before calling the API.
+    # input_hash: sha256 over prompt version, model, title, English title, genres, synopsis (see SUGGESTION_CACHE_KEY in app/llm_suggest.py).
+    # vocabulary: the approved tag labels the model was offered. A hit requires the current vocabulary
+    # to be a subset — adding a tag invalidates an answer, removing one doesn't.
+    # labels: the model's validated answer. Empty array = "none of the tags apply", still a valid answer.
+    input_hash = Column(String(64), primary_key=True)
+    model = Column(String(100), nullable=False)
+    vocabulary = Column(ARRAY(String), nullable=False)
+    labels = Column(ARRAY(String), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    __table_args__ = (
+        # One active import per user, enforced by Postgres — two concurrent POSTs can't both get in.
+        # Partial: finished jobs are kept for history and never conflict.
+        Index(
+            "uq_import_jobs_one_active_per_user", "user_id",
+            unique=True, postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    # One row per list import (MAL XML or AniList). POST /import/* creates it and returns its id at once;
+    # a worker in app/import_jobs.py runs the import and writes progress/results here.
+    # Persisted so a client that reloads or reconnects can still fetch the result via GET /import/jobs/{id}.
+    # status: queued → running → completed | failed. Jobs left queued/running by a restart are marked failed at startup.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    source = Column(String(20), nullable=False)   # "mal" | "anilist"
+    mode = Column(String(10), nullable=False, default="skip")  # "skip" | "merge" — what happens to anime already listed
+    status = Column(String(20), nullable=False, default="queued")
+    processed = Column(Integer, default=0)        # Entries handled so far
+    total_in_file = Column(Integer, nullable=True)  # NULL until known — MAL files are streamed, so only at the end
+    imported = Column(Integer, default=0)
+    updated = Column(Integer, default=0)          # Merge mode: existing entries changed by the import
+    skipped = Column(Integer, default=0)
+    field_changes = Column(JSONB, nullable=True)  # Merge mode: {field: rows changed}, see importers.MERGED_FIELDS
+    unmatched_count = Column(Integer, default=0)
+    unmatched_titles = Column(ARRAY(String), default=list)  # First 20 only
+    error = Column(Text, nullable=True)           # User-facing message when status = failed
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
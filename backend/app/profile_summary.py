@@ -0,0 +1,67 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from app.models import UserProfileSummary
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+# Cached profile summaries — see UserProfileSummary in models.py for the versioning scheme.
+# Write side: mark_profile_dirty() from every path that changes a user's list
+#   routers/anime_list.py  — add / update / delete
+#   importers.py           — once per import, in the import's own transaction
+# Read side: GET /users/{username} serves the stored summary when it is fresh, otherwise recomputes
+# it with the aggregate queries in routers/users.py and stores it with store_profile_summary().
+# Catalog changes (an anime's genres) don't dirty summaries — they catch up on the user's next list write.
+
+# Bump when the summary's shape changes — stored summaries in an older format are recomputed on read
+PROFILE_SUMMARY_FORMAT = 1
+
+
+async def mark_profile_dirty(db: AsyncSession, user_id: UUID) -> None:
+    """Invalidate the user's stored summary. One upsert, no read. Caller commits —
+    in the same transaction as the list write, so a reader can't see the write without the bump.
+    """
+    stmt = insert(UserProfileSummary).values(user_id=user_id, version=1)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserProfileSummary.user_id],
+            set_={"version": UserProfileSummary.version + 1},
+        )
+    )
+
+
+def is_fresh(version: Optional[int], computed_version: Optional[int], summary: Optional[dict]) -> bool:
+    """True if a stored summary still describes the list. Missing row (all None) is never fresh."""
+    return (
+        summary is not None
+        and computed_version is not None
+        and computed_version == version
+        and summary.get("format") == PROFILE_SUMMARY_FORMAT
+    )
+
+
+async def store_profile_summary(db: AsyncSession, user_id: UUID, version: int, summary: dict) -> None:
+    """Save a recomputed summary as of `version` — the version read before the aggregates ran.
+    Never replaces a summary computed at a later version (two readers recomputing at once). Caller commits.
+    """
+    stmt = insert(UserProfileSummary).values(
+        user_id=user_id,
+        version=version,
+        computed_version=version,
+        summary={**summary, "format": PROFILE_SUMMARY_FORMAT},
+        computed_at=datetime.now(timezone.utc),
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserProfileSummary.user_id],
+            set_={
+                "computed_version": stmt.excluded.computed_version,
+                "summary": stmt.excluded.summary,
+                "computed_at": stmt.excluded.computed_at,
+            },
+            where=(
+                UserProfileSummary.computed_version.is_(None)
+                | (UserProfileSummary.computed_version <= stmt.excluded.computed_version)
+            ),
+        )
+    )
@@ -1,58 +1,222 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func, or_, case, literal, cast, Float
 from app.database import get_db
-from app.models import Anime, UserAnimeRelationship
-from app.schemas import AnimeResponse, SearchResult
+from app.models import Anime, AnimeStats, AnimeTagCount, MoodTag
+from app.schemas import AnimeResponse, SearchResult, SemanticResult
+from app.autocomplete import current_index, AUTOCOMPLETE_MAX_LIMIT
+from app.synopsis_embedding import embed_query
+from typing import Optional
 from uuid import UUID
+import numpy as np
 
 router = APIRouter(prefix="/anime", tags=["anime"])
 
+# Title search. pg_trgm GIN indexes on title and title_english (migration a7e3b9c4d058) serve both
+# the substring match (ILIKE) and the typo-tolerant word-similarity match (<%), so a keystroke is an
+# index lookup rather than a scan of the anime table.
+# Ranking, highest first:
+#   word similarity of the query to the better of the two titles (0..1)
+#   + SEARCH_PREFIX_BOOST if a title starts with the query — typing "frie" should put Frieren first
+#   + up to SEARCH_POPULARITY_WEIGHT for popularity, log-scaled so a hit show can't bury a better match
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+SEARCH_PREFIX_BOOST = 0.5
+SEARCH_POPULARITY_WEIGHT = 0.3
+POPULARITY_LOG_SCALE = 6.0  # log10 of the most popular titles' list counts (~1M)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_query(q: str, limit: int = SEARCH_DEFAULT_LIMIT, offset: int = 0):
+    """Ranked title search as a SELECT over Anime. Shared with benchmarks/bench_anime_search.py."""
+    term = _escape_like(q)
+    similarity = func.greatest(
+        func.word_similarity(q, Anime.title),
+        func.coalesce(func.word_similarity(q, Anime.title_english), 0),
+    )
+    prefix = case(
+        (or_(Anime.title.ilike(f"{term}%", escape="\\"), Anime.title_english.ilike(f"{term}%", escape="\\")),
+         SEARCH_PREFIX_BOOST),
+        else_=0,
+    )
+    popularity = (
+        func.log(cast(func.coalesce(Anime.popularity, 0) + 1, Float)) / POPULARITY_LOG_SCALE * SEARCH_POPULARITY_WEIGHT
+    )
+    rank = (similarity + prefix + popularity).label("rank")
+    return (
+        select(Anime)
+        .where(
+            or_(
+                Anime.title.ilike(f"%{term}%", escape="\\"),
+                Anime.title_english.ilike(f"%{term}%", escape="\\"),
+                # Typo tolerance — "frieren" also finds "Sousou no Frieren", "mushishi" finds "Mushi-shi"
+                literal(q).op("<%")(Anime.title),
+                literal(q).op("<%")(Anime.title_english),
+            )
+        )
+        .order_by(rank.desc(), Anime.id)  # id breaks ties so pages never overlap
+        .limit(limit)
+        .offset(offset)
+    )
+
+
 @router.get("/search", response_model=list[SearchResult])
 async def search_anime(
     q: str,
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
     db: AsyncSession = Depends(get_db)
 ):
-    """Simple title search. Returns top 10 matches.
-    # TODO: Replace with pgvector semantic search in Phase 5 — 'something like Mushishi but more melancholy'
+    """Ranked title search — best matches first, popular titles ahead among similar matches.
+    Paginate with limit/offset; a page shorter than limit is the last one.
+    For "something like Mushishi but more melancholy", see GET /anime/semantic.
     """
     if not q or len(q.strip()) < 2:
         return []
-    
-    search_term = f"%{q.strip()}%"
-    result = await db.execute(
-        select(Anime)
-        .where(
-            or_(
-                Anime.title.ilike(search_term),
-                Anime.title_english.ilike(search_term)
-            )
+
+    result = await db.execute(search_query(q.strip(), limit, offset))
+    return result.scalars().all()
+
+# Declared before /{anime_id} — otherwise "autocomplete" would be parsed as an anime id
+@router.get("/autocomplete", response_model=list[SearchResult])
+async def autocomplete_anime(
+    q: str,
+    limit: int = Query(8, ge=1, le=AUTOCOMPLETE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search-as-you-type. Word-prefix match on titles, most popular first.
+    Served from the in-process index (app/autocomplete.py) — no DB round trip. Only if the index
+    hasn't been built yet (startup failure) does it fall back to the ranked DB search.
+    """
+    index = current_index()
+    if index is not None:
+        return index.lookup(q, limit)
+    if not q or len(q.strip()) < 2:
+        return []
+    result = await db.execute(search_query(q.strip(), limit))
+    return result.scalars().all()
+
+# Semantic search over anime.synopsis_embedding (app/synopsis_embedding.py), served by its HNSW index.
+# The target vector is the query text, a reference anime, or both, pulled toward a mood tag's vector:
+# the centroid of the MOOD_CENTROID_SIZE anime most voted for that tag.
+# Capped at hnsw.ef_search (40 by default) — past that the index returns fewer rows than asked for.
+SEMANTIC_DEFAULT_LIMIT = 20
+SEMANTIC_MAX_LIMIT = 40
+SEMANTIC_MOOD_WEIGHT = 0.35
+MOOD_CENTROID_SIZE = 200
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    return vector / np.linalg.norm(vector)
+
+
+async def _mood_vector(db: AsyncSession, slug: str) -> Optional[np.ndarray]:
+    """Centroid of the embeddings of the anime most tagged with this mood. None if the tag is unknown or unused."""
+    total_votes = AnimeTagCount.real_votes + AnimeTagCount.system_votes
+    tagged = (
+        select(Anime.synopsis_embedding)
+        .join(AnimeTagCount, AnimeTagCount.anime_id == Anime.id)
+        .join(MoodTag, MoodTag.id == AnimeTagCount.mood_tag_id)
+        .where(MoodTag.slug == slug, total_votes > 0, Anime.synopsis_embedding.isnot(None))
+        .order_by(total_votes.desc())
+        .limit(MOOD_CENTROID_SIZE)
+        .subquery()
+    )
+    # pgvector's avg() averages vectors server-side — one row back instead of 200
+    centroid = (await db.execute(
+        select(func.avg(tagged.c.synopsis_embedding, type_=Anime.synopsis_embedding.type))
+    )).scalar()
+    if centroid is None or not np.any(centroid):
+        return None
+    return _normalize(np.asarray(centroid, dtype=np.float32))
+
+
+def semantic_query(target: np.ndarray, limit: int = SEMANTIC_DEFAULT_LIMIT, exclude: Optional[UUID] = None):
+    """Nearest anime to target by cosine distance. ORDER BY is the bare <=> expression so the HNSW index serves it."""
+    distance = Anime.synopsis_embedding.cosine_distance(target)
+    query = (
+        # Result columns only — loading whole Anime rows would drag every embedding back over the wire
+        select(
+            Anime.id, Anime.title, Anime.title_english, Anime.cover_url, Anime.average_score,
+            (1 - distance).label("similarity"),
         )
-        .limit(10)
+        .where(Anime.synopsis_embedding.isnot(None))
+        .order_by(distance)
+        .limit(limit)
     )
-    return result.scalars().all()
+    if exclude is not None:
+        query = query.where(Anime.id != exclude)
+    return query
+
+
+# Declared before /{anime_id} — otherwise "semantic" would be parsed as an anime id
+@router.get("/semantic", response_model=list[SemanticResult])
+async def semantic_search(
+    q: Optional[str] = None,
+    like: Optional[UUID] = None,
+    mood: Optional[str] = None,
+    mood_weight: float = Query(SEMANTIC_MOOD_WEIGHT, ge=0, le=1),
+    limit: int = Query(SEMANTIC_DEFAULT_LIMIT, ge=1, le=SEMANTIC_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db)
+):
+    """Anime whose synopsis is about what you describe.
+    q: free text ("quiet journey through a haunted countryside"). like: an anime id to find more of.
+    mood: a mood tag slug to lean toward, by mood_weight (0 = ignore, 1 = mood only).
+    At least one of q, like or mood is required. The like anime itself is left out of the results.
+    """
+    parts = []
+    if q and q.strip():
+        query_vector = embed_query(q)
+        if query_vector is not None:
+            parts.append(query_vector)
+    if like is not None:
+        reference = (await db.execute(
+            select(Anime.synopsis_embedding).where(Anime.id == like)
+        )).first()
+        if reference is None:
+            raise HTTPException(status_code=404, detail="Anime not found")
+        if reference[0] is not None:
+            parts.append(np.asarray(reference[0], dtype=np.float32))
+    if not parts and not mood:
+        if q or like:
+            return []  # Nothing searchable in the query (all stopwords) or the anime isn't embedded yet
+        raise HTTPException(status_code=400, detail="Provide q, like or mood")
+
+    target = _normalize(np.sum(parts, axis=0)) if parts else None
+    if mood:
+        mood_vector = await _mood_vector(db, mood)
+        if mood_vector is None:
+            raise HTTPException(status_code=404, detail="Mood tag not found or not used on any anime yet")
+        target = mood_vector if target is None else _normalize((1 - mood_weight) * target + mood_weight * mood_vector)
+
+    result = await db.execute(semantic_query(target, limit, exclude=like))
+    return [{**row._mapping, "similarity": round(row.similarity, 4)} for row in result.all()]
 
 @router.get("/{anime_id}", response_model=AnimeResponse)
 async def get_anime(
     anime_id: UUID,
     db: AsyncSession = Depends(get_db)
 ):
-    """Anime detail page — title, synopsis, cover, genres, global average score."""
+    """Anime detail page — title, synopsis, cover, genres, global average score and score distribution.
+    One query: the anime row plus its precomputed anime_stats row (app/anime_stats.py), however many
+    users have scored it.
+    """
     result = await db.execute(
-        select(Anime).where(Anime.id == anime_id)
+        select(Anime, AnimeStats)
+        .outerjoin(AnimeStats, AnimeStats.anime_id == Anime.id)
+        .where(Anime.id == anime_id)
     )
-    anime = result.scalar_one_or_none()
-    if not anime:
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Anime not found")
+    anime, stats = row
 
-    # Global average computed_overall across all users who scored it
-    avg_result = await db.execute(
-        select(func.avg(UserAnimeRelationship.computed_overall)).where(
-            UserAnimeRelationship.anime_id == anime_id,
-            UserAnimeRelationship.computed_overall.isnot(None)
-        )
-    )
-    global_average = avg_result.scalar()
+    # No stats row = nobody has scored it yet
+    rating_count = stats.rating_count if stats else 0
+    histogram = stats.histogram if stats else [0] * 10
 
     return {
         "id": anime.id,
@@ -65,8 +229,10 @@ async def get_anime(
         "genres": anime.genres,
         "episode_count": anime.episode_count,
         "average_score": anime.average_score,
-        "arcanum_score": round(global_average, 2) if global_average else None,
+        "arcanum_score": round(stats.rating_sum / rating_count, 2) if rating_count else None,
+        "arcanum_rating_count": rating_count,
+        "score_distribution": {str(bucket): count for bucket, count in enumerate(histogram, start=1)},
         "season": anime.season,
         "season_year": anime.season_year,
         "cached_vibe_tags": anime.cached_vibe_tags,
-    }
\ No newline at end of file
+    }
@@ -2,9 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.database import get_db
-from app.models import UserAnimeRelationship, WatchStatus
+from app.models import User, UserAnimeRelationship, WatchStatus
 from app.schemas import ListEntryCreate, ListEntryUpdate, ListEntryResponse
-from app.auth import decode_token
+from app.auth import decode_token_claims, token_cache
+from app.anime_stats import entry_scores, record_entry_change
+from app.profile_summary import mark_profile_dirty
 from fastapi.security import OAuth2PasswordBearer
 from uuid import UUID
 from datetime import datetime, timezone
@@ -14,12 +16,34 @@ router = APIRouter(prefix="/list", tags=["list"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> UUID:
-    """Decode JWT and return current user's UUID."""
-    user_id = decode_token(token)
-    if not user_id:
+async def get_current_user_id(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UUID:
+    """Resolve the bearer token to the current user's UUID. Rejects revoked tokens and inactive users.
+
+    Hot path: token_cache hit — no signature verification, no DB query.
+    Miss: verify the JWT, look up is_active once, cache the result until the token expires or the TTL runs out.
+    """
+    if token_cache.is_revoked(token):
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return UUID(user_id)
+
+    principal = token_cache.get(token)
+    if principal is None:
+        claims = decode_token_claims(token)
+        if not claims or not claims.get("sub"):
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        try:
+            user_id = UUID(claims["sub"])
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+        result = await db.execute(select(User.is_active).where(User.id == user_id))
+        is_active = result.scalar_one_or_none()
+        if is_active is None:  # Deleted user — don't cache, the token will never be valid again anyway
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        principal = token_cache.put(token, user_id, float(claims["exp"]), bool(is_active))
+
+    if not principal.is_active:
+        raise HTTPException(status_code=401, detail="Account is deactivated")
+    return principal.user_id
 
 def compute_overall(
     story: Optional[int],
@@ -74,6 +98,9 @@ async def add_to_list(
         rewatch_score=entry.rewatch_score,
     )
     db.add(relationship)
+    # Same transaction as the entry — anime_stats never disagrees with the list
+    await record_entry_change(db, None, entry_scores(relationship))
+    await mark_profile_dirty(db, user_id)
     await db.commit()
     await db.refresh(relationship)
     return relationship
@@ -95,6 +122,7 @@ async def update_entry(
     entry = result.scalar_one_or_none()
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
+    before = entry_scores(entry)
 
     # Apply only provided fields
     for field, value in updates.model_dump(exclude_unset=True).items():
@@ -106,6 +134,9 @@ async def update_entry(
         entry.score_characters, entry.score_enjoyment
     )
     entry.updated_at = datetime.now(timezone.utc)
+    # No-op unless a score changed
+    await record_entry_change(db, before, entry_scores(entry))
+    await mark_profile_dirty(db, user_id)
 
     await db.commit()
     await db.refresh(entry)
@@ -129,6 +160,8 @@ async def delete_entry(
         raise HTTPException(status_code=404, detail="Entry not found")
 
     await db.delete(entry)
+    await record_entry_change(db, entry_scores(entry), None)
+    await mark_profile_dirty(db, user_id)
     await db.commit()
 
 @router.get("/", response_model=list[ListEntryResponse])
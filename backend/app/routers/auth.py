@@ -4,7 +4,9 @@ from sqlalchemy import select
 from app.database import get_db
 from app.models import User
 from app.schemas import UserCreate, UserResponse, Token
-from app.auth import hash_password, verify_password, create_access_token
+from app.auth import hash_password, verify_password, needs_rehash, create_access_token, decode_token_claims, token_cache
+from app.routers.anime_list import oauth2_scheme, get_current_user_id
+from uuid import UUID
 from fastapi.security import OAuth2PasswordRequestForm
 from app.limiter import limiter
 
@@ -26,7 +28,7 @@ async def register(request: Request, user_data: UserCreate, db: AsyncSession = D
     user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=hash_password(user_data.password)
+        hashed_password=await hash_password(user_data.password)
     )
     db.add(user)
     await db.commit()
@@ -38,8 +40,21 @@ async def register(request: Request, user_data: UserCreate, db: AsyncSession = D
 async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # The plaintext is only ever available here — upgrade hashes made at an old BCRYPT_ROUNDS transparently
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password(form_data.password)
+        await db.commit()
+
     token = create_access_token({"sub": str(user.id)})
-    return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": token, "token_type": "bearer"}
+
+@router.post("/logout", status_code=204)
+async def logout(token: str = Depends(oauth2_scheme), current_user_id: UUID = Depends(get_current_user_id)):
+    """Revoke the bearer token server-side. The frontend also drops it from localStorage.
+    Best effort: the revocation lives in this process's memory (see TokenCache), so another worker
+    or a restart still accepts the token until it expires."""
+    claims = decode_token_claims(token)
+    token_cache.revoke(token, float(claims["exp"]))
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.database import get_db
-from app.models import Follow, UserAnimeRelationship, Anime, User, WatchStatus
+from app.models import Follow, UserAnimeRelationship, Anime, User, WatchStatus, TasteCompatibility
 from app.routers.anime_list import get_current_user_id
+from app.taste_compatibility import taste_pair
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
@@ -16,8 +17,9 @@ class FeedEntry(BaseModel):
     # User who performed the activity
     username: str
     avatar_url: Optional[str]
-    # TODO Phase 3.5: add taste_match: Optional[float] = None here
-    # when taste_compatibility_cache exists — JOIN is already designed for it
+    # Cosine similarity between your taste vector and theirs, from taste_compatibility_cache.
+    # None when either of you has no taste vector yet or the daily job hasn't run since you followed.
+    taste_match: Optional[float] = None
 
     # Anime
     anime_id: UUID
@@ -52,9 +54,8 @@ async def get_feed(
     Cursor-based pagination on updated_at. Pass next_cursor as ?before= for next page.
     Returns all activity types (completed, watching, dropped, scored) — frontend decides styling.
     
-    TODO Phase 3.5: JOIN taste_compatibility_cache to add taste_match per user.
+    taste_match comes from a LEFT JOIN on taste_compatibility_cache — no vector math per request.
     TODO Phase 3.5: JOIN user_anime_mood_tags to add mood_tags_applied per entry.
-    Both are additive changes — response schema already has placeholder comments.
     """
     # Parse cursor
     cursor_dt = None
@@ -64,12 +65,13 @@ async def get_feed(
         except ValueError:
             cursor_dt = None
 
-    # Single query — follows + user_anime_relationships + anime + users
+    # Single query — follows + user_anime_relationships + anime + users + taste_compatibility_cache
     # No N+1: all data fetched in one JOIN
     query = (
         select(
             User.username,
             User.avatar_url,
+            TasteCompatibility.similarity.label("taste_match"),
             Anime.id.label("anime_id"),
             Anime.title.label("anime_title"),
             Anime.title_english.label("anime_title_english"),
@@ -81,6 +83,7 @@ async def get_feed(
         .join(Follow, Follow.following_id == User.id)
         .join(UserAnimeRelationship, UserAnimeRelationship.user_id == User.id)
         .join(Anime, Anime.id == UserAnimeRelationship.anime_id)
+        .outerjoin(TasteCompatibility, taste_pair(current_user_id, User.id))
         .where(Follow.follower_id == current_user_id)
         .order_by(UserAnimeRelationship.updated_at.desc())
         .limit(limit + 1)  # fetch one extra to determine if next page exists
@@ -104,6 +107,7 @@ async def get_feed(
         FeedEntry(
             username=row.username,
             avatar_url=row.avatar_url,
+            taste_match=row.taste_match,
             anime_id=row.anime_id,
             anime_title=row.anime_title,
             anime_title_english=row.anime_title_english,
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from app.database import get_db
-from app.models import Follow, User
+from app.models import Follow, User, TasteCompatibility
 from app.routers.anime_list import get_current_user_id
+from app.taste_compatibility import taste_pair
 from uuid import UUID
 from pydantic import BaseModel
 from typing import Optional
@@ -18,6 +19,9 @@ class FollowStats(BaseModel):
 class UserSummary(BaseModel):
     username: str
     avatar_url: Optional[str]
+    # Taste similarity between this user and the profile owner whose circle is being listed.
+    # None when either has no taste vector yet.
+    taste_match: Optional[float] = None
     model_config = {"from_attributes": True}
 
 async def get_user_by_username(username: str, db: AsyncSession) -> User:
@@ -113,12 +117,13 @@ async def get_following(
     user = await get_user_by_username(username, db)
 
     following_result = await db.execute(
-        select(User)
+        select(User.username, User.avatar_url, TasteCompatibility.similarity.label("taste_match"))
         .join(Follow, Follow.following_id == User.id)
+        .outerjoin(TasteCompatibility, taste_pair(user.id, User.id))
         .where(Follow.follower_id == user.id)
         .order_by(Follow.created_at.desc())
     )
-    return following_result.scalars().all()
+    return [UserSummary.model_validate(row) for row in following_result.all()]
 
 
 @router.get("/{username}/circle/followers", response_model=list[UserSummary])
@@ -130,9 +135,10 @@ async def get_followers(
     user = await get_user_by_username(username, db)
 
     followers_result = await db.execute(
-        select(User)
+        select(User.username, User.avatar_url, TasteCompatibility.similarity.label("taste_match"))
         .join(Follow, Follow.follower_id == User.id)
+        .outerjoin(TasteCompatibility, taste_pair(user.id, User.id))
         .where(Follow.following_id == user.id)
         .order_by(Follow.created_at.desc())
     )
-    return followers_result.scalars().all()
\ No newline at end of file
+    return [UserSummary.model_validate(row) for row in followers_result.all()]
\ No newline at end of file
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from app.database import get_db
-from app.models import MoodTag, UserAnimeMoodTag, Anime
+from app.models import MoodTag, UserAnimeMoodTag, Anime, AnimeTagCount
 from app.routers.anime_list import get_current_user_id
 from pydantic import BaseModel
 from uuid import UUID
 from typing import Optional
-from sqlalchemy import select, func, Integer
-from app.constants import SYSTEM_USER_ID, CONFIRMATION_THRESHOLD
+from app.constants import CONFIRMATION_THRESHOLD
+from app.tag_votes import add_votes, remove_vote
 
 router = APIRouter(prefix="/anime", tags=["tags"])
 
@@ -42,32 +42,27 @@ async def get_anime_tags(
     if not anime_result.scalar_one_or_none():
         raise HTTPException(status_code=404, detail="Anime not found")
 
-    # Aggregate vote counts per tag for this anime
+    # Maintained per-(anime, tag) counts — index range scan on the (anime_id, mood_tag_id) PK, no aggregation over raw votes
     vote_counts = await db.execute(
         select(
             MoodTag,
-            func.count(UserAnimeMoodTag.user_id).label("total_votes"),
-            func.sum(
-                func.cast(UserAnimeMoodTag.user_id == SYSTEM_USER_ID, Integer)
-            ).label("system_votes")
+            AnimeTagCount.real_votes,
+            AnimeTagCount.system_votes,
         )
-        .outerjoin(UserAnimeMoodTag, (
-            UserAnimeMoodTag.mood_tag_id == MoodTag.id) &
-            (UserAnimeMoodTag.anime_id == anime_id)
+        .join(AnimeTagCount, AnimeTagCount.mood_tag_id == MoodTag.id)
+        .where(
+            AnimeTagCount.anime_id == anime_id,
+            MoodTag.is_approved == True,
+            (AnimeTagCount.real_votes + AnimeTagCount.system_votes) > 0,
         )
-        .where(MoodTag.is_approved == True)
-        .group_by(MoodTag.id)
-        .having(func.count(UserAnimeMoodTag.user_id) > 0)
-        .order_by(func.count(UserAnimeMoodTag.user_id).desc())
+        .order_by((AnimeTagCount.real_votes + AnimeTagCount.system_votes).desc())
     )
     rows = vote_counts.all()
 
     confirmed = []
     suggested = []
 
-    for tag, total_votes, system_votes in rows:
-        system_votes = system_votes or 0
-        real_votes = total_votes - system_votes
+    for tag, real_votes, system_votes in rows:
         is_confirmed = real_votes >= CONFIRMATION_THRESHOLD
 
         tag_data = TagResponse(
@@ -84,7 +79,7 @@ async def get_anime_tags(
             suggested.append(tag_data)
 
     # Tags with only system (LLM) votes surface here as suggested with vote_count=0.
-    # HAVING count > 0 checks total_votes including system votes, so LLM suggestions
+    # The > 0 filter checks total votes including system votes, so LLM suggestions
     # are visible to the frontend with lighter styling until real users confirm them.
     return AnimeTagsResponse(confirmed=confirmed, suggested=suggested)
 
@@ -122,12 +117,8 @@ async def apply_tag(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=409, detail="You've already applied this tag")
 
-    vote = UserAnimeMoodTag(
-        user_id=user_id,
-        anime_id=anime_id,
-        mood_tag_id=body.tag_id,
-    )
-    db.add(vote)
+    # Vote row + anime_tag_counts + change log, all in this transaction
+    await add_votes(db, user_id, [(anime_id, body.tag_id)])
     await db.commit()
 
     return {"message": "Tag applied"}
@@ -153,5 +144,5 @@ async def remove_tag(
     if not vote:
         raise HTTPException(status_code=404, detail="Tag vote not found")
 
-    await db.delete(vote)
+    await remove_vote(db, vote)
     await db.commit()
\ No newline at end of file
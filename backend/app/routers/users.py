@@ -1,76 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, cast, Numeric
 from app.database import get_db
-from app.models import User, UserAnimeRelationship, Anime, WatchStatus
-from app.schemas import UserProfileResponse
-from collections import Counter
+from app.models import User, UserAnimeRelationship, Anime, WatchStatus, UserProfileSummary
+from app.schemas import UserProfileResponse, SimilarUser
+from app.profile_summary import is_fresh, store_profile_summary
+from uuid import UUID
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# hnsw.ef_search — candidate list size per HNSW lookup. pgvector's default is 40.
+# Higher = better recall, slower. See benchmarks/bench_taste_ann.py for the tradeoff at 100k users.
+DEFAULT_EF_SEARCH = 100
+
+# Profile statistics are aggregated in Postgres — the user's list never leaves the database — and the
+# result is cached per user in user_profile_summaries (app/profile_summary.py). A view of an unchanged
+# profile is one query: the user row joined to its summary by primary key. After a list write, the next
+# view recomputes: two aggregate queries (stats, genres) whatever the list size, then one upsert.
+PROFILE_STATUSES = (
+    WatchStatus.completed, WatchStatus.watching, WatchStatus.on_hold, WatchStatus.plan_to_watch, WatchStatus.dropped,
+)
+SCORE_BUCKETS = 10
+TOP_GENRES = 10
+
+
+def profile_stats_query(user_id: UUID):
+    """Status counts, mean score and 1-10 score histogram over the user's list, as one aggregate row."""
+    rel = UserAnimeRelationship
+    # Bucket k holds scores in [k - 0.5, k + 0.5) — whole-number rounding, half up
+    bucket = func.width_bucket(rel.computed_overall, 0.5, SCORE_BUCKETS + 0.5, SCORE_BUCKETS)
+    return (
+        select(
+            func.count().label("total"),
+            *[func.count().filter(rel.status == status).label(status.name) for status in PROFILE_STATUSES],
+            func.round(cast(func.avg(rel.computed_overall), Numeric), 2).label("mean_score"),
+            *[func.count().filter(bucket == k).label(f"score_{k}") for k in range(1, SCORE_BUCKETS + 1)],
+        )
+        .where(rel.user_id == user_id)
+    )
+
+
+def genre_breakdown_query(user_id: UUID, limit: int = TOP_GENRES):
+    """Most common genres on the user's list. unnest() in FROM is implicitly LATERAL — one row per (entry, genre)."""
+    genre = func.unnest(Anime.genres).column_valued("genre")
+    count = func.count().label("count")
+    return (
+        select(genre, count)
+        .select_from(UserAnimeRelationship)
+        .join(Anime, UserAnimeRelationship.anime_id == Anime.id)
+        .where(UserAnimeRelationship.user_id == user_id)
+        .group_by(genre)
+        .order_by(count.desc(), genre)
+        .limit(limit)
+    )
+
+
+async def compute_profile_summary(db: AsyncSession, user_id: UUID) -> dict:
+    """stats, genre_breakdown and score_distribution for a profile, straight from the list."""
+    stats = (await db.execute(profile_stats_query(user_id))).one()
+    genre_result = await db.execute(genre_breakdown_query(user_id))
+    return {
+        "stats": {
+            "total": stats.total,
+            **{status.name: stats._mapping[status.name] for status in PROFILE_STATUSES},
+            "mean_score": float(stats.mean_score) if stats.mean_score is not None else None,
+        },
+        "genre_breakdown": [{"genre": genre, "count": count} for genre, count in genre_result.all()],
+        "score_distribution": {str(k): stats._mapping[f"score_{k}"] for k in range(1, SCORE_BUCKETS + 1)},
+    }
+
+
 @router.get("/{username}", response_model=UserProfileResponse)
 async def get_user_profile(
     username: str,
     db: AsyncSession = Depends(get_db)
 ):
     """User profile — list stats, genre breakdown, score distribution."""
-    # Get user
+    result = await db.execute(
+        select(
+            User.id, User.username, User.avatar_url,
+            UserProfileSummary.version, UserProfileSummary.computed_version, UserProfileSummary.summary,
+        )
+        .outerjoin(UserProfileSummary, UserProfileSummary.user_id == User.id)
+        .where(User.username == username)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    summary = row.summary
+    if not is_fresh(row.version, row.computed_version, summary):
+        # The version read above predates the aggregates — a write landing in between leaves the row dirty
+        summary = await compute_profile_summary(db, row.id)
+        await store_profile_summary(db, row.id, row.version or 0, summary)
+        await db.commit()
+
+    return {
+        "user_id": row.id,
+        "username": row.username,
+        "avatar_url": row.avatar_url,
+        "stats": summary["stats"],
+        "genre_breakdown": summary["genre_breakdown"],
+        "score_distribution": summary["score_distribution"],
+    }
+
+
+@router.get("/{username}/similar", response_model=list[SimilarUser])
+async def get_similar_users(
+    username: str,
+    limit: int = Query(10, ge=1, le=50),
+    ef_search: int = Query(DEFAULT_EF_SEARCH, ge=10, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """People with taste like yours — top-k users by taste_vector cosine distance (<=>).
+    Served by the HNSW index (approximate). Raise ef_search to trade latency for recall.
+    Returns [] if the user has no taste vector yet (<5 scored anime).
+    """
     result = await db.execute(
         select(User).where(User.username == username)
     )
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if user.taste_vector is None:
+        return []
 
-    # Get all relationships with anime joined
-    rel_result = await db.execute(
-        select(UserAnimeRelationship, Anime)
-        .join(Anime, UserAnimeRelationship.anime_id == Anime.id)
-        .where(UserAnimeRelationship.user_id == user.id)
+    # set_config(..., is_local=true) scopes ef_search to this transaction — SET LOCAL can't take bind params
+    await db.execute(select(func.set_config("hnsw.ef_search", str(ef_search), True)))
+
+    # ORDER BY vector <=> constant + LIMIT is the shape the HNSW index serves.
+    # NULL vectors are never returned by the index, the filter just makes that explicit.
+    distance = User.taste_vector.cosine_distance(user.taste_vector)
+    similar_result = await db.execute(
+        select(User.username, User.avatar_url, distance.label("distance"))
+        .where(
+            User.id != user.id,
+            User.taste_vector.isnot(None),
+            User.is_active == True,
+        )
+        .order_by(distance)
+        .limit(limit)
     )
-    rows = rel_result.all()
-
-    # Stats
-    total = len(rows)
-    completed = sum(1 for r, _ in rows if r.status == WatchStatus.completed)
-    watching = sum(1 for r, _ in rows if r.status == WatchStatus.watching)
-    plan_to_watch = sum(1 for r, _ in rows if r.status == WatchStatus.plan_to_watch)
-    dropped = sum(1 for r, _ in rows if r.status == WatchStatus.dropped)
-
-    scores = [r.computed_overall for r, _ in rows if r.computed_overall is not None]
-    mean_score = round(sum(scores) / len(scores), 2) if scores else None
-
-    # Genre breakdown
-    genre_counter = Counter()
-    for _, anime in rows:
-        if anime.genres:
-            for genre in anime.genres:
-                genre_counter[genre] += 1
-    genre_breakdown = [
-        {"genre": genre, "count": count}
-        for genre, count in genre_counter.most_common(10)
-    ]
-
-    # Score distribution (1-10)
-    score_distribution = {str(i): 0 for i in range(1, 11)}
-    for score in scores:
-        if score is not None:
-            rounded = str(int(round(score)))
-        if rounded in score_distribution:
-            score_distribution[rounded] += 1
 
-    return {
-        "user_id": user.id,
-        "username": user.username,
-        "avatar_url": user.avatar_url,
-        "stats": {
-            "total": total,
-            "completed": completed,
-            "watching": watching,
-            "plan_to_watch": plan_to_watch,
-            "dropped": dropped,
-            "mean_score": mean_score,
-        },
-        "genre_breakdown": genre_breakdown,
-        "score_distribution": score_distribution,
-    }
\ No newline at end of file
+    return [
+        SimilarUser(
+            username=row.username,
+            avatar_url=row.avatar_url,
+            similarity=round(1 - row.distance, 4),
+        )
+        for row in similar_result.all()
+    ]
\ No newline at end of file
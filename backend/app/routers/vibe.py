@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, values, column, String
 from app.database import get_db
-from app.models import Anime, MoodTag, UserAnimeMoodTag
+from app.models import Anime, MoodTag, AnimeTagCount
 from pydantic import BaseModel
 from uuid import UUID
 from typing import Optional
+from app.cache import GenerationCache
+from app.job_state import get_generation, VIBE_AGGREGATION_JOB
 
 router = APIRouter(prefix="/vibe", tags=["vibe"])
 
@@ -69,91 +71,128 @@ class VibeCluster(BaseModel):
     anime: list[AnimeCard]
 
 
-async def get_anime_for_slugs(
-    slugs: list[str],
+def build_card(anime: Anime) -> AnimeCard:
+    """Card with the anime's data plus its top 3 tags from cached_vibe_tags — no extra join."""
+    # if this anime has any cached vibe tags in its JSONB column
+    top_tags = []
+    if anime.cached_vibe_tags:
+        sorted_tags = sorted(
+            anime.cached_vibe_tags.items(),
+            key=lambda x: x[1].get("count", 0),
+            reverse=True
+        )
+        # Take the top 3 after sorting, extract just the label strings
+        top_tags = [v["label"] for _, v in sorted_tags[:3]]
+
+    return AnimeCard(
+        id=anime.id,
+        title=anime.title,
+        title_english=anime.title_english,
+        cover_url=anime.cover_url,
+        genres=anime.genres,
+        anilist_score=anime.average_score,
+        top_tags=top_tags,
+    )
+
+
+async def get_anime_for_clusters(
+    clusters: dict[str, list[str]],  # cluster id → tag slugs
     limit: int,
     db: AsyncSession,
-    slug_to_id: dict,  # Pre-fetched slug → tag_id map. Never query inside this function.
-) -> list[AnimeCard]:
-    """Returns top N anime that have the most votes across a set of tag slugs.
-    slug_to_id must be pre-fetched by the caller — no DB calls for tag IDs here.
+) -> dict[str, list[AnimeCard]]:
+    """Returns the top N anime per cluster by votes across that cluster's tag slugs — all clusters in one query.
+
+    1. cluster_tags: VALUES CTE mapping cluster id → slug, joined to mood_tags by slug (no separate tag ID fetch)
+    2. cluster_votes: vote count per (cluster, anime), summed from anime_tag_counts
+    3. ROW_NUMBER() OVER (PARTITION BY cluster ORDER BY votes DESC, average_score DESC) keeps the top N per cluster
+    Ties on votes go to the higher AniList score, same as the old per-cluster query.
+    Clusters with no tagged anime come back as empty lists.
     """
-    tag_ids = [slug_to_id[s] for s in slugs if s in slug_to_id]
-    if not tag_ids:
-        return []
+    pairs = [(cluster_id, slug) for cluster_id, slugs in clusters.items() for slug in slugs]
+    if not pairs:
+        return {cluster_id: [] for cluster_id in clusters}
+
+    cluster_tags = (
+        values(column("cluster_id", String), column("slug", String), name="cluster_tags")
+        .data(pairs)
+        .cte("cluster_tags")
+    )
+
+    # Sums maintained anime_tag_counts rows (real + system votes) instead of counting raw vote rows
+    total_votes = func.sum(AnimeTagCount.real_votes + AnimeTagCount.system_votes)
+    cluster_votes = (
+        select(
+            cluster_tags.c.cluster_id,
+            AnimeTagCount.anime_id,
+            total_votes.label("tag_votes"),
+        )
+        .select_from(cluster_tags)
+        .join(MoodTag, MoodTag.slug == cluster_tags.c.slug)
+        .join(AnimeTagCount, AnimeTagCount.mood_tag_id == MoodTag.id)
+        .group_by(cluster_tags.c.cluster_id, AnimeTagCount.anime_id)
+        .having(total_votes > 0)
+        .cte("cluster_votes")
+    )
 
-    anime_result = await db.execute(
+    ranked = (
         select(
-            Anime,
-            func.count(UserAnimeMoodTag.user_id).label("tag_votes")
+            cluster_votes.c.cluster_id,
+            cluster_votes.c.anime_id,
+            func.row_number().over(
+                partition_by=cluster_votes.c.cluster_id,
+                order_by=(cluster_votes.c.tag_votes.desc(), Anime.average_score.desc().nullslast(), Anime.id),
+            ).label("rank"),
         )
-        .join(UserAnimeMoodTag, UserAnimeMoodTag.anime_id == Anime.id)
-        .where(UserAnimeMoodTag.mood_tag_id.in_(tag_ids))
-        .group_by(Anime.id)
-        .order_by(func.count(UserAnimeMoodTag.user_id).desc(), Anime.average_score.desc().nullslast())
-        .limit(limit)
+        .join(Anime, Anime.id == cluster_votes.c.anime_id)
+        .subquery("ranked")
     )
-    rows = anime_result.all()
-
-    # each tuple is (Anime object, vote count).
-    cards = []
-    for anime, _ in rows:
-        # if this anime has any cached vibe tags in its JSONB column
-        top_tags = []
-        if anime.cached_vibe_tags:
-            sorted_tags = sorted(
-                anime.cached_vibe_tags.items(),
-                key=lambda x: x[1].get("count", 0),
-                reverse=True
-            )
-            # Take the top 3 after sorting, extract just the label strings
-            top_tags = [v["label"] for _, v in sorted_tags[:3]]
-
-        # Build a card object with the anime's data plus those top 3 tags, add it to the list.
-        # Repeat for every anime in the query results.
-        cards.append(AnimeCard(
-            id=anime.id,
-            title=anime.title,
-            title_english=anime.title_english,
-            cover_url=anime.cover_url,
-            genres=anime.genres,
-            anilist_score=anime.average_score,
-            top_tags=top_tags,
-        ))
+
+    result = await db.execute(
+        select(ranked.c.cluster_id, Anime)
+        .join(Anime, Anime.id == ranked.c.anime_id)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.cluster_id, ranked.c.rank)
+    )
+
+    cards = {cluster_id: [] for cluster_id in clusters}
+    for cluster_id, anime in result.all():
+        cards[cluster_id].append(build_card(anime))
     return cards
 
-# TODO: If browse page feels slow with real data, cache entire GET / response with 4hr TTL.
-# Response only changes when aggregation job runs — caching is safe and trivial to add.
+# Browse payload + drill-downs, keyed by the aggregation job's generation.
+# Response only changes meaningfully when aggregate_vibe_tags lands new data — the scheduler bumps
+# the generation as the last write of each run, so entries are invalidated exactly then, not on a TTL.
+# Per-process: each uvicorn worker warms its own copy on the first hit after a new generation.
+# maxsize covers 8 clusters + every tag slug + the browse payload with room to spare.
+_vibe_cache = GenerationCache(maxsize=128)
+BROWSE_CACHE_KEY = "__browse__"
 
 @router.get("/", response_model=list[VibeCluster])
 async def get_vibe_browse(
     db: AsyncSession = Depends(get_db)
 ):
-    """Browse page — returns all clusters with top 5 anime each.
-    Bulk-fetches all tag IDs in one query before the cluster loop.
+    """Browse page — returns all clusters with top 8 anime each.
+    All clusters are ranked in a single query (see get_anime_for_clusters).
     Only clusters with at least one tagged anime are returned.
+    Served from _vibe_cache until the aggregation job lands a new generation — one PK lookup per hit.
     """
-    # Single bulk fetch for all tag IDs across all clusters — 1 query of all unique tag slugs across all clusters instead of 8
-    # Loops through every cluster, pulls out every slug from every cluster, and deduplicates them.
-    all_slugs = list({slug for cluster in VIBE_CLUSTERS for slug in cluster["slugs"]})
-    tag_result = await db.execute(
-        select(MoodTag.slug, MoodTag.id).where(MoodTag.slug.in_(all_slugs))
+    generation = await get_generation(db, VIBE_AGGREGATION_JOB)
+    cached = _vibe_cache.get(generation, BROWSE_CACHE_KEY)
+    if cached is not None:
+        return cached
+
+    # One round trip ranks every cluster — cold-cache latency is one query, not eight.
+    anime_by_cluster = await get_anime_for_clusters(
+        {cluster["id"]: cluster["slugs"] for cluster in VIBE_CLUSTERS}, limit=8, db=db
     )
-    slug_to_id = {slug: tag_id for slug, tag_id in tag_result.all()}
-
-    clusters = []
-    # Loop through each predefined cluster. For each one, find the top 5 anime that have votes on any of that cluster's tags.
-    # If a cluster has zero tagged anime (nobody's voted), skip it entirely.
-    for cluster in VIBE_CLUSTERS:
-        anime = await get_anime_for_slugs(
-            cluster["slugs"], limit=8, db=db, slug_to_id=slug_to_id
-        )
-        if anime:
-            clusters.append(VibeCluster(
-                id=cluster["id"],
-                label=cluster["label"],
-                anime=anime,
-            ))
+
+    # Keep VIBE_CLUSTERS order. If a cluster has zero tagged anime (nobody's voted), skip it entirely.
+    clusters = [
+        VibeCluster(id=cluster["id"], label=cluster["label"], anime=anime_by_cluster[cluster["id"]])
+        for cluster in VIBE_CLUSTERS
+        if anime_by_cluster[cluster["id"]]
+    ]
+    _vibe_cache.set(generation, BROWSE_CACHE_KEY, clusters)
     return clusters
 
 
@@ -162,7 +201,14 @@ async def get_vibe_by_slug(
     slug: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """Drill-down — returns all anime for a single tag slug or cluster id."""
+    """Drill-down — returns all anime for a single tag slug or cluster id.
+    Cached per aggregation generation like the browse page. 404s are never cached.
+    """
+    generation = await get_generation(db, VIBE_AGGREGATION_JOB)
+    cached = _vibe_cache.get(generation, slug)
+    if cached is not None:
+        return cached
+
     # Check if the incoming slug matches a cluster ID. next() with a generator finds the first match or returns None.
     # I.E. So if someone hits /vibe/late-night, it finds the "Late Night Watch" cluster.
     cluster = next((c for c in VIBE_CLUSTERS if c["id"] == slug), None)
@@ -180,15 +226,11 @@ async def get_vibe_by_slug(
         if not tag:
             # Didn't match a cluster or a tag
             raise HTTPException(status_code=404, detail="Tag or cluster not found")
-        # Wrap single slug in a list so get_anime_for_slugs handles it the same as clusters
+        # Wrap single slug in a list so get_anime_for_clusters handles it the same as clusters
         slugs = [slug]
         label = tag.label
 
-    # Single tag drill-down still needs its own slug_to_id fetch
-    tag_id_result = await db.execute(
-        select(MoodTag.slug, MoodTag.id).where(MoodTag.slug.in_(slugs))
-    )
-    slug_to_id = {s: tid for s, tid in tag_id_result.all()}
-
-    anime = await get_anime_for_slugs(slugs, limit=50, db=db, slug_to_id=slug_to_id)
-    return VibeCluster(id=slug, label=label, anime=anime)
\ No newline at end of file
+    anime = (await get_anime_for_clusters({slug: slugs}, limit=50, db=db))[slug]
+    response = VibeCluster(id=slug, label=label, anime=anime)
+    _vibe_cache.set(generation, slug, response)
+    return response
\ No newline at end of file
@@ -1,11 +1,22 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update
+from sqlalchemy import select, func, text, bindparam, Integer, BigInteger, Text
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from app.database import AsyncSessionLocal
-from app.models import MoodTag, UserAnimeMoodTag, Anime
+from app.models import MoodTag, AnimeTagCount, MoodTagVoteChange
+from app.constants import SYSTEM_USER_ID
 from collections import defaultdict
+from typing import Optional
+import asyncio
+import json
 import logging
 from app.llm_suggest import run_llm_suggest
+from app.taste_vector import compute_taste_vectors
+from app.taste_compatibility import compute_taste_compatibility
+from app.catalog_sync import sync_catalog
+from app.synopsis_embedding import embed_synopses
+from app.anime_stats import rebuild_anime_stats
+from app.job_state import bump_generation, VIBE_AGGREGATION_JOB
 
 # TODO: Consider migrating to Supabase pg_cron in production if APScheduler becomes a bottleneck
 # TODO: Add presence TTL cleanup job here in Phase 4 (purge presence records older than 30 min)
@@ -20,59 +31,345 @@ logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
-async def aggregate_vibe_tags():
-    """Runs every 4 hours.
-    1. Single bulk query aggregates tag vote counts across all anime at once
+# Incremental runs and the daily full rebuild must never interleave —
+# a full rebuild clears the change log that an incremental run may be halfway through.
+_aggregation_lock = asyncio.Lock()
+
+async def aggregate_vibe_tags(full: bool = False):
+    """Runs every 4 hours (incremental) and every 24 hours (full rebuild).
+
+    Incremental (default):
+    1. Read the change log rows visible in the snapshot, netted per (anime, tag), with their ids
+    2. Recompute cached_vibe_tags only for anime touched since the last run
+    3. Apply net vote deltas to usage_count only for tags touched since the last run
+    4. Delete exactly the change log rows read in step 1, in the same transaction as the usage_count update
+
+    Full (full=True) — safety net against drift:
+    1. Corrects anime_tag_counts pairs that drifted from raw votes, then reads it in a single bulk query
     2. Groups results in Python by anime_id
-    3. Batch updates cached_vibe_tags JSONB on anime table
-    4. Batch updates usage_count on mood_tags table
+    3. Rewrites cached_vibe_tags and usage_count from scratch — anime and tags with no votes left go to {} and 0
+    4. Deletes the change log rows visible in the snapshot — their votes are already counted
+
+    The read phase runs in a REPEATABLE READ transaction so the change log rows and the vote
+    counts come from the same snapshot. Consumed rows are deleted by id, not by an id range:
+    sequence ids are handed out before commit, so a vote committed mid-run can carry an id lower
+    than rows the snapshot saw. It stays in the log and is picked up next time — never counted twice, never missed.
+
+    Every run that lands data bumps the job's generation in job_state as its last write —
+    GET /vibe/ responses are cached per generation.
+
+    Write-back is set-based: one UPDATE ... FROM unnest() per WRITE_BACK_CHUNK_SIZE anime,
+    committed per chunk so row locks on anime are held briefly instead of for the whole run.
 
     usage_count is maintained here — never increment it in application code.
     """
-    logger.info("Starting vibe tag aggregation...")
+    async with _aggregation_lock:
+        if full:
+            await _aggregate_full()
+        else:
+            await _aggregate_incremental()
+
+# Rows per set-based UPDATE. Each chunk is its own short transaction.
+WRITE_BACK_CHUNK_SIZE = 1000
+
+# Arrays in, one statement out. Postgres zips the unnest() arrays back into rows and joins on id —
+# 1000 anime cost one round trip instead of 1000. JSON goes over the wire as text and is cast server-side.
+# Typed bindparams make the asyncpg dialect render the array casts ($1::UUID[]) itself.
+_BULK_UPDATE_VIBE_TAGS = text("""
+    UPDATE anime AS a
+    SET cached_vibe_tags = CAST(v.tags AS jsonb)
+    FROM unnest(:ids, :tags) AS v(id, tags)
+    WHERE a.id = v.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("tags", type_=ARRAY(Text)),
+)
+
+_BULK_SET_USAGE_COUNTS = text("""
+    UPDATE mood_tags AS m
+    SET usage_count = v.total
+    FROM unnest(:ids, :totals) AS v(id, total)
+    WHERE m.id = v.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("totals", type_=ARRAY(Integer)),
+)
+
+_BULK_ADD_USAGE_DELTAS = text("""
+    UPDATE mood_tags AS m
+    SET usage_count = COALESCE(m.usage_count, 0) + v.delta
+    FROM unnest(:ids, :deltas) AS v(id, delta)
+    WHERE m.id = v.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("deltas", type_=ARRAY(Integer)),
+)
+
+# Full run only: anime_tag_counts rows at zero never reach the counts read, so anime and tags whose
+# votes all went away (a deleted user's votes leave no change log) are reset here instead.
+# Everything named in the snapshot's results is skipped — it was just written.
+_CLEAR_UNVOTED_VIBE_TAGS = text("""
+    UPDATE anime
+    SET cached_vibe_tags = '{}'::jsonb
+    WHERE cached_vibe_tags <> '{}'::jsonb AND id <> ALL(:ids)
+""").bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+
+_CLEAR_UNVOTED_USAGE_COUNTS = text("""
+    UPDATE mood_tags
+    SET usage_count = 0
+    WHERE usage_count <> 0 AND id <> ALL(:ids)
+""").bindparams(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+
+_DELETE_CONSUMED_CHANGES = text("""
+    DELETE FROM mood_tag_vote_changes WHERE id = ANY(:ids)
+""").bindparams(bindparam("ids", type_=ARRAY(BigInteger)))
+
+# Drift check for the full run. anime_tag_counts is written in the same transaction as every vote,
+# so inside one snapshot the two tables agree unless something bypassed tag_votes.py.
+# FULL JOIN ... USING merges the key columns: pairs missing on either side compare as zero.
+_FIND_DRIFTED_TAG_COUNTS = text("""
+    SELECT anime_id, mood_tag_id
+    FROM (
+        SELECT anime_id, mood_tag_id,
+               count(*) FILTER (WHERE user_id <> :system_user_id) AS real_votes,
+               count(*) FILTER (WHERE user_id = :system_user_id) AS system_votes
+        FROM user_anime_mood_tags
+        GROUP BY anime_id, mood_tag_id
+    ) AS raw
+    FULL JOIN anime_tag_counts AS c USING (anime_id, mood_tag_id)
+    WHERE (COALESCE(raw.real_votes, 0), COALESCE(raw.system_votes, 0))
+          IS DISTINCT FROM (COALESCE(c.real_votes, 0), COALESCE(c.system_votes, 0))
+    ORDER BY anime_id, mood_tag_id
+""").bindparams(bindparam("system_user_id", type_=UUID(as_uuid=True)))
+
+# Correction of a chunk of drifted pairs, one transaction, three statements:
+#   1. make sure every pair has a row — ON CONFLICT DO NOTHING waits out a vote inserting the same pair
+#   2. lock the rows in key order — a vote on a pair now waits for us, or we wait for its commit
+#   3. recount just those pairs and overwrite
+# The lock must come before the recount: an UPDATE that only blocks on the row lock would keep
+# the counts its subquery read before the wait, and miss the vote it waited for.
+_INSERT_MISSING_TAG_COUNTS = text("""
+    INSERT INTO anime_tag_counts (anime_id, mood_tag_id, real_votes, system_votes)
+    SELECT p.anime_id, p.mood_tag_id, 0, 0
+    FROM unnest(:anime_ids, :tag_ids) AS p(anime_id, mood_tag_id)
+    ORDER BY p.anime_id, p.mood_tag_id
+    ON CONFLICT (anime_id, mood_tag_id) DO NOTHING
+""").bindparams(
+    bindparam("anime_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("tag_ids", type_=ARRAY(UUID(as_uuid=True))),
+)
+
+_LOCK_TAG_COUNTS = text("""
+    SELECT 1
+    FROM anime_tag_counts AS c
+    JOIN unnest(:anime_ids, :tag_ids) AS p(anime_id, mood_tag_id)
+      ON c.anime_id = p.anime_id AND c.mood_tag_id = p.mood_tag_id
+    ORDER BY c.anime_id, c.mood_tag_id
+    FOR UPDATE OF c
+""").bindparams(
+    bindparam("anime_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("tag_ids", type_=ARRAY(UUID(as_uuid=True))),
+)
+
+# Pairs with no raw votes left keep a row but drop to zero — readers filter on > 0
+_RECOUNT_TAG_COUNTS = text("""
+    UPDATE anime_tag_counts AS c
+    SET real_votes = v.real_votes, system_votes = v.system_votes
+    FROM (
+        SELECT p.anime_id, p.mood_tag_id,
+               count(m.user_id) FILTER (WHERE m.user_id <> :system_user_id) AS real_votes,
+               count(m.user_id) FILTER (WHERE m.user_id = :system_user_id) AS system_votes
+        FROM unnest(:anime_ids, :tag_ids) AS p(anime_id, mood_tag_id)
+        LEFT JOIN user_anime_mood_tags m ON m.anime_id = p.anime_id AND m.mood_tag_id = p.mood_tag_id
+        GROUP BY p.anime_id, p.mood_tag_id
+    ) AS v
+    WHERE c.anime_id = v.anime_id AND c.mood_tag_id = v.mood_tag_id
+      AND (c.real_votes, c.system_votes) IS DISTINCT FROM (v.real_votes, v.system_votes)
+""").bindparams(
+    bindparam("system_user_id", type_=UUID(as_uuid=True)),
+    bindparam("anime_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("tag_ids", type_=ARRAY(UUID(as_uuid=True))),
+)
+
+async def _write_vibe_tags(db: AsyncSession, anime_tag_map: dict):
+    """Bulk write cached_vibe_tags in chunks. Commits after every chunk."""
+    items = list(anime_tag_map.items())
+    for start in range(0, len(items), WRITE_BACK_CHUNK_SIZE):
+        chunk = items[start:start + WRITE_BACK_CHUNK_SIZE]
+        await db.execute(_BULK_UPDATE_VIBE_TAGS, {
+            "ids": [anime_id for anime_id, _ in chunk],
+            "tags": [json.dumps(cached) for _, cached in chunk],
+        })
+        await db.commit()
+
+async def _write_usage_counts(db: AsyncSession, tag_usage: dict):
+    """Overwrite usage_count for every tag in one statement. ~65 tags — no chunking needed.
+    Caller commits.
+    """
+    if not tag_usage:
+        return
+    await db.execute(_BULK_SET_USAGE_COUNTS, {
+        "ids": list(tag_usage.keys()),
+        "totals": list(tag_usage.values()),
+    })
+
+async def _write_usage_deltas(db: AsyncSession, tag_deltas: dict):
+    """Add net deltas to usage_count in one statement. Caller commits."""
+    if not tag_deltas:
+        return
+    await db.execute(_BULK_ADD_USAGE_DELTAS, {
+        "ids": list(tag_deltas.keys()),
+        "deltas": list(tag_deltas.values()),
+    })
+
+async def _begin_snapshot(db: AsyncSession):
+    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+async def _visible_change_ids(db: AsyncSession) -> list[int]:
+    """Ids of every change log row this snapshot can see."""
+    return list((await db.execute(select(MoodTagVoteChange.id))).scalars())
+
+async def _delete_changes(db: AsyncSession, ids: list[int]):
+    """Delete consumed change log rows by id. Caller commits."""
+    if ids:
+        await db.execute(_DELETE_CONSUMED_CHANGES, {"ids": ids})
+
+async def _count_tags_per_anime(db: AsyncSession, anime_ids: Optional[set] = None):
+    """Tag vote counts grouped by anime, read from maintained anime_tag_counts. anime_ids=None means every anime.
+    Returns ({anime_id: {slug: {label, count}}}, {tag_id: total_votes}).
+    count includes system votes — same as the raw vote row count it replaces.
+    """
+    total_votes = AnimeTagCount.real_votes + AnimeTagCount.system_votes
+    query = (
+        select(
+            AnimeTagCount.anime_id,
+            MoodTag.id,
+            MoodTag.slug,
+            MoodTag.label,
+            total_votes.label("count")
+        )
+        .join(MoodTag, AnimeTagCount.mood_tag_id == MoodTag.id)
+        .where(total_votes > 0)
+        .order_by(AnimeTagCount.anime_id, total_votes.desc())
+    )
+    if anime_ids is not None:
+        # PK prefix lookup on anime_tag_counts — cost scales with touched anime, not total votes
+        query = query.where(AnimeTagCount.anime_id.in_(anime_ids))
+    rows = (await db.execute(query)).all()
+
+    # Group in Python by anime_id
+    anime_tag_map = defaultdict(dict)
+    tag_usage = defaultdict(int)
+
+    for anime_id, tag_id, slug, label, count in rows:
+        anime_tag_map[anime_id][slug] = {"label": label, "count": count}
+        tag_usage[tag_id] += count
+    return anime_tag_map, tag_usage
+
+async def _correct_tag_counts(db: AsyncSession) -> int:
+    """Bring anime_tag_counts back in line with raw user_anime_mood_tags — the drift safety net.
+    No table lock: drift is found by comparing both tables in one snapshot, then only the drifted
+    pairs are recounted, under row locks, WRITE_BACK_CHUNK_SIZE per transaction. Votes on every other
+    pair never wait. Returns the number of pairs corrected. Commits.
+    """
+    await _begin_snapshot(db)
+    drifted = (await db.execute(_FIND_DRIFTED_TAG_COUNTS, {"system_user_id": SYSTEM_USER_ID})).all()
+    await db.commit()
+
+    for start in range(0, len(drifted), WRITE_BACK_CHUNK_SIZE):
+        chunk = drifted[start:start + WRITE_BACK_CHUNK_SIZE]
+        pairs = {
+            "anime_ids": [anime_id for anime_id, _ in chunk],
+            "tag_ids": [tag_id for _, tag_id in chunk],
+        }
+        await db.execute(_INSERT_MISSING_TAG_COUNTS, pairs)
+        await db.execute(_LOCK_TAG_COUNTS, pairs)
+        await db.execute(_RECOUNT_TAG_COUNTS, {**pairs, "system_user_id": SYSTEM_USER_ID})
+        await db.commit()
+    return len(drifted)
+
+async def _aggregate_full():
+    logger.info("Starting full vibe tag aggregation...")
     async with AsyncSessionLocal() as db:
+        drifted = await _correct_tag_counts(db)
+        if drifted:
+            logger.warning(f"anime_tag_counts had drifted for {drifted} (anime, tag) pairs — corrected.")
+
+        await _begin_snapshot(db)
+        consumed = await _visible_change_ids(db)
 
         # Single query — all tag counts across all anime at once. No N+1.
-        all_counts_result = await db.execute(
+        anime_tag_map, tag_usage = await _count_tags_per_anime(db)
+
+        # Read phase done — end the snapshot before writing so no locks are held during it
+        await db.commit()
+
+        await _write_vibe_tags(db, anime_tag_map)
+
+        # usage_count, the resets and the log cleanup commit together.
+        # Every change the snapshot saw is reflected in the counts above; later ones stay in the log.
+        await _write_usage_counts(db, tag_usage)
+        await db.execute(_CLEAR_UNVOTED_USAGE_COUNTS, {"ids": list(tag_usage)})
+        await db.execute(_CLEAR_UNVOTED_VIBE_TAGS, {"ids": list(anime_tag_map)})
+        await _delete_changes(db, consumed)
+        # New generation invalidates the /vibe response cache in every web process
+        await bump_generation(db, VIBE_AGGREGATION_JOB)
+        await db.commit()
+    logger.info(f"Full vibe tag aggregation complete. {len(anime_tag_map)} anime updated.")
+
+async def _aggregate_incremental():
+    logger.info("Starting incremental vibe tag aggregation...")
+    async with AsyncSessionLocal() as db:
+        await _begin_snapshot(db)
+
+        # Net delta per (anime, tag) since the last run. +1 then -1 on the same pair nets to 0
+        # but the anime is still recomputed — cheap, and keeps the logic obviously correct.
+        change_result = await db.execute(
             select(
-                UserAnimeMoodTag.anime_id,
-                MoodTag.id,
-                MoodTag.slug,
-                MoodTag.label,
-                func.count(UserAnimeMoodTag.user_id).label("count")
+                MoodTagVoteChange.anime_id,
+                MoodTagVoteChange.mood_tag_id,
+                func.sum(MoodTagVoteChange.delta).label("delta"),
+                func.array_agg(MoodTagVoteChange.id).label("ids"),
             )
-            .join(MoodTag, UserAnimeMoodTag.mood_tag_id == MoodTag.id)
-            .group_by(UserAnimeMoodTag.anime_id, MoodTag.id, MoodTag.slug, MoodTag.label)
-            .order_by(UserAnimeMoodTag.anime_id, func.count(UserAnimeMoodTag.user_id).desc())
+            .group_by(MoodTagVoteChange.anime_id, MoodTagVoteChange.mood_tag_id)
         )
-        rows = all_counts_result.all()
-
-        # Group in Python by anime_id
-        anime_tag_map = defaultdict(dict)
-        tag_usage = defaultdict(int)
-
-        for anime_id, tag_id, slug, label, count in rows:
-            anime_tag_map[anime_id][slug] = {"label": label, "count": count}
-            tag_usage[tag_id] += count
-
-        # Update cached_vibe_tags per anime — one UPDATE per anime, unavoidable
-        for anime_id, cached in anime_tag_map.items():
-            await db.execute(
-                update(Anime)
-                .where(Anime.id == anime_id)
-                .values(cached_vibe_tags=cached)
-            )
+        touched_anime = set()
+        tag_deltas = defaultdict(int)
+        consumed = []
+        for anime_id, tag_id, delta, ids in change_result.all():
+            touched_anime.add(anime_id)
+            tag_deltas[tag_id] += delta
+            consumed.extend(ids)
+        if not consumed:
+            logger.info("No tag votes changed since last run. Nothing to aggregate.")
+            return
 
-        # Update usage_count per tag
-        for tag_id, total in tag_usage.items():
-            await db.execute(
-                update(MoodTag)
-                .where(MoodTag.id == tag_id)
-                .values(usage_count=total)
-            )
+        # Recount only the touched anime — their full tag set, not just the changed tags
+        anime_tag_map, _ = await _count_tags_per_anime(db, touched_anime)
+
+        await db.commit()
+
+        # Touched anime with no votes left get an empty cache instead of a stale one
+        await _write_vibe_tags(db, {anime_id: anime_tag_map.get(anime_id, {}) for anime_id in touched_anime})
 
+        # usage_count moves by the net delta — no recount over the whole votes table.
+        # Applied in the same transaction that deletes the consumed log rows, so a crash
+        # can never apply the same delta twice.
+        await _write_usage_deltas(db, {t: d for t, d in tag_deltas.items() if d != 0})
+        await _delete_changes(db, consumed)
+        await bump_generation(db, VIBE_AGGREGATION_JOB)
         await db.commit()
-    logger.info(f"Vibe tag aggregation complete. {len(anime_tag_map)} anime updated.")
+    logger.info(f"Incremental vibe tag aggregation complete. {len(touched_anime)} anime updated.")
+
+async def refresh_taste_data():
+    """Runs every 24 hours. Compatibility is computed from the vectors, so it always runs second."""
+    await compute_taste_vectors()
+    await compute_taste_compatibility()
+
+async def refresh_catalog():
+    """Runs every 24 hours. Embeds after the sync so new and changed synopses are searchable the same night."""
+    await sync_catalog()
+    await embed_synopses()
 
 def start_scheduler():
     scheduler.add_job(
@@ -82,6 +379,15 @@ def start_scheduler():
         id="aggregate_vibe_tags",
         replace_existing=True,
     )
+    # Full rebuild — safety net in case the change log and the counts ever drift apart
+    scheduler.add_job(
+        aggregate_vibe_tags,
+        trigger="interval",
+        hours=24,
+        kwargs={"full": True},
+        id="aggregate_vibe_tags_full",
+        replace_existing=True,
+    )
     scheduler.add_job(
         run_llm_suggest,
         trigger="interval",
@@ -89,5 +395,29 @@ def start_scheduler():
         id="llm_suggest",
         replace_existing=True,
     )
+    # Nightly AniList catalog refresh — new titles, scores, episode counts — then synopsis embeddings
+    # for whatever the sync added or changed. Both resume if cut short.
+    scheduler.add_job(
+        refresh_catalog,
+        trigger="interval",
+        hours=24,
+        id="sync_catalog",
+        replace_existing=True,
+    )
+    # Recount of the incrementally maintained anime_stats — safety net, like the full vibe rebuild
+    scheduler.add_job(
+        rebuild_anime_stats,
+        trigger="interval",
+        hours=24,
+        id="rebuild_anime_stats",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        refresh_taste_data,
+        trigger="interval",
+        hours=24,
+        id="refresh_taste_data",
+        replace_existing=True,
+    )
     scheduler.start()
-    logger.info("Scheduler started. Vibe tag aggregation every 4hrs, LLM suggestions every 24hrs.")
\ No newline at end of file
+    logger.info("Scheduler started. Vibe tag aggregation every 4hrs (full rebuild every 24hrs), LLM suggestions, catalog sync + synopsis embeddings, anime_stats rebuild and taste vectors + compatibility every 24hrs.")
\ No newline at end of file
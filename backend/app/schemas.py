@@ -125,6 +125,8 @@ class AnimeResponse(BaseModel):
     episode_count: Optional[int]
     average_score: Optional[float]
     arcanum_score: Optional[float]  # Global average of computed_overall across all Arcanum users
+    arcanum_rating_count: int = 0   # Users behind arcanum_score
+    score_distribution: dict[str, int] = {}  # "1".."10" → users whose overall rounds to it
     season: Optional[str]
     season_year: Optional[int]
     cached_vibe_tags: Optional[dict]
@@ -136,6 +138,7 @@ class UserStats(BaseModel):
     total: int
     completed: int
     watching: int
+    on_hold: int
     plan_to_watch: int
     dropped: int
     mean_score: Optional[float]
@@ -154,9 +157,17 @@ class UserProfileResponse(BaseModel):
     genre_breakdown: list[GenreCount]
     score_distribution: dict[str, int]
 
+class SimilarUser(BaseModel):
+    username: str
+    avatar_url: Optional[str]
+    similarity: float  # 1 - cosine distance between taste vectors. 1.0 = identical taste
+
 class SearchResult(BaseModel):
     id: UUID
     title: str
     title_english: Optional[str]
     cover_url: Optional[str]
-    average_score: Optional[float]
\ No newline at end of file
+    average_score: Optional[float]
+
+class SemanticResult(SearchResult):
+    similarity: float  # 1 - cosine distance between synopsis embeddings and the query. 1.0 = identical
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sys
+from functools import lru_cache
+from typing import Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, func, text, bindparam, Text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
+from app.database import AsyncSessionLocal
+from app.models import Anime
+from app.autocomplete import normalize
+from app.taste_vector import GENRES
+from app.job_state import SYNOPSIS_EMBEDDING_JOB, get_checkpoint, save_checkpoint
+
+logger = logging.getLogger(__name__)
+
+# anime.synopsis_embedding — a 256-dim "what is this show about" vector for GET /anime/semantic.
+# Computed locally from synopsis + genres. No model download, no network call, nothing to host.
+#
+# 1. Synopsis → features: stemmed words and adjacent word pairs, stopwords dropped
+#    ("time travel", "high school" carry meaning their single words don't).
+# 2. TF-IDF weights: 1 + log(tf) × smoothed idf. Document frequencies are counted over the whole catalog
+#    at the start of each run, in DF_BUCKETS hashed buckets (bounded memory however many word pairs exist).
+# 3. Sparse random projection into EMBEDDING_DIM: every feature adds ±w to HASHES_PER_FEATURE dims chosen
+#    by its 64-bit hash (blake2b for words, mixed pairwise for word pairs). Deterministic across processes and runs, and preserves cosine similarity
+#    between TF-IDF vectors (Johnson-Lindenstrauss) — no projection matrix to store or ship.
+# 4. Genres go through the same projection as "genre:<name>" features, normalized separately and mixed in
+#    at GENRE_WEIGHT so a two-line synopsis still lands near its genre.
+#
+# Queries are embedded the same way without idf (a query has no corpus of its own, and stopwords already
+# remove the words idf would have suppressed). A query word that is a genre name also hits the genre feature.
+#
+# The vector format is the hash function + EMBEDDING_DIM + HASHES_PER_FEATURE. Changing any of them means
+# a full re-embed (python -m app.synopsis_embedding --full) before queries make sense again.
+
+EMBEDDING_DIM = 256
+HASHES_PER_FEATURE = 4      # Dims per feature. More = fewer harmful collisions, less sparsity
+GENRE_WEIGHT = 0.3
+DF_BUCKETS = 1 << 20        # ~1M int32 counters, 4 MB
+EMBED_BATCH_SIZE = 1000     # Anime per read + UPDATE. Each batch is its own transaction
+MIN_WORD_LEN = 3
+
+assert EMBEDDING_DIM <= 256 and HASHES_PER_FEATURE <= 4 and DF_BUCKETS <= 1 << 24, "See the feature_counts hash layout"
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+# AniList descriptions end in "(Source: Crunchyroll)" / "[Written by MAL Rewrite]" — credits, not content
+_CREDIT = re.compile(r"[(\[](?:source|written by|note)[^)\]]*[)\]]", re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+a about above after again against all also although always am among an and another any are around as at
+be became because become becomes been before being below between both but by can cannot could did do does
+doing down during each even ever every few for from further get gets getting had has have having he her here
+hers herself him himself his how however i if in into is it its itself just like many may me meanwhile might
+more most much must my myself never new no nor not now of off on once one only or other others our ours
+ourselves out over own same she should since so some something soon still such than that the their theirs
+them themselves then there these they this those though through throughout thus to too two under until up
+upon us very was way we well were what when where whether which while who whom whose why will with within
+without would yet you your yours yourself yourselves
+anime series season episode episodes story show
+""".split())
+
+
+@lru_cache(maxsize=1 << 18)
+def _content_word(word: str) -> Optional[str]:
+    """Stopwords, short words and numbers → None. Otherwise the word with plurals folded:
+    "monsters" → "monster", "stories" → "story". Anything smarter needs a dictionary.
+    Cached — a catalog pass sees the same few tens of thousands of words millions of times.
+    """
+    if len(word) < MIN_WORD_LEN or not word.isalpha() or word in STOPWORDS:
+        return None
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 4:
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Synopsis or query text → content words, in order. Markup, credits and stopwords removed."""
+    text = _CREDIT.sub(" ", _HTML_TAG.sub(" ", text))
+    return [word for word in map(_content_word, normalize(text).split()) if word]
+
+
+@lru_cache(maxsize=1 << 18)
+def _word_hash(word: str) -> int:
+    """Deterministic 64-bit hash — unlike hash(), identical in every process. Cached: the vocabulary is small."""
+    return int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+
+
+def _mix(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Word pair hashes from word hashes (splitmix64 finalizer), so only single words ever go through blake2b.
+    uint64 arithmetic wraps, which is what a hash wants.
+    """
+    h = left * np.uint64(0x9E3779B97F4A7C15) ^ right
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def feature_counts(tokens: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct feature hashes (words and adjacent word pairs) and how often each occurs.
+
+    Hash layout: bits 0-31 pick one projection dim per byte, bits 32-35 are their signs,
+    bits 40-63 are the document frequency bucket.
+    """
+    words = np.fromiter((_word_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+    return np.unique(np.concatenate([words, _mix(words[:-1], words[1:])]), return_counts=True)
+
+
+def _df_buckets(hashes: np.ndarray) -> np.ndarray:
+    return ((hashes >> np.uint64(40)) & np.uint64(DF_BUCKETS - 1)).astype(np.int64)
+
+
+_DIM_SHIFTS = np.arange(HASHES_PER_FEATURE, dtype=np.uint64) * np.uint64(8)
+_SIGN_SHIFTS = np.arange(HASHES_PER_FEATURE, dtype=np.uint64) + np.uint64(32)
+
+
+def _project(hashes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Sum of ±weight over each feature's dims, L2-normalized. All zeros if there is nothing to project."""
+    if len(hashes) == 0:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    dims = ((hashes[:, None] >> _DIM_SHIFTS) & np.uint64(0xFF)).astype(np.int64) % EMBEDDING_DIM
+    signs = ((hashes[:, None] >> _SIGN_SHIFTS) & np.uint64(1)).astype(np.float64) * 2 - 1
+    vector = np.bincount(dims.ravel(), (signs * weights[:, None]).ravel(), minlength=EMBEDDING_DIM).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _project_genres(genres: Optional[list[str]]) -> np.ndarray:
+    hashes = np.array([_word_hash(f"genre:{genre.casefold()}") for genre in genres or []], dtype=np.uint64)
+    return _project(hashes, np.ones(len(hashes)))
+
+
+def _combine(text_vector: np.ndarray, genre_vector: np.ndarray) -> Optional[np.ndarray]:
+    """Mix the normalized text and genre parts. None when both are empty."""
+    vector = (1 - GENRE_WEIGHT) * text_vector + GENRE_WEIGHT * genre_vector
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+class DocumentFrequencies:
+    """Hashed document frequencies over the catalog — the idf half of TF-IDF."""
+
+    def __init__(self):
+        self.counts = np.zeros(DF_BUCKETS, dtype=np.int32)
+        self.documents = 0
+
+    def add(self, synopsis: Optional[str]) -> None:
+        self.documents += 1
+        if synopsis:
+            # Two features sharing a bucket in one document still count it once, like a real df
+            hashes, _ = feature_counts(tokenize(synopsis))
+            self.counts[np.unique(_df_buckets(hashes))] += 1
+
+    def idf(self, hashes: np.ndarray) -> np.ndarray:
+        df = self.counts[_df_buckets(hashes)]
+        return np.log((1 + self.documents) / (1 + df)) + 1  # Smoothed: never zero, never divides by zero
+
+
+def embed_document(synopsis: Optional[str], genres: Optional[list[str]], frequencies: DocumentFrequencies) -> Optional[np.ndarray]:
+    """One anime → its synopsis_embedding. None if it has neither usable synopsis text nor genres."""
+    hashes, counts = feature_counts(tokenize(synopsis or ""))
+    text_vector = _project(hashes, (1 + np.log(counts)) * frequencies.idf(hashes))
+    return _combine(text_vector, _project_genres(genres))
+
+
+def embed_query(query: str) -> Optional[np.ndarray]:
+    """Free text → a vector comparable with synopsis_embedding. None if nothing in it is searchable."""
+    hashes, counts = feature_counts(tokenize(query))
+    text_vector = _project(hashes, 1 + np.log(counts))
+    # "melancholy mecha" should lean on the Mecha genre, not only on synopses that use the word
+    padded = f" {normalize(query)} "
+    return _combine(text_vector, _project_genres([g for g in GENRES if f" {normalize(g)} " in padded]))
+
+
+def _to_pgvector(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector.tolist()) + "]"
+
+
+# One UPDATE per batch, vectors as pgvector text literals cast server-side — same shape as the taste vector write
+_BULK_UPDATE_EMBEDDINGS = text("""
+    UPDATE anime AS a
+    SET synopsis_embedding = CAST(v.vec AS vector)
+    FROM unnest(:ids, :vecs) AS v(id, vec)
+    WHERE a.id = v.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("vecs", type_=ARRAY(Text)),
+)
+
+
+async def _count_document_frequencies(db: AsyncSession) -> DocumentFrequencies:
+    """One keyset-paged pass over every synopsis. Memory stays at one batch of text plus the bucket array."""
+    frequencies = DocumentFrequencies()
+    after = None
+    while True:
+        query = select(Anime.id, Anime.synopsis).order_by(Anime.id).limit(EMBED_BATCH_SIZE)
+        if after is not None:
+            query = query.where(Anime.id > after)
+        rows = (await db.execute(query)).all()
+        if not rows:
+            break
+        for _, synopsis in rows:
+            frequencies.add(synopsis)
+        after = rows[-1][0]
+    await db.commit()
+    return frequencies
+
+
+async def embed_synopses(full: bool = False) -> int:
+    """Fill anime.synopsis_embedding in EMBED_BATCH_SIZE batches. Returns anime embedded by this run.
+
+    Default (incremental): embeds rows whose synopsis_embedding is NULL — new titles, and titles whose
+    synopsis or genres changed (catalog_sync clears the embedding when they do). Resumable by construction:
+    every committed batch is no longer NULL, so a rerun picks up exactly what is left.
+
+    full=True: re-embeds every row, e.g. after the vector format changed or idf has drifted a long way.
+    Progress is checkpointed in job_state with each batch, so an interrupted full run resumes where it
+    stopped rather than starting over. Old vectors keep serving queries until their row is rewritten.
+    """
+    embedded = 0
+    async with AsyncSessionLocal() as db:
+        frequencies = await _count_document_frequencies(db)
+
+        after = None
+        if full:
+            checkpoint = await get_checkpoint(db, SYNOPSIS_EMBEDDING_JOB)
+            if checkpoint:
+                after = UUID(checkpoint["after_id"])
+                logger.info(f"Resuming full synopsis embedding after anime {after}.")
+
+        while True:
+            query = select(Anime.id, Anime.synopsis, Anime.genres).order_by(Anime.id).limit(EMBED_BATCH_SIZE)
+            if not full:
+                query = query.where(
+                    Anime.synopsis_embedding.is_(None),
+                    or_(Anime.synopsis.isnot(None), func.cardinality(Anime.genres) > 0),
+                )
+            if after is not None:
+                # Also keeps an incremental run from re-reading rows that stay NULL (nothing embeddable)
+                query = query.where(Anime.id > after)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+
+            vectors = [embed_document(synopsis, genres, frequencies) for _, synopsis, genres in rows]
+            await db.execute(_BULK_UPDATE_EMBEDDINGS, {
+                "ids": [row[0] for row in rows],
+                "vecs": [_to_pgvector(vec) if vec is not None else None for vec in vectors],
+            })
+            after = rows[-1][0]
+            if full:
+                # Same transaction as the batch it covers
+                await save_checkpoint(db, SYNOPSIS_EMBEDDING_JOB, {"after_id": str(after)})
+            await db.commit()
+            embedded += sum(vec is not None for vec in vectors)
+
+        if full:
+            await save_checkpoint(db, SYNOPSIS_EMBEDDING_JOB, None)
+            await db.commit()
+
+    logger.info(
+        f"Synopsis embedding {'(full) ' if full else ''}complete. {embedded} anime embedded "
+        f"(idf over {frequencies.documents} titles)."
+    )
+    return embedded
+
+
+if __name__ == "__main__":
+    # python -m app.synopsis_embedding [--full]
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(embed_synopses(full="--full" in sys.argv[1:]))
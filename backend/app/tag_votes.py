@@ -0,0 +1,53 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from app.models import UserAnimeMoodTag, AnimeTagCount, MoodTagVoteChange
+from app.constants import SYSTEM_USER_ID
+from uuid import UUID
+
+# Every write to user_anime_mood_tags goes through here — tags.py endpoints and the LLM suggest job.
+# Keeps the side tables that readers and aggregation depend on in the same transaction as the vote itself:
+#   anime_tag_counts        — per (anime, tag) real/system vote counts, read directly by endpoints
+#   mood_tag_vote_changes   — change log consumed by incremental aggregate_vibe_tags
+# Callers own the commit.
+
+
+def log_vote_change(db: AsyncSession, anime_id: UUID, mood_tag_id: UUID, delta: int) -> None:
+    """Append a +1/-1 entry to the change log read by incremental aggregate_vibe_tags."""
+    db.add(MoodTagVoteChange(anime_id=anime_id, mood_tag_id=mood_tag_id, delta=delta))
+
+
+async def adjust_tag_counts(db: AsyncSession, user_id: UUID, pairs: list[tuple[UUID, UUID]], delta: int) -> None:
+    """Move anime_tag_counts by delta for each (anime_id, mood_tag_id) pair voted by user_id.
+    One multi-row upsert regardless of how many pairs. Pairs must be unique —
+    Postgres rejects an ON CONFLICT DO UPDATE that touches the same row twice.
+    """
+    if not pairs:
+        return
+    column = "system_votes" if user_id == SYSTEM_USER_ID else "real_votes"
+    other = "real_votes" if column == "system_votes" else "system_votes"
+    # Insert path only runs for a brand-new pair, which can only be an add — never seed a negative count
+    stmt = insert(AnimeTagCount).values([
+        {"anime_id": anime_id, "mood_tag_id": tag_id, column: max(delta, 0), other: 0}
+        for anime_id, tag_id in pairs
+    ])
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[AnimeTagCount.anime_id, AnimeTagCount.mood_tag_id],
+            set_={column: getattr(AnimeTagCount, column) + delta},
+        )
+    )
+
+
+async def add_votes(db: AsyncSession, user_id: UUID, pairs: list[tuple[UUID, UUID]]) -> None:
+    """Record user_id voting each (anime_id, mood_tag_id) pair. Pairs must be new for this user."""
+    for anime_id, tag_id in pairs:
+        db.add(UserAnimeMoodTag(user_id=user_id, anime_id=anime_id, mood_tag_id=tag_id))
+        log_vote_change(db, anime_id, tag_id, +1)
+    await adjust_tag_counts(db, user_id, pairs, +1)
+
+
+async def remove_vote(db: AsyncSession, vote: UserAnimeMoodTag) -> None:
+    """Delete an existing vote row and roll its counts back."""
+    await db.delete(vote)
+    log_vote_change(db, vote.anime_id, vote.mood_tag_id, -1)
+    await adjust_tag_counts(db, vote.user_id, [(vote.anime_id, vote.mood_tag_id)], -1)
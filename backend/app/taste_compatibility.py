@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select, delete, text, bindparam, func, and_, Float, DateTime
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
+from app.database import AsyncSessionLocal
+from app.models import User, Follow, TasteCompatibility
+from app.constants import SYSTEM_USER_ID
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOR_K = 20               # Nearest neighbors stored per user, on top of their follow edges
+NEIGHBOR_BLOCK_SIZE = 256     # Query rows per matmul. Peak memory ≈ block × users × 4 bytes (~100MB at 100k users)
+EDGE_BATCH_SIZE = 50_000      # Follow edges per batched row-wise dot product
+WRITE_CHUNK_SIZE = 5000       # Pairs per upsert statement / commit
+
+# One upsert per chunk. Every row written by a run carries the run's start time,
+# so anything older afterwards is a pair that no longer qualifies and gets deleted.
+_UPSERT_COMPATIBILITY = text("""
+    INSERT INTO taste_compatibility_cache (user_a, user_b, similarity, computed_at)
+    SELECT a, b, s, :computed_at FROM unnest(:user_a, :user_b, :similarity) AS v(a, b, s)
+    ON CONFLICT (user_a, user_b) DO UPDATE
+    SET similarity = EXCLUDED.similarity, computed_at = EXCLUDED.computed_at
+""").bindparams(
+    bindparam("user_a", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("user_b", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("similarity", type_=ARRAY(Float)),
+    bindparam("computed_at", type_=DateTime(timezone=True)),
+)
+
+
+def taste_pair(user_id, other_user_id):
+    """JOIN condition for the cache row of an unordered user pair — rows are stored with user_a < user_b.
+    Used by GET /feed/ and the circle listings."""
+    return and_(
+        TasteCompatibility.user_a == func.least(user_id, other_user_id),
+        TasteCompatibility.user_b == func.greatest(user_id, other_user_id),
+    )
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is cosine similarity. All-zero rows stay zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def edge_similarity(unit: np.ndarray, a_idx: np.ndarray, b_idx: np.ndarray) -> np.ndarray:
+    """Cosine similarity for each (a_idx[i], b_idx[i]) edge over unit-length rows.
+    Batched row-wise dot products — never materializes more than EDGE_BATCH_SIZE rows per side."""
+    out = np.empty(len(a_idx), dtype=np.float32)
+    for start in range(0, len(a_idx), EDGE_BATCH_SIZE):
+        end = start + EDGE_BATCH_SIZE
+        out[start:end] = np.einsum("ij,ij->i", unit[a_idx[start:end]], unit[b_idx[start:end]])
+    return out
+
+
+def top_k_neighbors(unit: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Each row's k most similar other rows over unit-length rows.
+    Returns flat (row_idx, neighbor_idx, similarity) arrays of length n × min(k, n - 1).
+
+    Exact, not approximate: one (block × n) matmul per NEIGHBOR_BLOCK_SIZE rows, then
+    argpartition for the top k — O(n) per row instead of a full sort.
+    """
+    n = len(unit)
+    k = min(k, n - 1)
+    if k <= 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float32)
+
+    rows, cols, sims = [], [], []
+    for start in range(0, n, NEIGHBOR_BLOCK_SIZE):
+        end = min(start + NEIGHBOR_BLOCK_SIZE, n)
+        block = unit[start:end] @ unit.T
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf  # A user is not their own neighbor
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        rows.append(np.repeat(np.arange(start, end), k))
+        cols.append(top.ravel())
+        sims.append(np.take_along_axis(block, top, axis=1).ravel())
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
+
+
+def canonical_pairs(
+    a_idx: np.ndarray, b_idx: np.ndarray, similarity: np.ndarray, n: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Order each pair as (low, high) and drop duplicates — a follow edge is often also a
+    neighbor pair, and mutual follows/neighbors show up once from each side.
+    Indices follow user id order, so low index = lower UUID = user_a."""
+    low = np.minimum(a_idx, b_idx)
+    high = np.maximum(a_idx, b_idx)
+    keep = low != high
+    low, high, similarity = low[keep], high[keep], similarity[keep]
+    _, first = np.unique(low * n + high, return_index=True)
+    return low[first], high[first], similarity[first]
+
+
+async def compute_taste_compatibility():
+    """Refreshes taste_compatibility_cache from the current taste vectors. Runs right after
+    compute_taste_vectors in the daily scheduler job.
+
+    1. Load every non-NULL taste_vector into one (users, 128) matrix, normalized once
+    2. Follow edges first: batched row-wise dot products — these back GET /feed/ and circle listings
+    3. Then each user's top NEIGHBOR_K neighbors: blocked matmuls against the whole matrix
+    4. Upsert the deduplicated pairs in chunks, then delete rows this run didn't write
+       (unfollowed, fell out of the top k, or lost their vector)
+    """
+    logger.info("Starting taste compatibility computation...")
+    started = time.monotonic()
+    computed_at = datetime.now(timezone.utc)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.taste_vector)
+            .where(User.taste_vector.isnot(None), User.id != SYSTEM_USER_ID)
+            .order_by(User.id)
+        )
+        rows = result.all()
+        user_ids = [row[0] for row in rows]
+        position = {user_id: i for i, user_id in enumerate(user_ids)}
+        n = len(user_ids)
+
+        if n:
+            unit = _unit_rows(np.vstack([np.asarray(row[1], dtype=np.float32) for row in rows]))
+        else:
+            unit = np.zeros((0, 0), dtype=np.float32)
+
+        follow_result = await db.execute(select(Follow.follower_id, Follow.following_id))
+        edges = [
+            (position[a], position[b]) for a, b in follow_result.all()
+            if a in position and b in position
+        ]
+        edge_a = np.array([e[0] for e in edges], dtype=np.int64)
+        edge_b = np.array([e[1] for e in edges], dtype=np.int64)
+        edge_sim = edge_similarity(unit, edge_a, edge_b)
+
+        near_a, near_b, near_sim = top_k_neighbors(unit, NEIGHBOR_K)
+
+        low, high, similarity = canonical_pairs(
+            np.concatenate([edge_a, near_a]),
+            np.concatenate([edge_b, near_b]),
+            np.concatenate([edge_sim, near_sim]),
+            n,
+        )
+
+        for start in range(0, len(low), WRITE_CHUNK_SIZE):
+            end = start + WRITE_CHUNK_SIZE
+            await db.execute(_UPSERT_COMPATIBILITY, {
+                "user_a": [user_ids[i] for i in low[start:end]],
+                "user_b": [user_ids[i] for i in high[start:end]],
+                "similarity": [round(float(s), 6) for s in similarity[start:end]],
+                "computed_at": computed_at,
+            })
+            await db.commit()
+
+        await db.execute(delete(TasteCompatibility).where(TasteCompatibility.computed_at < computed_at))
+        await db.commit()
+
+    logger.info(
+        f"Taste compatibility complete. {len(low)} pairs for {n} users "
+        f"({len(edges)} follow edges, k={NEIGHBOR_K}) in {time.monotonic() - started:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(compute_taste_compatibility())
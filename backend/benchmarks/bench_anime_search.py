@@ -0,0 +1,143 @@
+"""GET /anime/search latency: the old unindexed ILIKE vs the ranked trigram search, at several catalog sizes.
+
+Builds a scratch schema with a copy of the anime table (LIKE ... INCLUDING ALL, so the pg_trgm GIN
+indexes come along), fills it with synthetic titles, and points the session's search_path at it —
+the ranked query is the real routers.anime.search_query, unmodified. For each size it prints p50/p95 for:
+  - ilike seq scan:  the pre-trigram query (ILIKE on both titles, LIMIT 10), index scans disabled
+  - ranked (trgm):   search_query() with the GIN indexes
+over three query shapes: a word from a title, its first 4 letters, and the word with a typo.
+
+Usage (against a local Docker DB with migrations applied, never production):
+    python benchmarks/bench_anime_search.py --sizes 20000 200000 --queries 200
+The scratch schema is dropped at the end.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import select, or_, text, bindparam, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Order matters. sys.path.insert must come before any app.* imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.database import engine
+from app.models import Anime
+from app.routers.anime import search_query
+
+SCHEMA = "bench_search"
+INSERT_BATCH = 10_000
+SYLLABLES = [c + v for c in "kstnhmyrwgzdbp" for v in "aiueo"] + ["n", "shi", "chi", "tsu", "kyo", "ryu"]
+ENGLISH = ("the", "of", "sword", "sky", "last", "spirit", "girl", "king", "night", "summer", "blue",
+           "journey", "academy", "dragon", "moon", "garden", "song", "war", "star", "beyond")
+_INSERT = text(f"""
+    INSERT INTO {SCHEMA}.anime (id, anilist_id, title, title_english, popularity, cached_vibe_tags)
+    SELECT id, aid, t, te, pop, '{{}}'::jsonb FROM unnest(:ids, :aids, :titles, :titles_en, :pops) AS v(id, aid, t, te, pop)
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("aids", type_=ARRAY(Integer)),
+    bindparam("titles", type_=ARRAY(Text)),
+    bindparam("titles_en", type_=ARRAY(Text)),
+    bindparam("pops", type_=ARRAY(Integer)),
+)
+
+
+def romaji_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def synthetic_titles(n: int, seed: int) -> list[tuple[str, str | None, int]]:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        title = " ".join(romaji_word(rng) for _ in range(rng.randint(1, 5))).title()
+        english = " ".join(rng.choice(ENGLISH) for _ in range(rng.randint(2, 5))).title() if rng.random() < 0.5 else None
+        rows.append((title, english, int(rng.paretovariate(1.2) * 100)))  # Long-tailed, like real list counts
+    return rows
+
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def old_search(q: str):
+    """The query this benchmark exists to compare against — unranked ILIKE, top 10."""
+    term = f"%{q}%"
+    return select(Anime).where(or_(Anime.title.ilike(term), Anime.title_english.ilike(term))).limit(10)
+
+
+async def timed(db, stmt) -> float:
+    started = time.perf_counter()
+    (await db.execute(stmt)).all()
+    return (time.perf_counter() - started) * 1000
+
+
+def summarize(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    print(f"  {label:<28} p50 {statistics.median(latencies):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+async def run_size(db, n: int, n_queries: int):
+    await db.execute(text(f"TRUNCATE {SCHEMA}.anime"))
+    rows = synthetic_titles(n, seed=n)
+    for start in range(0, n, INSERT_BATCH):
+        chunk = rows[start:start + INSERT_BATCH]
+        await db.execute(_INSERT, {
+            "ids": [uuid.uuid4() for _ in chunk],
+            "aids": list(range(start, start + len(chunk))),
+            "titles": [t for t, _, _ in chunk],
+            "titles_en": [te for _, te, _ in chunk],
+            "pops": [p for _, _, p in chunk],
+        })
+    await db.commit()
+    await db.execute(text(f"ANALYZE {SCHEMA}.anime"))
+
+    rng = random.Random(7)
+    words = [rng.choice(rng.choice(rows)[0].split()).lower() for _ in range(n_queries)]
+    shapes = {"word": words, "prefix": [w[:4] for w in words], "typo": [typo(w, rng) for w in words]}
+
+    print(f"{n} titles:")
+    for shape, queries in shapes.items():
+        await db.execute(text("SET enable_indexscan = off"))
+        await db.execute(text("SET enable_bitmapscan = off"))
+        summarize(f"{shape}: ilike seq scan", [await timed(db, old_search(q)) for q in queries])
+        await db.execute(text("RESET enable_indexscan"))
+        await db.execute(text("RESET enable_bitmapscan"))
+        summarize(f"{shape}: ranked (trgm)", [await timed(db, search_query(q)) for q in queries])
+        await db.commit()
+
+
+async def main(sizes: list[int], n_queries: int):
+    # One pinned connection for the whole run — search_path is per connection, and a pooled
+    # session could hand back a different one after a commit
+    async with engine.connect() as conn, AsyncSession(bind=conn, expire_on_commit=False) as db:
+        await db.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await db.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await db.execute(text(f"CREATE TABLE {SCHEMA}.anime (LIKE public.anime INCLUDING ALL)"))
+        # Unqualified "anime" in the ORM queries now means the scratch copy
+        await db.execute(text(f"SET search_path TO {SCHEMA}, public"))
+        await db.commit()
+        try:
+            for n in sorted(sizes):
+                await run_size(db, n, n_queries)
+        finally:
+            await db.rollback()
+            await db.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.queries))
@@ -0,0 +1,82 @@
+"""Memory footprint, build time and lookup latency of the in-process autocomplete index.
+
+Builds app.autocomplete.AutocompleteIndex from synthetic catalog rows (no database needed) and prints:
+  - build time, and memory allocated by the index (tracemalloc, rows themselves excluded)
+  - lookup p50/p99 for 2-, 3-, 5- and 8-character prefixes of real words in the catalog
+
+Usage:
+    python benchmarks/bench_autocomplete.py --titles 50000
+
+Measured at 50k titles (half with an English title), Python 3.11, single-vCPU container:
+    236k keys, build 1.1-1.4 s, index 18.4 MB on top of 29.4 MB of row dicts (~48 MB per worker),
+    lookup p99 0.005 ms for 2-3 character prefixes, 0.03-0.04 ms for longer ones.
+    During a rebuild the old and new index briefly coexist, so budget ~2x for the swap.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+
+# Order matters. sys.path.insert must come before any app.* imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.autocomplete import AutocompleteIndex, normalize
+
+SYLLABLES = [c + v for c in "kstnhmyrwgzdbp" for v in "aiueo"] + ["n", "shi", "chi", "tsu", "kyo", "ryu"]
+ENGLISH = ("the", "of", "sword", "sky", "last", "spirit", "girl", "king", "night", "summer", "blue",
+           "journey", "academy", "dragon", "moon", "garden", "song", "war", "star", "beyond")
+
+
+def synthetic_rows(n: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 5))]
+        english = " ".join(rng.choice(ENGLISH) for _ in range(rng.randint(2, 5))).title() if rng.random() < 0.5 else None
+        rows.append({
+            "id": uuid.uuid4(), "title": " ".join(words).title(), "title_english": english,
+            "cover_url": f"https://s4.anilist.co/file/anilistcdn/media/anime/cover/large/bx{rng.randint(1, 200000)}.jpg",
+            "average_score": rng.randint(40, 90), "popularity": int(rng.paretovariate(1.2) * 100),
+        })
+    return rows
+
+
+def main(n_titles: int, n_queries: int):
+    tracemalloc.start()
+    rows = synthetic_rows(n_titles, seed=42)
+    rows_bytes, _ = tracemalloc.get_traced_memory()
+    index = AutocompleteIndex(rows)
+    total_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Timed separately — tracemalloc slows allocation-heavy code several times over
+    started = time.perf_counter()
+    index = AutocompleteIndex(rows)
+    build_seconds = time.perf_counter() - started
+    print(f"{len(index)} titles, {len(index.keys)} keys, {len(index.top)} precomputed prefixes")
+    print(f"build {build_seconds:.2f} s   index {(total_bytes - rows_bytes) / 2**20:.1f} MB "
+          f"on top of {rows_bytes / 2**20:.1f} MB of rows (peak {peak_bytes / 2**20:.1f} MB)")
+
+    rng = random.Random(7)
+    words = [rng.choice(normalize(rng.choice(rows)["title"]).split()) for _ in range(n_queries)]
+    for length in (2, 3, 5, 8):
+        queries = [w[:length] for w in words]
+        latencies = []
+        for q in queries:
+            started = time.perf_counter()
+            index.lookup(q, 8)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        print(f"  prefix len {length}: p50 {statistics.median(latencies):.4f} ms   p99 {p99:.4f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.titles, args.queries)
@@ -0,0 +1,57 @@
+"""DB time for a bulk list import: INSERT ... ON CONFLICT DO NOTHING RETURNING via importers.bulk_insert_list_entries.
+
+Creates a throwaway user, imports up to --entries anime from the local catalog onto their list
+(all inserts), then imports the same rows again (all conflicts → skipped), and prints both timings.
+The user is deleted at the end — relationships go with it via ON DELETE CASCADE.
+
+Usage (against a local Docker DB with a seeded catalog, never production):
+    python benchmarks/bench_list_import.py --entries 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from sqlalchemy import select, delete
+
+# Order matters. sys.path.insert must come before any app.* imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.database import AsyncSessionLocal
+from app.models import Anime, User, WatchStatus
+from app.importers import bulk_insert_list_entries
+
+
+async def main(n_entries: int):
+    async with AsyncSessionLocal() as db:
+        anime_ids = (await db.execute(select(Anime.id).limit(n_entries))).scalars().all()
+        if len(anime_ids) < n_entries:
+            print(f"Catalog only has {len(anime_ids)} anime — benchmarking with that many.")
+
+        user = User(username=f"bench_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex}@bench.local", hashed_password="x")
+        db.add(user)
+        await db.commit()
+
+        rows = [
+            {"anime_id": anime_id, "status": WatchStatus.completed, "watched_eps": 12,
+             "start_date": None, "finish_date": None, "score": 8, "rewatch_count": 0}
+            for anime_id in anime_ids
+        ]
+        try:
+            for label in ("fresh list", "re-import"):
+                started = time.perf_counter()
+                inserted, skipped, _ = await bulk_insert_list_entries(db, user.id, rows)
+                await db.commit()
+                print(f"{label:<11} {len(rows)} entries: {inserted} inserted, {skipped} skipped "
+                      f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+        finally:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.entries))
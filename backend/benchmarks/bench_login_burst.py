@@ -0,0 +1,81 @@
+"""Probe-endpoint latency before and during a burst of logins.
+
+bcrypt runs in app.auth's bounded thread pool, so a login burst should only queue other
+logins — not every other request. This fires a steady stream of probe requests, first on
+an idle server, then while --logins concurrent POST /auth/login calls are in flight, and
+prints p50/p99 probe latency for both phases. With bcrypt back on the event loop the burst
+phase p99 grows by roughly (logins × bcrypt time); with the pool it should stay flat.
+
+Usage (against a local server, never production — rate limits must be off):
+    RATE_LIMIT_ENABLED=false uvicorn app.main:app --port 8000
+    python benchmarks/bench_login_burst.py --url http://localhost:8000 --logins 50
+Creates (or reuses) a bench user via /auth/register.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+BENCH_USER = {"username": "bench_login_user", "email": "bench_login@example.com", "password": "bench-password-123"}
+PROBE_INTERVAL = 0.01  # Seconds between probe requests
+
+
+async def probe_until(client: httpx.AsyncClient, path: str, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return latencies
+
+
+async def login(client: httpx.AsyncClient) -> int:
+    response = await client.post(
+        "/auth/login", data={"username": BENCH_USER["username"], "password": BENCH_USER["password"]}
+    )
+    return response.status_code
+
+
+def summarize(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"{label:<8} n={len(latencies):<5} p50 {statistics.median(latencies):7.2f} ms   p99 {p99:7.2f} ms   max {latencies[-1]:7.2f} ms")
+
+
+async def main(url: str, probe_path: str, n_logins: int, baseline_seconds: float):
+    limits = httpx.Limits(max_connections=n_logins + 10)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        await client.post("/auth/register", json=BENCH_USER)  # 400 if it already exists — fine
+        if await login(client) != 200:
+            raise SystemExit("Bench user login failed — is RATE_LIMIT_ENABLED=false set on the server?")
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_until(client, probe_path, stop))
+        await asyncio.sleep(baseline_seconds)
+        stop.set()
+        summarize("idle", await probe)
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_until(client, probe_path, stop))
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*[login(client) for _ in range(n_logins)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        summarize("burst", await probe)
+
+        ok = sum(1 for status in statuses if status == 200)
+        print(f"\n{ok}/{n_logins} logins succeeded in {elapsed:.2f}s ({n_logins / elapsed:.1f} logins/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--probe", default="/health", help="Endpoint whose latency is measured")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.probe, args.logins, args.baseline_seconds))
@@ -0,0 +1,126 @@
+"""Exact vs HNSW nearest-taste-neighbor benchmark on a synthetic 100k-user table.
+
+Builds a scratch table shaped like users.taste_vector (vector(128), same HNSW params as
+ix_users_taste_vector_hnsw), then for a sample of query vectors compares:
+  - exact:  sequential scan, index scans disabled (ground truth for recall)
+  - hnsw:   index scan at several hnsw.ef_search values
+and prints p50/p95 latency and recall@k for each.
+
+Synthetic vectors are a Gaussian mixture (taste "clusters") with the real layout's
+40 trailing zero dims, so neighbor structure is closer to real data than uniform noise.
+
+Usage (against a local Docker DB, never production):
+    python benchmarks/bench_taste_ann.py --users 100000 --queries 200 --k 10
+The scratch table is dropped at the end.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+# Order matters. sys.path.insert must come before any app.* imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.database import AsyncSessionLocal
+from app.taste_vector import VECTOR_DIM
+
+TABLE = "bench_taste_vectors"
+INSERT_BATCH = 10_000
+USED_DIMS = 88  # Genre + axis + mood segments. The buffer stays zero like production.
+
+
+def synthetic_vectors(n: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, USED_DIMS))
+    assignment = rng.integers(0, clusters, n)
+    vectors = np.zeros((n, VECTOR_DIM), dtype=np.float32)
+    vectors[:, :USED_DIMS] = centers[assignment] + rng.normal(scale=0.6, size=(n, USED_DIMS))
+    return vectors
+
+
+def to_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector.tolist()) + "]"
+
+
+async def timed_topk(db, query_literal: str, k: int) -> tuple[float, list[int]]:
+    started = time.perf_counter()
+    result = await db.execute(
+        text(f"SELECT id FROM {TABLE} ORDER BY v <=> CAST(:q AS vector) LIMIT :k"),
+        {"q": query_literal, "k": k},
+    )
+    ids = [row[0] for row in result.all()]
+    return (time.perf_counter() - started) * 1000, ids
+
+
+def summarize(label: str, latencies: list[float], recalls: list[float]):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<18} p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms   recall@k {statistics.mean(recalls):.3f}")
+
+
+async def main(n_users: int, n_queries: int, k: int, ef_values: list[int]):
+    vectors = synthetic_vectors(n_users, clusters=50, seed=42)
+    queries = synthetic_vectors(n_queries, clusters=50, seed=7)
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await db.execute(text(f"CREATE TABLE {TABLE} (id integer PRIMARY KEY, v vector({VECTOR_DIM}))"))
+        await db.commit()
+
+        print(f"Inserting {n_users} synthetic vectors...")
+        for start in range(0, n_users, INSERT_BATCH):
+            chunk = vectors[start:start + INSERT_BATCH]
+            await db.execute(
+                text(
+                    f"INSERT INTO {TABLE} (id, v) "
+                    f"SELECT id, CAST(vec AS vector) FROM unnest(CAST(:ids AS integer[]), CAST(:vecs AS text[])) AS t(id, vec)"
+                ),
+                {"ids": list(range(start, start + len(chunk))), "vecs": [to_literal(v) for v in chunk]},
+            )
+        await db.commit()
+
+        started = time.perf_counter()
+        await db.execute(text(
+            f"CREATE INDEX ON {TABLE} USING hnsw (v vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        ))
+        await db.execute(text(f"ANALYZE {TABLE}"))
+        await db.commit()
+        print(f"HNSW build: {time.perf_counter() - started:.1f}s\n")
+
+        literals = [to_literal(q) for q in queries]
+
+        # Exact — index scans off forces the sequential scan + sort. These ids are ground truth.
+        await db.execute(text("SET enable_indexscan = off"))
+        exact_latencies, truth = [], []
+        for literal in literals:
+            ms, ids = await timed_topk(db, literal, k)
+            exact_latencies.append(ms)
+            truth.append(set(ids))
+        await db.execute(text("RESET enable_indexscan"))
+        summarize("exact (seq scan)", exact_latencies, [1.0] * len(truth))
+
+        for ef in ef_values:
+            await db.execute(text(f"SET hnsw.ef_search = {int(ef)}"))
+            latencies, recalls = [], []
+            for literal, expected in zip(literals, truth):
+                ms, ids = await timed_topk(db, literal, k)
+                latencies.append(ms)
+                recalls.append(len(expected & set(ids)) / k)
+            summarize(f"hnsw ef_search={ef}", latencies, recalls)
+
+        await db.execute(text(f"DROP TABLE {TABLE}"))
+        await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[40, 100, 200])
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.queries, args.k, args.ef))
@@ -1,103 +1,32 @@
 import asyncio
-import httpx
-from sqlalchemy import select
+import logging
 import os
 import sys
 
 # Order matters. sys.path.insert must come before any app.* imports, otherwise Python can't find the app module
 sys.path.insert(0, os.path.dirname(__file__))
-from app.database import AsyncSessionLocal
-from app.models import Anime
-
-ANILIST_QUERY = """
-query ($page: Int, $perPage: Int) {
-  Page(page: $page, perPage: $perPage) {
-    pageInfo {
-      hasNextPage
-    }
-    media(type: ANIME, sort: POPULARITY_DESC) {
-      id
-      idMal
-      title {
-        romaji
-        english
-      }
-      description(asHtml: false)
-      coverImage {
-        large
-      }
-      genres
-      episodes
-      averageScore
-      season
-      seasonYear
-    }
-  }
-}
-"""
-
-async def fetch_page(client: httpx.AsyncClient, page: int):
-    response = await client.post(
-        "https://graphql.anilist.co",
-        json={
-            "query": ANILIST_QUERY,
-            "variables": {"page": page, "perPage": 50}
-        },
-        headers={"Content-Type": "application/json"}
+from app import anilist_client
+from app.catalog_sync import sync_catalog
+from app.synopsis_embedding import embed_synopses
+
+# Fresh-database seed. Thin wrapper around the catalog sync (app/catalog_sync.py), which the scheduler
+# also runs nightly — same upsert, same checkpoint, so re-running this is always safe.
+# Embeds the synopses afterwards (app/synopsis_embedding.py) so GET /anime/semantic works straight away.
+#   python seed_anime.py            whole AniList catalog (20k+ titles, resumes if interrupted)
+#   python seed_anime.py 10         first 10 pages (500 titles) — enough for local development
+
+async def seed(max_pages: int | None = None):
+    print("Starting AniList catalog sync...")
+    try:
+        result = await sync_catalog(max_pages)
+    finally:
+        await anilist_client.close_client()
+    embedded = await embed_synopses()
+    print(
+        f"Seed complete. {result['pages']} pages: "
+        f"{result['inserted']} anime added, {result['updated']} refreshed, {embedded} synopses embedded."
     )
-    return response.json()
-
-async def seed():
-    print("Starting AniList seed...")
-    total = 0
-
-    async with AsyncSessionLocal() as db:
-        async with httpx.AsyncClient() as client:
-            for page in range(1, 11):  # 10 pages x 50 = 500 anime
-                print(f"Fetching page {page}/10...")
-                data = await fetch_page(client, page)
-
-                if "errors" in data:
-                    print(f"API error: {data['errors']}")
-                    break
-
-                media_list = data["data"]["Page"]["media"]
-                has_next = data["data"]["Page"]["pageInfo"]["hasNextPage"]
-
-                for media in media_list:
-                    # Skip if already exists
-                    result = await db.execute(
-                        select(Anime).where(Anime.anilist_id == media["id"])
-                    )
-                    if result.scalar_one_or_none():
-                        continue
-
-                    anime = Anime(
-                        anilist_id=media["id"],
-                        mal_id=media.get("idMal"),
-                        title=media["title"]["romaji"],
-                        title_english=media["title"].get("english"),
-                        synopsis=media.get("description"),
-                        cover_url=media["coverImage"]["large"] if media.get("coverImage") else None,
-                        genres=media.get("genres", []),
-                        episode_count=media.get("episodes"),
-                        average_score=media.get("averageScore"),
-                        season=media.get("season"),
-                        season_year=media.get("seasonYear"),
-                        cached_vibe_tags={}
-                    )
-                    db.add(anime)
-                    total += 1
-
-                await db.commit()
-                print(f"Page {page} done. Total seeded so far: {total}")
-
-                if not has_next:
-                    break
-
-                await asyncio.sleep(0.5)  # Be nice to AniList-senpai's API. Onegaishimasu!
-
-    print(f"Seed complete. {total} anime added to database.")
 
 if __name__ == "__main__":
-    asyncio.run(seed())
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(seed(int(sys.argv[1]) if len(sys.argv) > 1 else None))
@@ -1,6 +1,8 @@
 import pytest
 from sqlalchemy import create_engine, text
-from app.database import Base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from app.database import Base, DATABASE_URL
 import os
 from dotenv import load_dotenv
 
@@ -10,7 +12,7 @@ load_dotenv()
 def create_tables():
     """Create all tables before tests run, drop after.
     Uses Base.metadata.create_all() — faster than running Alembic migrations.
-    Enables pgvector extension first — required for taste_vector column.
+    Enables pgvector and pg_trgm first — required for taste_vector and the title trigram indexes.
     Works against both local and CI Postgres instances.
     """
     SYNC_DATABASE_URL = os.getenv("SYNC_DATABASE_URL")
@@ -18,8 +20,20 @@ def create_tables():
     
     with engine.connect() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         conn.commit()
     
     Base.metadata.create_all(bind=engine)
     yield
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db_sessions():
+    """Session factory for DB-backed tests that drive app code through asyncio.run().
+    NullPool opens a fresh connection per session — the app's pooled engine would hand back
+    connections bound to the event loop of an earlier asyncio.run(), which is already closed.
+    Tests share one database: each seeds its own users and anime and only looks at those.
+    """
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    return async_sessionmaker(engine, expire_on_commit=False)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app import anilist_client
+from app.anilist_client import AniListError
+from app.importers import ImportFailed, fetch_anilist_entries
+
+
+class MockAniList:
+    """Local GraphQL endpoint. `respond(variables)` returns (status, headers, payload) per request.
+    Records (time, variables) for every request and the peak number in flight."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                with mock.lock:
+                    mock.requests.append((time.monotonic(), body["variables"]))
+                    mock.in_flight += 1
+                    mock.peak = max(mock.peak, mock.in_flight)
+                    status, headers, payload = mock.respond(body["variables"])
+                time.sleep(0.05)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with mock.lock:
+                    mock.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def mock_anilist(monkeypatch):
+    servers = []
+
+    def start(respond):
+        server = MockAniList(respond).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(anilist_client, "ANILIST_API_URL", server.url)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__()
+
+
+def _run(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await anilist_client.close_client()  # Pool and limiter are per event loop
+    return asyncio.run(run())
+
+
+def _chunk(page, has_next):
+    entry = {
+        "mediaId": page, "status": "COMPLETED", "score": 8, "progress": 12, "repeat": 0,
+        "startedAt": {"year": None}, "completedAt": {"year": 2024, "month": 3, "day": None},
+        "media": {"title": {"romaji": f"Show {page}"}},
+    }
+    return {"data": {"MediaListCollection": {"lists": [{"entries": [entry]}], "hasNextChunk": has_next}}}
+
+
+def test_retry_after_is_honoured(mock_anilist):
+    replies = [(429, {"Retry-After": "0.3"}, {"errors": [{"message": "Too Many Requests.", "status": 429}]})]
+    mock = mock_anilist(lambda v: replies.pop(0) if replies else (200, {}, {"data": {"ok": True}}))
+
+    assert _run(anilist_client.query("{ ok }", {})) == {"ok": True}
+    (first, _), (second, _) = mock.requests
+    assert second - first >= 0.3
+
+
+def test_low_remaining_spaces_requests(mock_anilist):
+    headers = {"X-RateLimit-Limit": "600", "X-RateLimit-Remaining": "2"}  # Spacing 60/600 = 0.1s
+    mock = mock_anilist(lambda v: (200, headers, {"data": {"ok": True}}))
+
+    async def sequential():
+        for _ in range(4):
+            await anilist_client.query("{ ok }", {})
+
+    _run(sequential())
+    times = [t for t, _ in mock.requests]
+    assert all(b - a >= 0.1 for a, b in zip(times, times[1:]))
+
+
+def test_graphql_errors_are_not_retried(mock_anilist):
+    mock = mock_anilist(lambda v: (404, {}, {"errors": [{"message": "User not found", "status": 404}]}))
+
+    with pytest.raises(ImportFailed, match="not found"):
+        _run(fetch_anilist_entries("nobody"))
+    assert len(mock.requests) == 1
+
+    with pytest.raises(AniListError) as exc:
+        _run(anilist_client.query("{ ok }", {}))
+    assert exc.value.status == 404
+
+
+def test_list_chunks_fetched_in_concurrent_waves(mock_anilist, monkeypatch):
+    monkeypatch.setattr(anilist_client, "ANILIST_CONCURRENCY", 3)
+    mock = mock_anilist(lambda v: (200, {}, _chunk(v["page"], v["page"] < 5)))
+
+    entries = _run(fetch_anilist_entries("someone"))
+    assert [e["anilist_id"] for e in entries] == [1, 2, 3, 4, 5]  # Chunks 6-7 overshoot and are ignored
+    assert entries[0]["score"] == 8 and entries[0]["start_date"] is None
+    assert sorted(v["page"] for _, v in mock.requests) == list(range(1, 8))
+    assert mock.peak == 3
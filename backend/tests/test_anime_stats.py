@@ -0,0 +1,268 @@
+import asyncio
+import importlib.util
+import math
+import os
+import random
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, func, select, update, delete, text
+from sqlalchemy.orm import Session
+
+from app import anime_stats
+from app.anime_stats import AXES, HISTOGRAM_BUCKETS, STATS_COLUMNS, entry_scores, record_entry_change
+from app.importers import _ImportTally, _import_chunk, _finish_import
+from app.models import Anime, AnimeStats, User, UserAnimeRelationship, WatchStatus
+from app.routers.anime_list import add_to_list, update_entry, delete_entry
+from app.schemas import ListEntryCreate, ListEntryUpdate
+
+ANIME_ID = uuid.uuid4()
+
+
+class FakeSession:
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, statement, params=None):
+        self.executed.append(params)
+
+
+def _entry(overall=None, story=None, enjoyment=None):
+    return SimpleNamespace(
+        anime_id=ANIME_ID, computed_overall=overall, score_story=story, score_art=None,
+        score_sound=None, score_characters=None, score_enjoyment=enjoyment,
+    )
+
+
+def _record(before, after):
+    db = FakeSession()
+    asyncio.run(record_entry_change(db, before and entry_scores(before), after and entry_scores(after)))
+    return db.executed
+
+
+def test_no_statement_when_scores_are_unchanged_or_absent():
+    assert _record(_entry(8.0, story=8), _entry(8.0, story=8)) == []  # e.g. a status or progress edit
+    assert _record(None, _entry()) == []                              # Added to the list unscored
+    assert _record(_entry(), None) == []
+
+
+# --- Against the database: anime_stats must always equal a fresh recount of the list entries ---
+
+def _users(n):
+    return [User(username=f"stats_{uuid.uuid4().hex[:12]}", email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+            for _ in range(n)]
+
+
+def _anime(n):
+    return [Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title=f"Stats Show {i}") for i in range(n)]
+
+
+def _recount(entries) -> dict:
+    """anime_stats columns computed in Python from (computed_overall, score_story, ..., score_enjoyment) rows."""
+    scored = [row for row in entries if any(value is not None for value in row)]
+    overall = [row[0] for row in scored if row[0] is not None]
+    stats = {"rating_count": len(overall), "rating_sum": sum(overall)}
+    for i, axis in enumerate(AXES, start=1):
+        values = [row[i] for row in scored if row[i] is not None]
+        stats[f"{axis}_count"], stats[f"{axis}_sum"] = len(values), sum(values)
+    histogram = [0] * HISTOGRAM_BUCKETS
+    for value in overall:
+        histogram[min(max(math.floor(value + 0.5), 1), HISTOGRAM_BUCKETS) - 1] += 1
+    stats["histogram"] = histogram
+    return stats
+
+
+async def _assert_stats_match_entries(db, anime_ids):
+    score_columns = [UserAnimeRelationship.computed_overall,
+                     *(getattr(UserAnimeRelationship, f"score_{axis}") for axis in AXES)]
+    rows = (await db.execute(
+        select(UserAnimeRelationship.anime_id, *score_columns).where(UserAnimeRelationship.anime_id.in_(anime_ids))
+    )).all()
+    stored = {
+        row.anime_id: row for row in
+        (await db.execute(select(AnimeStats).where(AnimeStats.anime_id.in_(anime_ids)))).scalars()
+    }
+    for anime_id in anime_ids:
+        expected = _recount([tuple(row[1:]) for row in rows if row.anime_id == anime_id])
+        stats = stored.get(anime_id)
+        # No row and a row of zeros both mean "nobody scores it"
+        actual = {column: getattr(stats, column) for column in STATS_COLUMNS} if stats else _recount([])
+        assert actual["rating_sum"] == pytest.approx(expected.pop("rating_sum"))
+        assert {column: actual[column] for column in expected} == expected
+        if expected["rating_count"]:
+            mean = (await db.execute(
+                select(func.avg(UserAnimeRelationship.computed_overall)).where(UserAnimeRelationship.anime_id == anime_id)
+            )).scalar()
+            assert actual["rating_sum"] / actual["rating_count"] == pytest.approx(mean)
+
+
+def test_list_writes_keep_stats_in_step(db_sessions):
+    alice, bob = _users(2)
+    shows = _anime(2)
+    ids = [show.id for show in shows]
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([alice, bob, *shows])
+            await db.commit()
+
+        async def call(handler, *args):
+            async with db_sessions() as db:
+                return await handler(*args, db=db)
+
+        first = await call(add_to_list, ListEntryCreate(anime_id=ids[0], status="completed", score_story=8, score_art=9), alice.id)
+        await call(add_to_list, ListEntryCreate(anime_id=ids[0], status="completed", score_enjoyment=6), bob.id)
+        unscored = await call(add_to_list, ListEntryCreate(anime_id=ids[1], status="watching"), alice.id)
+        second = await call(add_to_list, ListEntryCreate(anime_id=ids[1], status="dropped", score_sound=3), bob.id)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+
+        # An axis changed and one added — the old contribution goes out, the new one in
+        await call(update_entry, first.id, ListEntryUpdate(score_story=5, score_characters=10), alice.id)
+        # Status-only edit and a first score on a previously unscored entry
+        await call(update_entry, second.id, ListEntryUpdate(status="completed"), bob.id)
+        await call(update_entry, unscored.id, ListEntryUpdate(score_art=7), alice.id)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+
+        await call(delete_entry, second.id, bob.id)
+        await call(delete_entry, first.id, alice.id)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+
+    asyncio.run(run())
+
+
+def _import_entry(show, score, status=WatchStatus.completed):
+    return {
+        "anilist_id": show.anilist_id, "title": show.title, "status": status, "score": score,
+        "watched_eps": None, "start_date": None, "finish_date": None, "rewatch_count": 0, "updated_at": None,
+    }
+
+
+def test_imports_keep_stats_in_step(db_sessions):
+    importer, other = _users(2)
+    shows = _anime(5)
+    ids = [show.id for show in shows]
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([importer, other, *shows])
+            await db.commit()
+            # Someone else's scores on the same anime must survive the imports untouched.
+            # Seeded behind the handlers' back — the drift check gives them their anime_stats rows
+            db.add_all([
+                UserAnimeRelationship(user_id=other.id, anime_id=show.id, status=WatchStatus.completed,
+                                      score_story=9, computed_overall=9.0)
+                for show in shows[:3]
+            ])
+            await db.commit()
+        await _run_drift_check(db_sessions)
+
+        async def run_import(entries, merge):
+            async with db_sessions() as db:
+                tally = _ImportTally()
+                await _import_chunk(db, importer.id, entries, Anime.anilist_id, "anilist_id", tally, merge)
+                await _finish_import(db, importer.id, tally)
+
+        # Insert mode: scored, unscored, already on the list elsewhere, and a repeat (one copy goes in)
+        await run_import([_import_entry(shows[0], 7), _import_entry(shows[1], None),
+                          _import_entry(shows[2], 4), _import_entry(shows[2], 10)], merge=False)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+
+        # Merge mode: score changed (old out, new in), score added, score unchanged, brand-new entries
+        await run_import([_import_entry(shows[0], 2), _import_entry(shows[1], 8),
+                          _import_entry(shows[2], 4, status=WatchStatus.dropped),
+                          _import_entry(shows[3], 10), _import_entry(shows[4], None)], merge=True)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+
+    asyncio.run(run())
+
+
+async def _run_drift_check(db_sessions):
+    original = anime_stats.AsyncSessionLocal
+    anime_stats.AsyncSessionLocal = db_sessions
+    try:
+        await anime_stats.rebuild_anime_stats()
+    finally:
+        anime_stats.AsyncSessionLocal = original
+
+
+def test_drift_check_fixes_only_drifted_anime(db_sessions):
+    user, = _users(1)
+    shows = _anime(4)
+    ids = [show.id for show in shows]
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([user, *shows])
+            await db.commit()
+        for show, score in zip(shows[:3], (8, 5, 10)):
+            async with db_sessions() as db:
+                await add_to_list(ListEntryCreate(anime_id=show.id, status="completed", score_story=score), user.id, db=db)
+
+        async with db_sessions() as db:
+            await db.execute(update(AnimeStats).where(AnimeStats.anime_id == ids[0])
+                             .values(rating_count=AnimeStats.rating_count + 5, histogram=[1] * HISTOGRAM_BUCKETS))
+            await db.execute(delete(AnimeStats).where(AnimeStats.anime_id == ids[1]))          # Row lost
+            db.add(AnimeStats(anime_id=ids[3], rating_count=2, rating_sum=15.0,             # Nobody scores it
+                              **{f"{axis}_{part}": 0 for axis in AXES for part in ("count", "sum")},
+                              histogram=[0] * HISTOGRAM_BUCKETS))
+            await db.commit()
+            untouched = (await db.execute(select(AnimeStats.updated_at).where(AnimeStats.anime_id == ids[2]))).scalar()
+
+        await _run_drift_check(db_sessions)
+        async with db_sessions() as db:
+            await _assert_stats_match_entries(db, ids)
+            assert (await db.execute(select(AnimeStats.anime_id).where(AnimeStats.anime_id == ids[3]))).first() is None
+            assert (await db.execute(select(AnimeStats.updated_at).where(AnimeStats.anime_id == ids[2]))).scalar() == untouched
+
+    asyncio.run(run())
+
+
+def test_backfill_migration_matches_entries(db_sessions):
+    path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions", "c2a9e7f40b15_add_anime_stats_table.py")
+    spec = importlib.util.spec_from_file_location("add_anime_stats_table", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    users = _users(3)
+    shows = _anime(3)
+    scores = [  # (user, show, story, enjoyment, computed_overall) — 5.5 and 9.5 sit on bucket edges
+        (0, 0, 5, 6, 5.5), (1, 0, 9, 10, 9.5), (2, 0, None, None, None),
+        (0, 1, 1, None, 1.0), (1, 1, None, 3, 3.0),
+    ]
+    engine = create_engine(os.getenv("SYNC_DATABASE_URL"))
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            with Session(bind=conn) as db:
+                db.add_all([*users, *shows])
+                db.flush()
+                db.add_all([
+                    UserAnimeRelationship(user_id=users[u].id, anime_id=shows[s].id, status=WatchStatus.completed,
+                                          score_story=story, score_enjoyment=enjoyment, computed_overall=overall)
+                    for u, s, story, enjoyment, overall in scores
+                ])
+                db.flush()
+            # Recreate the table the way the migration does, inside this transaction — rolled back below
+            conn.execute(text("DROP TABLE anime_stats"))
+            with Operations.context(MigrationContext.configure(conn)):
+                migration.upgrade()
+            backfilled = {
+                row.anime_id: {column: getattr(row, column) for column in STATS_COLUMNS}
+                for row in conn.execute(select(AnimeStats).where(AnimeStats.anime_id.in_([show.id for show in shows])))
+            }
+        finally:
+            transaction.rollback()
+
+    assert shows[2].id not in backfilled  # Nobody scores it
+    for s in (0, 1):
+        expected = _recount([(overall, story, None, None, None, enjoyment)
+                             for _, show, story, enjoyment, overall in scores if show == s])
+        assert backfilled[shows[s].id] == expected
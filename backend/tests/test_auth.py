@@ -0,0 +1,58 @@
+import asyncio
+import time
+import bcrypt
+from uuid import uuid4
+from app import auth
+
+def test_password_hashing_does_not_block_event_loop(monkeypatch):
+    """While hashes run in the pool, a ticker coroutine keeps getting scheduled."""
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", 10)
+
+    async def run():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        hashed = await asyncio.gather(*[auth.hash_password("hunter22") for _ in range(4)])
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        return hashed, ticks, elapsed
+
+    hashed, ticks, elapsed = asyncio.run(run())
+    assert ticks >= (elapsed / 0.005) * 0.5  # Blocking bcrypt calls would leave ticks near 1
+    assert asyncio.run(auth.verify_password("hunter22", hashed[0]))
+    assert not asyncio.run(auth.verify_password("wrong", hashed[0]))
+
+def test_needs_rehash_on_cost_change(monkeypatch):
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", 12)
+    old = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=4)).decode()
+    assert auth.needs_rehash(old)
+    assert not auth.needs_rehash(old.replace("$04$", "$12$", 1))
+    assert auth.needs_rehash("not-a-bcrypt-hash")
+
+def test_token_cache_lru_and_revocation():
+    cache = auth.TokenCache(maxsize=2, ttl=60)
+    alice, bob = uuid4(), uuid4()
+    exp = time.time() + 3600
+    cache.put("t1", alice, exp, True)
+    cache.put("t2", bob, exp, True)
+    cache.get("t1")                      # t1 is now most recently used
+    cache.put("t3", alice, exp, True)
+    assert cache.get("t2") is None       # LRU evicted
+    assert cache.get("t1").user_id == alice
+
+    cache.put("t1", alice, exp, True)
+    cache.revoke("t1", exp)
+    assert cache.is_revoked("t1") and cache.get("t1") is None
+
+def test_token_cache_expiry_and_ttl():
+    cache = auth.TokenCache(maxsize=10, ttl=-1)
+    cache.put("stale", uuid4(), time.time() + 3600, True)
+    assert cache.get("stale") is None    # is_active check older than the TTL
+    cache = auth.TokenCache(maxsize=10, ttl=60)
+    cache.put("expired", uuid4(), time.time() - 1, True)
+    assert cache.get("expired") is None  # JWT exp passed
@@ -0,0 +1,28 @@
+from uuid import uuid4
+from app.autocomplete import AutocompleteIndex, normalize
+
+
+def _row(title, english=None, popularity=0):
+    return {"id": uuid4(), "title": title, "title_english": english, "cover_url": None,
+            "average_score": None, "popularity": popularity}
+
+
+def test_word_prefix_lookup_is_popularity_ordered():
+    index = AutocompleteIndex([
+        _row("Sousou no Frieren", "Frieren: Beyond Journey's End", popularity=500),
+        _row("Fruits Basket", popularity=900),
+        _row("Free!", popularity=100),
+        _row("Re:Zero kara Hajimeru Isekai Seikatsu", "Re:ZERO -Starting Life in Another World-", popularity=800),
+    ])
+    titles = lambda q, limit=8: [r["title"] for r in index.lookup(q, limit)]
+
+    assert titles("fr") == ["Fruits Basket", "Sousou no Frieren", "Free!"]  # Precomputed short prefix
+    assert titles("frie") == ["Sousou no Frieren"]                          # Mid-title word, counted once
+    assert titles("sousou no f") == ["Sousou no Frieren"]
+    assert titles("RE:ZERO start") == ["Re:Zero kara Hajimeru Isekai Seikatsu"]
+    assert titles("fr", limit=1) == ["Fruits Basket"]
+    assert titles("f") == [] and titles("zz") == []
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert normalize("Pokémon: The_Movie!") == "pokemon the movie"
@@ -0,0 +1,24 @@
+from app.cache import GenerationCache
+
+def test_generation_cache_invalidates_on_new_generation():
+    """Entries vanish as soon as a newer generation is presented — no TTL involved."""
+    cache = GenerationCache()
+    cache.set(1, "browse", ["cluster"])
+    assert cache.get(1, "browse") == ["cluster"]
+    assert cache.get(2, "browse") is None
+    cache.set(2, "late-night", "drill-down")
+    assert cache.get(1, "browse") is None
+
+def test_generation_cache_ignores_stale_writes():
+    """A slow request computed against an older generation can't evict newer entries."""
+    cache = GenerationCache()
+    cache.set(3, "browse", "new")
+    cache.set(2, "browse", "old")
+    assert cache.get(3, "browse") == "new"
+
+def test_generation_cache_is_bounded():
+    cache = GenerationCache(maxsize=2)
+    for key in ["a", "b", "c"]:
+        cache.set(1, key, key)
+    assert cache.get(1, "a") is None
+    assert cache.get(1, "c") == "c"
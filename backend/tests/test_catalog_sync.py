@@ -0,0 +1,116 @@
+import asyncio
+import random
+
+from sqlalchemy import select, update
+from app import anilist_client, catalog_sync
+from app.models import Anime
+from app.anilist_client import AniListError
+
+LAST_PAGE = 7
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def commit(self):
+        pass
+
+
+def _page(page):
+    media = {
+        "id": page * 100, "idMal": None, "title": {"romaji": f"Show {page}", "english": None},
+        "description": None, "coverImage": None, "genres": None, "episodes": 12,
+        "averageScore": 80, "popularity": 1000, "season": None, "seasonYear": None,
+    }
+    return {"Page": {"pageInfo": {"hasNextPage": page < LAST_PAGE}, "media": [media]}}
+
+
+def _patch(monkeypatch, checkpoint, fail_at=None):
+    """Wire sync_catalog to fakes. Returns the dict that records what it did."""
+    state = {"checkpoint": checkpoint, "requested": [], "rows": [], "bumped": 0}
+
+    async def query_many(graphql, variables):
+        pages = [v["page"] for v in variables]
+        state["requested"].extend(pages)
+        if fail_at in pages:
+            raise AniListError("Could not reach AniList. Try again.")
+        return [_page(p) for p in pages]
+
+    async def get_checkpoint(db, job_id):
+        return state["checkpoint"]
+
+    async def save_checkpoint(db, job_id, checkpoint):
+        state["checkpoint"] = checkpoint
+
+    async def upsert_anime(db, rows):
+        state["rows"].extend(rows)
+        return len(rows), 0
+
+    async def bump_generation(db, job_id):
+        state["bumped"] += 1
+
+    monkeypatch.setattr(anilist_client, "ANILIST_CONCURRENCY", 3)
+    monkeypatch.setattr(anilist_client, "query_many", query_many)
+    monkeypatch.setattr(catalog_sync, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(catalog_sync, "get_checkpoint", get_checkpoint)
+    monkeypatch.setattr(catalog_sync, "save_checkpoint", save_checkpoint)
+    monkeypatch.setattr(catalog_sync, "upsert_anime", upsert_anime)
+    monkeypatch.setattr(catalog_sync, "bump_generation", bump_generation)
+    return state
+
+
+def test_resumes_from_checkpoint_and_clears_it(monkeypatch):
+    state = _patch(monkeypatch, {"next_page": 3})
+
+    result = asyncio.run(catalog_sync.sync_catalog())
+    assert state["requested"] == [3, 4, 5, 6, 7, 8]  # Waves of 3; page 8 overshoots and is ignored
+    assert [row["anilist_id"] for row in state["rows"]] == [300, 400, 500, 600, 700]
+    assert state["checkpoint"] is None and state["bumped"] == 2  # Once per wave that changed rows
+    assert result == {"pages": 5, "inserted": 5, "updated": 0}
+    assert state["rows"][0]["genres"] == []
+
+
+def test_failed_wave_keeps_checkpoint(monkeypatch):
+    state = _patch(monkeypatch, None, fail_at=5)
+
+    asyncio.run(catalog_sync.sync_catalog())
+    assert state["checkpoint"] == {"next_page": 4}  # Pages 1-3 committed; 4-6 retried next run
+    assert state["bumped"] == 1  # The committed wave is announced even though the run stopped
+
+
+def test_max_pages_pauses_with_checkpoint(monkeypatch):
+    state = _patch(monkeypatch, None)
+
+    assert asyncio.run(catalog_sync.sync_catalog(max_pages=2))["pages"] == 2
+    assert state["requested"] == [1, 2] and state["checkpoint"] == {"next_page": 3}
+
+
+def test_upsert_writes_only_changed_rows_and_clears_stale_embeddings(db_sessions):
+    base = random.randrange(10**8, 2**31 - 10)
+    first = [catalog_sync.media_row({**_page(1)["Page"]["media"][0], "id": base + i, "description": f"Plot {i}"})
+             for i in range(3)]
+    changed = [dict(row) for row in first]
+    changed[0]["popularity"] = 5000              # Refreshed, embedding kept
+    changed[1]["synopsis"] = "A different plot"  # Refreshed, embedding cleared
+
+    async def run():
+        async with db_sessions() as db:
+            assert await catalog_sync.upsert_anime(db, first + first[:1]) == (3, 0)  # Repeat within a run is kept once
+            await db.execute(update(Anime).where(Anime.anilist_id.in_([base, base + 1, base + 2]))
+                             .values(synopsis_embedding=[0.1] * 256))
+            again = await catalog_sync.upsert_anime(db, changed)
+            await db.commit()
+            result = await db.execute(
+                select(Anime.anilist_id, Anime.popularity, Anime.synopsis_embedding.is_(None))
+                .where(Anime.anilist_id.in_([base, base + 1, base + 2]))
+                .order_by(Anime.anilist_id)
+            )
+            return again, result.all()
+
+    again, rows = asyncio.run(run())
+    assert again == (0, 2)
+    assert [tuple(row) for row in rows] == [(base, 5000, False), (base + 1, 1000, True), (base + 2, 1000, False)]
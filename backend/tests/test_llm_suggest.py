@@ -0,0 +1,230 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+import pytest
+from sqlalchemy import select
+from app import llm_client
+from app.llm_client import LLMRateLimiter, TokenBucket
+from app.llm_suggest import (
+    suggest_tags_for_anime, suggest_concurrently, parse_batch_labels, cached_labels,
+    get_anime_needing_suggestions, SUGGESTION_CACHE_KEY,
+)
+from app.models import Anime, LLMSuggestionCache
+
+TAGS = ["cozy", "melancholic", "hype"]
+
+
+class StubAnthropic:
+    """Local stand-in for the Messages API. `script` is a list of (status, headers, text) replies,
+    consumed in order; once it runs out every request gets `default`. Tracks peak concurrency."""
+
+    def __init__(self, script=None, default=(200, {}, '["cozy", "not-a-tag"]'), delay=0.0):
+        self.script = list(script or [])
+        self.default = default
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                with stub.lock:
+                    stub.requests.append((time.monotonic(), body))
+                    stub.in_flight += 1
+                    stub.peak = max(stub.peak, stub.in_flight)
+                    status, headers, text = stub.script.pop(0) if stub.script else stub.default
+                time.sleep(stub.delay)
+                payload = json.dumps({"content": [{"type": "text", "text": text}]}).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with stub.lock:
+                    stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/messages"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _anime(title="Frieren"):
+    return SimpleNamespace(id=uuid4(), title=title, title_english=None, genres=["Fantasy"], synopsis="Elf mage.")
+
+
+@pytest.fixture
+def stub(monkeypatch, request):
+    with StubAnthropic(**getattr(request, "param", {})) as server:
+        monkeypatch.setattr(llm_client, "ANTHROPIC_API_URL", server.url)
+        yield server
+
+
+@pytest.mark.parametrize("stub", [{"script": [(429, {"retry-after": "0.3"}, "")]}], indirect=True)
+def test_retry_after_is_honoured_and_labels_validated(stub):
+    async def run():
+        async with httpx.AsyncClient(trust_env=False) as client:
+            return await suggest_tags_for_anime(_anime(), TAGS, client, LLMRateLimiter())
+
+    assert asyncio.run(run()) == ["cozy"]  # Unapproved label dropped
+    (first, _), (second, _) = stub.requests
+    assert second - first >= 0.3
+
+
+@pytest.mark.parametrize("stub", [{"script": [(400, {}, "bad request")]}], indirect=True)
+def test_client_errors_are_not_retried(stub):
+    async def run():
+        async with httpx.AsyncClient(trust_env=False) as client:
+            return await suggest_tags_for_anime(_anime(), TAGS, client, LLMRateLimiter())
+
+    assert asyncio.run(run()) is None  # Failure, not "no tags apply" — never cached
+    assert len(stub.requests) == 1
+
+
+@pytest.mark.parametrize("stub", [{"delay": 0.1}], indirect=True)
+def test_pipeline_bounds_in_flight_calls(stub):
+    anime_list = [_anime(f"Anime {i}") for i in range(10)]
+
+    async def run():
+        results = asyncio.Queue()
+        async with httpx.AsyncClient(trust_env=False) as client:
+            await suggest_concurrently(
+                anime_list, TAGS, client, LLMRateLimiter(6000, 10_000_000), results, concurrency=3, batch_size=1,
+            )
+        return [results.get_nowait() for _ in range(results.qsize())]
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+    assert {anime_id for anime_id, _ in results} == {a.id for a in anime_list}
+    assert all(labels == ["cozy"] for _, labels in results)
+    assert 2 <= stub.peak <= 3
+    assert time.monotonic() - started < 10 * 0.1  # Overlapped, not sequential
+
+
+@pytest.mark.parametrize("stub", [{"script": [(200, {}, '```json\n{"1": ["hype", "made-up"], "3": ["melancholic"]}\n```')]}], indirect=True)
+def test_batch_falls_back_per_anime_for_unanswered(stub):
+    """One batched call for 3 anime; anime 2 is missing from the keyed response and gets its own call."""
+    anime_list = [_anime(f"Anime {i}") for i in range(3)]
+
+    async def run():
+        results = asyncio.Queue()
+        async with httpx.AsyncClient(trust_env=False) as client:
+            await suggest_concurrently(anime_list, TAGS, client, LLMRateLimiter(), results, batch_size=3)
+        return dict(results.get_nowait() for _ in range(results.qsize()))
+
+    labels = asyncio.run(run())
+    assert labels == {anime_list[0].id: ["hype"], anime_list[1].id: ["cozy"], anime_list[2].id: ["melancholic"]}
+    assert len(stub.requests) == 2
+    batch_prompt = stub.requests[0][1]["messages"][0]["content"]
+    assert batch_prompt.count("- melancholic") == 1  # Vocabulary sent once for the whole batch
+    assert all(f"Anime {i}" in batch_prompt for i in range(3))
+
+
+def test_parse_batch_labels_rejects_bad_entries():
+    raw = '{"1": ["cozy"], "2": "cozy", "7": ["hype"], "x": [], "3": []}'
+    assert parse_batch_labels(raw, 3, TAGS) == {0: ["cozy"], 2: []}
+    assert parse_batch_labels('["cozy"]', 3, TAGS) == {}
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate_per_minute=600, capacity=1)  # 10/s, no burst
+
+    async def run():
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.28  # First is free, then 3 × 0.1s
+
+
+def test_cached_labels_vocabulary_rules():
+    entry = SimpleNamespace(vocabulary=["cozy", "melancholic", "hype"], labels=["cozy", "hype"])
+    assert cached_labels(entry, TAGS) == ["cozy", "hype"]
+    assert cached_labels(entry, ["cozy", "melancholic"]) == ["cozy"]       # Tag removed — still a hit, filtered
+    assert cached_labels(entry, TAGS + ["bittersweet"]) is None            # Tag added — model never saw it
+
+
+# --- Against the database ---
+
+def _catalog_anime(**overrides):
+    fields = {"title": "Frieren", "title_english": None, "genres": ["Fantasy", "Adventure"], "synopsis": "Elf mage.",
+              # Above anything else in the test database, so the run's MAX_ANIME_PER_RUN window starts here
+              "popularity": 2_000_000_000, **overrides}
+    return Anime(id=uuid4(), anilist_id=random.randrange(10**8, 2**31), **fields)
+
+
+async def _cache_keys(db, anime):
+    rows = await db.execute(select(Anime.id, SUGGESTION_CACHE_KEY).where(Anime.id.in_([a.id for a in anime])))
+    return dict(rows.all())
+
+
+def test_suggestion_cache_key_is_content_addressed(db_sessions):
+    anime = _catalog_anime()
+    reordered = _catalog_anime(genres=["Adventure", "Fantasy"])   # AniList reordering genres
+    edited = _catalog_anime(synopsis="Elf mage, 1000 years on.")
+    quoted = _catalog_anime(title='"Frieren" \\ 葬送のフリーレン\n', genres=None)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([anime, reordered, edited, quoted])
+            await db.commit()
+            return await _cache_keys(db, [anime, reordered, edited, quoted])
+
+    keys = asyncio.run(run())
+    assert keys[anime.id] == keys[reordered.id]  # Content-addressed, not id-addressed
+    assert len({keys[anime.id], keys[edited.id], keys[quoted.id]}) == 3
+    assert all(len(key) == 64 for key in keys.values())
+
+
+def test_anime_answered_with_no_tags_are_not_picked_again(db_sessions):
+    suffix = uuid4().hex[:8]
+    tags = [f"cozy {suffix}", f"hype {suffix}"]
+    none_applied, all_filtered, answered, vocabulary_grew, never_asked = (
+        _catalog_anime(synopsis=f"Elf mage {suffix} {i}.") for i in range(5)
+    )
+    cache = [  # (anime, vocabulary offered, labels answered)
+        (none_applied, tags, []),
+        (all_filtered, tags + [f"gone {suffix}"], [f"gone {suffix}"]),  # Only label since removed from the vocabulary
+        (answered, tags, tags[:1]),                                      # Served from the cache, writes a vote
+        (vocabulary_grew, tags[:1], []),                                 # Model never saw tags[1]
+    ]
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([none_applied, all_filtered, answered, vocabulary_grew, never_asked])
+            await db.commit()
+            keys = await _cache_keys(db, [anime for anime, _, _ in cache])
+            db.add_all([
+                LLMSuggestionCache(input_hash=keys[anime.id], model="test", vocabulary=vocabulary, labels=labels)
+                for anime, vocabulary, labels in cache
+            ])
+            await db.commit()
+            candidates = await get_anime_needing_suggestions(db, tags)
+            return {anime.id: key for anime, key in candidates}, keys
+
+    picked, keys = asyncio.run(run())
+    assert none_applied.id not in picked and all_filtered.id not in picked
+    assert {answered.id, vocabulary_grew.id, never_asked.id} <= picked.keys()
+    assert picked[answered.id] == keys[answered.id]
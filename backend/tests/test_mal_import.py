@@ -0,0 +1,177 @@
+import asyncio
+import io
+import random
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from defusedxml import DefusedXmlException
+from sqlalchemy import select
+from app.models import Anime, ImportJob, User, UserAnimeRelationship, WatchStatus
+from app.importers import iter_mal_entries, next_chunk, _import_chunk, _ImportTally
+
+def _export(n):
+    anime = "".join(
+        f"<anime><series_animedb_id>{i}</series_animedb_id><series_title>Show {i}</series_title>"
+        f"<my_status>Completed</my_status><my_score>{i % 11}</my_score><my_watched_episodes>12</my_watched_episodes>"
+        f"<my_start_date>0000-00-00</my_start_date><my_finish_date>2024-03-01</my_finish_date>"
+        f"<my_times_watched>0</my_times_watched></anime>"
+        for i in range(1, n + 1)
+    )
+    return io.BytesIO(f"<myanimelist><myinfo><user_name>x</user_name></myinfo>{anime}</myanimelist>".encode())
+
+def test_streams_entries_in_chunks():
+    entries = iter_mal_entries(_export(2500))
+    sizes = []
+    while chunk := next_chunk(entries, 1000):
+        sizes.append(len(chunk))
+    assert sizes == [1000, 1000, 500]
+
+    first = next(iter_mal_entries(_export(1)))
+    assert first["mal_id"] == 1 and first["score"] == 1 and first["start_date"] is None
+    assert first["finish_date"].year == 2024
+
+def test_rejects_non_mal_and_entity_expansion():
+    with pytest.raises(ValueError):
+        list(iter_mal_entries(io.BytesIO(b"<html><body/></html>")))
+    bomb = b'<!DOCTYPE x [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;">]><myanimelist>&b;</myanimelist>'
+    with pytest.raises(DefusedXmlException):
+        list(iter_mal_entries(io.BytesIO(bomb)))
+
+
+def _merge_fixture():
+    """A user with four anime on their list and one more in the catalog. Returns (user, anime by letter)."""
+    user = User(username=f"merge_{uuid4().hex[:12]}", email=f"{uuid4().hex}@example.com", hashed_password="x")
+    anime = {
+        letter: Anime(id=uuid4(), anilist_id=random.randrange(10**8, 2**31), title=f"Merge Show {letter}")
+        for letter in "ABCDE"
+    }
+    return user, anime
+
+
+def _entry(anime, status, score=None, eps=None, started=None, finished=None, rewatch=0, updated_at=None):
+    return {
+        "anilist_id": anime.anilist_id, "title": anime.title, "status": status, "score": score,
+        "watched_eps": eps, "start_date": started, "finish_date": finished, "rewatch_count": rewatch,
+        "updated_at": updated_at,
+    }
+
+
+def test_merge_mode_applies_merge_rules_and_counts_field_changes(db_sessions):
+    started = datetime(2024, 1, 5, tzinfo=timezone.utc)
+    finished = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    user, anime = _merge_fixture()
+    A, B, C, D, E = (anime[letter] for letter in "ABCDE")
+    tally = _ImportTally()
+
+    async def run():
+        async with db_sessions() as db:
+            db.add(user)
+            db.add_all(anime.values())
+            await db.flush()
+            db.add_all([
+                UserAnimeRelationship(user_id=user.id, anime_id=A.id, status=WatchStatus.watching,
+                                      currently_watching_ep=5, date_started=started, computed_overall=6.0, rewatch_count=1),
+                UserAnimeRelationship(user_id=user.id, anime_id=B.id, status=WatchStatus.completed,
+                                      score_story=9, computed_overall=9.0),
+                UserAnimeRelationship(user_id=user.id, anime_id=C.id, status=WatchStatus.completed,
+                                      currently_watching_ep=12, computed_overall=7.0),
+                UserAnimeRelationship(user_id=user.id, anime_id=D.id, status=WatchStatus.dropped,
+                                      currently_watching_ep=3, rewatch_count=0),
+            ])
+            await db.commit()
+            seeded_d = (await db.execute(
+                select(UserAnimeRelationship.updated_at).where(UserAnimeRelationship.anime_id == D.id)
+            )).scalar()
+
+            await _import_chunk(db, user.id, [
+                # Missing progress and start date keep ours, rewatch_count never goes down
+                _entry(A, WatchStatus.completed, score=8, finished=finished),
+                # Multi-axis score is ours — the imported single score is ignored, the status still merges
+                _entry(B, WatchStatus.on_hold, score=3),
+                # Older than our row — the user has edited it here since
+                _entry(C, WatchStatus.dropped, updated_at=datetime(2000, 1, 1, tzinfo=timezone.utc)),
+                # Nothing would change — not written at all
+                _entry(D, WatchStatus.dropped, eps=3),
+                _entry(E, WatchStatus.watching, score=7, eps=2),
+            ], Anime.anilist_id, "anilist_id", tally, merge=True)
+            await db.commit()
+
+            rows = (await db.execute(
+                select(UserAnimeRelationship).where(UserAnimeRelationship.user_id == user.id)
+            )).scalars().all()
+            return {row.anime_id: row for row in rows}, seeded_d
+
+    rows, seeded_d = asyncio.run(run())
+    a, b, c, d, e = (rows[x.id] for x in (A, B, C, D, E))
+    assert (a.status, a.currently_watching_ep, a.date_started, a.date_completed) == (WatchStatus.completed, 5, started, finished)
+    assert (a.computed_overall, a.rewatch_count) == (8.0, 1)
+    assert (b.status, b.score_story, b.computed_overall) == (WatchStatus.on_hold, 9, 9.0)
+    assert (c.status, c.computed_overall) == (WatchStatus.completed, 7.0)
+    assert d.updated_at == seeded_d
+    assert (e.status, e.currently_watching_ep, e.computed_overall) == (WatchStatus.watching, 2, 7.0)
+
+    result = tally.as_dict()
+    assert (result["imported"], result["updated"], result["skipped"], result["unmatched_count"]) == (1, 2, 2, 0)
+    assert result["field_changes"] == {
+        "status": 2, "progress": 0, "date_started": 0, "date_completed": 1, "score": 1, "rewatch_count": 0,
+    }
+
+
+def test_failed_upload_save_fails_the_job(monkeypatch, tmp_path):
+    from app.routers import mal_import
+
+    job = SimpleNamespace(id=uuid4(), status="queued", error=None, finished_at=None)
+
+    async def create_job(db, user_id, source, mode):
+        return job
+
+    def save_upload(file, path):
+        open(path, "wb").close()
+        raise OSError("No space left on device")
+
+    class Session:
+        commits = 0
+
+        async def commit(self):
+            self.commits += 1
+
+    monkeypatch.setattr(mal_import, "_create_job", create_job)
+    monkeypatch.setattr(mal_import, "_save_upload", save_upload)
+    monkeypatch.setattr(mal_import, "upload_path", lambda job_id: str(tmp_path / f"{job_id}.xml"))
+    db = Session()
+    with pytest.raises(OSError):
+        asyncio.run(mal_import.import_mal(SimpleNamespace(filename="list.xml"), "skip", uuid4(), db))
+    # Not left queued — the user's next import isn't refused with 409
+    assert job.status == "failed" and job.finished_at is not None and db.commits == 1
+    assert not list(tmp_path.iterdir())
+
+
+def test_one_active_job_per_user_even_when_requests_race(db_sessions):
+    from fastapi import HTTPException
+    from app.routers.mal_import import _create_job, _fail_job
+
+    user = User(username=f"jobs_{uuid4().hex[:12]}", email=f"{uuid4().hex}@example.com", hashed_password="x")
+
+    async def create(source):
+        async with db_sessions() as db:
+            try:
+                return await _create_job(db, user.id, source, "skip")
+            except HTTPException as exc:
+                return exc.status_code
+
+    async def run():
+        async with db_sessions() as db:
+            db.add(user)
+            await db.commit()
+        # Both requests arrive together — the unique index lets exactly one in
+        outcomes = await asyncio.gather(create("mal"), create("anilist"))
+        assert sorted(outcome if isinstance(outcome, int) else 202 for outcome in outcomes) == [202, 409]
+        job = next(outcome for outcome in outcomes if not isinstance(outcome, int))
+
+        async with db_sessions() as db:
+            await _fail_job(db, await db.get(ImportJob, job.id), "Test over.")
+        # Finished jobs don't count
+        assert not isinstance(await create("mal"), int)
+
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+import asyncio
+import math
+import random
+import uuid
+from collections import Counter
+
+from sqlalchemy import select, update
+from app.models import Anime, User, UserAnimeRelationship, UserProfileSummary, WatchStatus
+from app.routers.anime_list import add_to_list
+from app.routers.users import compute_profile_summary, get_user_profile
+from app.profile_summary import PROFILE_SUMMARY_FORMAT, is_fresh, store_profile_summary
+from app.schemas import ListEntryCreate
+
+GENRES = (["Action", "Drama"], ["Drama"], ["Comedy", "Drama"], None, ["Action"])
+# (status, computed_overall) per entry, one entry per anime above. 5.5 and 9.5 sit on bucket edges
+ENTRIES = (
+    (WatchStatus.completed, 5.5), (WatchStatus.completed, 9.5), (WatchStatus.on_hold, 7.2),
+    (WatchStatus.dropped, None), (WatchStatus.plan_to_watch, 1.0),
+)
+
+
+async def _seed_list(db, entries=ENTRIES):
+    """A fresh user with one list entry per (status, score), on anime with GENRES. Returns the user."""
+    user = User(username=f"profile_{uuid.uuid4().hex[:12]}", email=f"{uuid.uuid4().hex}@example.com", hashed_password="x")
+    anime = [Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title=f"Profile Show {i}", genres=genres)
+             for i, genres in enumerate(GENRES)]
+    db.add_all([user, *anime])
+    await db.flush()
+    db.add_all([
+        UserAnimeRelationship(user_id=user.id, anime_id=show.id, status=status, computed_overall=overall)
+        for show, (status, overall) in zip(anime, entries)
+    ])
+    await db.commit()
+    return user
+
+
+def test_profile_summary_matches_the_list(db_sessions):
+    async def run():
+        async with db_sessions() as db:
+            user = await _seed_list(db)
+            return await compute_profile_summary(db, user.id)
+
+    summary = asyncio.run(run())
+    statuses = Counter(status.name for status, _ in ENTRIES)
+    scores = [overall for _, overall in ENTRIES if overall is not None]
+    assert summary["stats"] == {
+        "total": len(ENTRIES),
+        **{status.name: statuses[status.name] for status in WatchStatus},
+        "mean_score": round(sum(scores) / len(scores), 2),
+    }
+    buckets = Counter(math.floor(score + 0.5) for score in scores)  # Half up: 5.5 -> 6, 9.5 -> 10
+    assert summary["score_distribution"] == {str(k): buckets[k] for k in range(1, 11)}
+    genres = Counter(genre for genres in GENRES if genres for genre in genres)
+    assert summary["genre_breakdown"] == [
+        {"genre": genre, "count": count} for genre, count in sorted(genres.items(), key=lambda g: (-g[1], g[0]))
+    ]
+
+
+def test_empty_list_has_zero_counts_and_no_mean(db_sessions):
+    async def run():
+        async with db_sessions() as db:
+            user = await _seed_list(db, entries=())
+            return await compute_profile_summary(db, user.id)
+
+    summary = asyncio.run(run())
+    assert summary["stats"]["total"] == 0 and summary["stats"]["mean_score"] is None
+    assert summary["genre_breakdown"] == [] and set(summary["score_distribution"].values()) == {0}
+
+
+def test_summary_fresh_only_at_current_version_and_format():
+    summary = {"format": PROFILE_SUMMARY_FORMAT, "stats": {}}
+    assert is_fresh(3, 3, summary)
+    assert not is_fresh(4, 3, summary)  # list written since the summary was computed
+    assert not is_fresh(None, None, None)  # no row yet
+    assert not is_fresh(3, 3, {**summary, "format": PROFILE_SUMMARY_FORMAT - 1})
+
+
+def test_profile_served_from_summary_until_the_list_changes(db_sessions):
+    async def view(username):
+        async with db_sessions() as db:
+            return await get_user_profile(username, db=db)
+
+    async def stored(user_id):
+        async with db_sessions() as db:
+            return (await db.execute(select(UserProfileSummary).where(UserProfileSummary.user_id == user_id))).scalar_one()
+
+    async def run():
+        async with db_sessions() as db:
+            user = await _seed_list(db)
+            extra = Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title="Profile Extra")
+            db.add(extra)
+            await db.commit()
+
+        first = await view(user.username)  # No summary row yet — computed and stored
+        computed = await stored(user.id)
+        assert (computed.version, computed.computed_version) == (0, 0)
+        assert await view(user.username) == first
+        assert (await stored(user.id)).computed_at == computed.computed_at  # Served, not recomputed
+
+        async with db_sessions() as db:
+            await add_to_list(ListEntryCreate(anime_id=extra.id, status="watching", score_story=8), user.id, db=db)
+        assert (await stored(user.id)).version == 1  # Dirty
+        after_write = await view(user.username)
+        assert after_write["stats"]["total"] == first["stats"]["total"] + 1
+        assert after_write["stats"]["watching"] == first["stats"]["watching"] + 1
+        assert (await stored(user.id)).computed_version == 1
+
+        # A recompute that read an older version can't replace a newer summary
+        async with db_sessions() as db:
+            await store_profile_summary(db, user.id, 0, {"stats": {}})
+            await db.commit()
+        assert (await stored(user.id)).summary["stats"] == after_write["stats"]
+
+        # Summaries in an older format are recomputed on read
+        async with db_sessions() as db:
+            await db.execute(update(UserProfileSummary).where(UserProfileSummary.user_id == user.id)
+                             .values(summary={"format": PROFILE_SUMMARY_FORMAT - 1}))
+            await db.commit()
+        assert await view(user.username) == after_write
+        assert (await stored(user.id)).summary["format"] == PROFILE_SUMMARY_FORMAT
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+import asyncio
+import random
+import uuid
+
+from app.models import Anime
+from app.routers.anime import search_query
+
+# Against the database. Titles carry a made-up word unique to the test, so only the seeded anime match it.
+
+
+def _word():
+    return "".join(random.choice("bcdfghjklmnpqrstvwxz") for _ in range(9))
+
+
+def _show(title, popularity=None, title_english=None):
+    return Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title=title,
+                 title_english=title_english, popularity=popularity)
+
+
+async def _search(db_sessions, shows, q, **kwargs):
+    async with db_sessions() as db:
+        db.add_all(shows)
+        await db.commit()
+        return [anime.title for anime in (await db.execute(search_query(q, **kwargs))).scalars()]
+
+
+def test_search_ranks_prefix_then_popularity(db_sessions):
+    word = _word()
+    shows = [
+        _show(f"The {word} Chronicles", popularity=1_000_000),      # Hit show, query mid-title
+        _show(f"Another {word} Tale", popularity=10),
+        _show(f"{word} Beginnings", popularity=10),                 # Title starts with the query
+        _show(f"Tales of {word}", popularity=1_000),
+        _show("Kimi no Na wa", title_english=f"{word}: Your Name"),  # Prefix on the English title
+    ]
+    titles = asyncio.run(_search(db_sessions, shows, word, limit=10))
+    # Same word similarity everywhere: the prefix boost outweighs any popularity, popularity orders the rest
+    assert titles == [f"{word} Beginnings", "Kimi no Na wa", f"The {word} Chronicles",
+                      f"Tales of {word}", f"Another {word} Tale"]
+
+
+def test_search_treats_like_wildcards_literally(db_sessions):
+    word = _word()
+    shows = [_show(f"{word} 100%_ Done"), _show(f"{word} Plain")]
+    # Escaped, "%_" only matches itself; as wildcards it would match every title.
+    # No letters or digits either, so the trigram match can't find anything
+    titles = asyncio.run(_search(db_sessions, shows, "%_", limit=50))
+    assert f"{word} 100%_ Done" in titles
+    assert all("%_" in title for title in titles)
+
+
+def test_search_pages_do_not_overlap(db_sessions):
+    word = _word()
+    shows = [_show(f"{word} Season {i}", popularity=500) for i in range(7)]  # All tied on rank
+
+    async def run():
+        return [await _search(db_sessions, shows if offset == 0 else [], word, limit=3, offset=offset)
+                for offset in range(0, 9, 3)]
+
+    pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [3, 3, 1]
+    seen = [title for page in pages for title in page]
+    assert sorted(seen) == sorted(show.title for show in shows)  # Every show once, none twice
@@ -0,0 +1,60 @@
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.synopsis_embedding import DocumentFrequencies, embed_document, embed_query, tokenize, EMBEDDING_DIM
+from app.routers.anime import semantic_query
+
+CATALOG = {
+    "space": ("A crew of bounty hunters drifts through space aboard their ship, chasing bounties across the "
+              "solar system while their pasts catch up with them.", ["Action", "Sci-Fi"]),
+    "mecha": ("Pilots of giant robots defend the last human city. The pilots sync with their robots and "
+              "fight the invaders from space.", ["Mecha", "Sci-Fi"]),
+    "insects": ("Ginko wanders the countryside studying mushi, quiet spirits that cause strange illnesses in "
+                "the villages he visits.<br><br>(Source: Crunchyroll)", ["Mystery", "Slice of Life", "Supernatural"]),
+    "school": ("A high school volleyball club trains all summer for the national tournament.", ["Sports"]),
+}
+
+
+def _frequencies():
+    frequencies = DocumentFrequencies()
+    for synopsis, _ in CATALOG.values():
+        frequencies.add(synopsis)
+    return frequencies
+
+
+def _embeddings():
+    frequencies = _frequencies()
+    return {key: embed_document(synopsis, genres, frequencies) for key, (synopsis, genres) in CATALOG.items()}
+
+
+def test_tokenize_drops_markup_credits_and_stopwords():
+    assert tokenize("The <i>bounty hunters</i> of space.<br>(Source: Crunchyroll)") == ["bounty", "hunter", "space"]
+
+
+def test_embeddings_are_unit_length_and_deterministic():
+    first, second = _embeddings(), _embeddings()
+    for key, vector in first.items():
+        assert vector.shape == (EMBEDDING_DIM,)
+        assert abs(np.linalg.norm(vector) - 1) < 1e-5
+        assert np.array_equal(vector, second[key])
+    assert embed_document(None, [], _frequencies()) is None
+
+
+def test_query_lands_nearest_the_matching_synopsis():
+    embeddings = _embeddings()
+    for query, expected in [
+        ("giant robot pilots", "mecha"),
+        ("quiet wandering through the countryside", "insects"),
+        ("volleyball tournament", "school"),
+        ("bounty hunter", "space"),
+    ]:
+        target = embed_query(query)
+        assert max(embeddings, key=lambda key: float(embeddings[key] @ target)) == expected
+    assert embed_query("the and of") is None  # Nothing searchable left after stopwords
+
+
+def test_semantic_query_orders_by_bare_distance_for_hnsw():
+    target = np.ones(EMBEDDING_DIM, dtype=np.float32) / np.sqrt(EMBEDDING_DIM)
+    sql = str(semantic_query(target, 20).compile(dialect=postgresql.asyncpg.dialect()))
+    assert "ORDER BY anime.synopsis_embedding <=> " in sql  # The index only serves a plain <=> ordering
+    assert "anime.synopsis_embedding IS NOT NULL" in sql
@@ -0,0 +1,125 @@
+import asyncio
+import random
+import uuid
+
+from sqlalchemy import select, update, delete, func, tuple_, literal_column
+from sqlalchemy.dialects.postgresql import insert
+
+from app.constants import SYSTEM_USER_ID
+from app.models import Anime, AnimeTagCount, MoodTag, User, UserAnimeMoodTag
+from app.scheduler import _correct_tag_counts
+from app.tag_votes import add_votes, remove_vote
+
+# Against the database: anime_tag_counts must always equal a fresh count of user_anime_mood_tags.
+
+
+def _seed(n_users, n_anime, n_tags):
+    suffix = uuid.uuid4().hex[:10]
+    users = [User(username=f"votes_{suffix}_{i}", email=f"votes_{suffix}_{i}@example.com", hashed_password="x")
+             for i in range(n_users)]
+    anime = [Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title=f"Votes Show {i}")
+             for i in range(n_anime)]
+    tags = [MoodTag(id=uuid.uuid4(), label=f"Votes {suffix} {i}", slug=f"votes-{suffix}-{i}") for i in range(n_tags)]
+    return users, anime, tags
+
+
+async def _ensure_system_user(db):
+    # Seeded by a migration in real deployments; the test schema comes from create_all
+    await db.execute(insert(User).values(
+        id=SYSTEM_USER_ID, username="system", email="system@localhost", hashed_password="!",
+    ).on_conflict_do_nothing())
+
+
+async def _assert_counts_match_votes(db, anime_ids):
+    raw = (await db.execute(
+        select(
+            UserAnimeMoodTag.anime_id, UserAnimeMoodTag.mood_tag_id,
+            func.count().filter(UserAnimeMoodTag.user_id != SYSTEM_USER_ID),
+            func.count().filter(UserAnimeMoodTag.user_id == SYSTEM_USER_ID),
+        )
+        .where(UserAnimeMoodTag.anime_id.in_(anime_ids))
+        .group_by(UserAnimeMoodTag.anime_id, UserAnimeMoodTag.mood_tag_id)
+    )).all()
+    stored = (await db.execute(
+        select(AnimeTagCount.anime_id, AnimeTagCount.mood_tag_id, AnimeTagCount.real_votes, AnimeTagCount.system_votes)
+        .where(AnimeTagCount.anime_id.in_(anime_ids))
+    )).all()
+    # A row at zero and no row both mean "nobody voted it"
+    expected = {(a, t): (real, system) for a, t, real, system in raw}
+    actual = {(a, t): (real, system) for a, t, real, system in stored if (real, system) != (0, 0)}
+    assert actual == expected
+
+
+async def _unvote(db_sessions, user_id, anime, tag):
+    async with db_sessions() as db:
+        await remove_vote(db, await db.get(UserAnimeMoodTag, (user_id, anime.id, tag.id)))
+        await db.commit()
+
+
+def test_votes_keep_tag_counts_in_step(db_sessions):
+    (alice, bob), shows, (calm, tense) = _seed(2, 2, 2)
+    ids = [show.id for show in shows]
+
+    async def run():
+        async with db_sessions() as db:
+            await _ensure_system_user(db)
+            db.add_all([alice, bob, *shows, calm, tense])
+            await db.commit()
+
+        for user_id, pairs in (
+            (alice.id, [(ids[0], calm.id), (ids[0], tense.id), (ids[1], calm.id)]),
+            (bob.id, [(ids[0], calm.id)]),
+            (SYSTEM_USER_ID, [(ids[0], calm.id), (ids[1], tense.id)]),  # LLM suggestions count separately
+        ):
+            async with db_sessions() as db:
+                await add_votes(db, user_id, pairs)
+                await db.commit()
+        async with db_sessions() as db:
+            await _assert_counts_match_votes(db, ids)
+            counts = await db.get(AnimeTagCount, (ids[0], calm.id))
+            assert (counts.real_votes, counts.system_votes) == (2, 1)
+
+        await _unvote(db_sessions, alice.id, shows[0], calm)
+        await _unvote(db_sessions, SYSTEM_USER_ID, shows[1], tense)
+        await _unvote(db_sessions, alice.id, shows[1], calm)
+        async with db_sessions() as db:
+            await _assert_counts_match_votes(db, ids)
+
+    asyncio.run(run())
+
+
+def test_correction_fixes_only_drifted_pairs(db_sessions):
+    (alice, bob), shows, (calm, tense) = _seed(2, 2, 2)
+    ids = [show.id for show in shows]
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([alice, bob, *shows, calm, tense])
+            await db.commit()
+            await add_votes(db, alice.id, [(ids[0], calm.id), (ids[0], tense.id), (ids[1], calm.id)])
+            await add_votes(db, bob.id, [(ids[0], calm.id)])
+            await db.commit()
+
+            await db.execute(update(AnimeTagCount)                                        # Count off
+                             .where(AnimeTagCount.anime_id == ids[0], AnimeTagCount.mood_tag_id == calm.id)
+                             .values(real_votes=7))
+            await db.execute(delete(AnimeTagCount)                                        # Row lost
+                             .where(AnimeTagCount.anime_id == ids[0], AnimeTagCount.mood_tag_id == tense.id))
+            db.add(AnimeTagCount(anime_id=ids[1], mood_tag_id=tense.id, real_votes=3, system_votes=1))  # Nobody voted
+            await db.commit()
+
+            # xmin changes whenever a row is rewritten — an untouched pair keeps its own
+            xmin = literal_column("anime_tag_counts.xmin::text")
+            untouched = select(xmin).where(tuple_(AnimeTagCount.anime_id, AnimeTagCount.mood_tag_id) == (ids[1], calm.id))
+            before = (await db.execute(untouched)).scalar()
+
+        async with db_sessions() as db:
+            assert await _correct_tag_counts(db) >= 3
+        async with db_sessions() as db:
+            await _assert_counts_match_votes(db, ids)
+            assert (await db.execute(untouched)).scalar() == before
+            # Run again: nothing of ours is left to correct
+            await _correct_tag_counts(db)
+            assert (await db.execute(untouched)).scalar() == before
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+import numpy as np
+from app import taste_compatibility
+from app.taste_compatibility import _unit_rows, edge_similarity, top_k_neighbors, canonical_pairs
+
+def test_top_k_matches_brute_force_across_blocks(monkeypatch):
+    """Blocked matmul + argpartition finds the same neighbors as a full sort, never including self."""
+    monkeypatch.setattr(taste_compatibility, "NEIGHBOR_BLOCK_SIZE", 7)  # Force several uneven blocks
+    rng = np.random.default_rng(0)
+    unit = _unit_rows(rng.normal(size=(30, 16)).astype(np.float32))
+
+    rows, cols, sims = top_k_neighbors(unit, 4)
+
+    full = unit @ unit.T
+    np.fill_diagonal(full, -np.inf)
+    for i in range(30):
+        assert set(cols[rows == i]) == set(np.argsort(-full[i])[:4])
+        assert i not in cols[rows == i]
+    assert np.allclose(sims, full[rows, cols])
+
+def test_edges_and_pairs_are_canonical_and_deduplicated():
+    """A follow edge that is also a neighbor pair, seen from both sides, is stored once as (low, high)."""
+    unit = _unit_rows(np.array([[1, 0], [1, 1], [0, 1]], dtype=np.float32))
+    sims = edge_similarity(unit, np.array([2, 0]), np.array([0, 1]))
+    assert np.allclose(sims, [0.0, np.sqrt(0.5)])
+
+    low, high, similarity = canonical_pairs(
+        np.array([2, 0, 1, 1]), np.array([0, 1, 0, 1]), np.array([0.0, 0.7, 0.7, 1.0]), n=3,
+    )
+    assert sorted(zip(low.tolist(), high.tolist())) == [(0, 1), (0, 2)]  # Self pair dropped too
+    assert np.all(low < high)
+
+def test_top_k_handles_tiny_populations():
+    assert len(top_k_neighbors(_unit_rows(np.ones((1, 4), dtype=np.float32)), 20)[0]) == 0
+    rows, cols, _ = top_k_neighbors(_unit_rows(np.eye(3, dtype=np.float32)), 20)
+    assert len(rows) == 6  # k capped at n - 1
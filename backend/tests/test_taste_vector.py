@@ -0,0 +1,83 @@
+import asyncio
+import math
+import uuid
+
+import numpy as np
+from app.models import User
+from app.routers.users import get_similar_users
+from app.taste_vector import (
+    build_taste_vectors, GENRES, VECTOR_DIM, GENRE_SLICE, AXIS_SLICE, MOOD_SLICE,
+    GENRE_WEIGHT, AXIS_WEIGHT, MOOD_WEIGHT,
+)
+
+def _scored(user_idx, n, score, genre_col, axes=None):
+    genres = np.zeros((n, len(GENRES)), dtype=np.float32)
+    genres[:, genre_col] = 1
+    axis_row = [np.nan] * 5 if axes is None else axes
+    return (
+        np.full(n, user_idx), genres, np.full(n, score, dtype=np.float32),
+        np.array([axis_row] * n, dtype=np.float32),
+    )
+
+def test_taste_vector_segments_and_threshold():
+    """User 0 has 5 scored anime → vector. User 1 has 4 → NULL (has_vector False)."""
+    u0 = _scored(0, 5, 9.0, 0, axes=[9, 8, np.nan, 7, 10])
+    u1 = _scored(1, 4, 3.0, 2)
+    parts = [np.concatenate([a, b]) for a, b in zip(u0, u1)]
+
+    vectors, has_vector = build_taste_vectors(
+        2, parts[0], parts[1], parts[2], parts[3],
+        vote_user_idx=np.array([0, 0, 1]), vote_tag_idx=np.array([4, 4, 10]),
+    )
+
+    assert vectors.shape == (2, VECTOR_DIM)
+    assert has_vector.tolist() == [True, False]
+    v = vectors[0]
+    assert np.isclose(np.linalg.norm(v[GENRE_SLICE]), GENRE_WEIGHT)
+    assert np.isclose(np.linalg.norm(v[AXIS_SLICE]), AXIS_WEIGHT)
+    assert np.isclose(np.linalg.norm(v[MOOD_SLICE]), MOOD_WEIGHT)
+    assert v[GENRE_SLICE][0] > 0          # Liked Action
+    assert v[MOOD_SLICE][4] > 0           # Applied mood tag 4
+    assert np.all(v[MOOD_SLICE.stop:] == 0)  # Buffer stays zero
+
+def test_taste_vector_low_scores_push_away():
+    """Scores below the midpoint give negative genre affinity."""
+    user = _scored(0, 5, 2.0, 3)
+    vectors, _ = build_taste_vectors(
+        1, *user, vote_user_idx=np.array([], dtype=np.int64), vote_tag_idx=np.array([], dtype=np.int64),
+    )
+    assert vectors[0, GENRE_SLICE][3] < 0
+    assert np.all(vectors[0, AXIS_SLICE] == 0)  # No axis scores → zero segment, not NaN
+
+
+# --- Against the database: GET /users/{username}/similar ---
+
+def test_similar_users_ordered_by_cosine_distance(db_sessions):
+    # Unit vectors at known angles from `me` in a plane picked at random, so users
+    # other tests leave in the database sit near 90° and never come between these
+    rng = np.random.default_rng()
+    base, across = np.eye(VECTOR_DIM)[rng.choice(VECTOR_DIM, 2, replace=False)]
+    suffix = uuid.uuid4().hex[:10]
+
+    def user(name, angle=None, is_active=True):
+        vector = None if angle is None else (math.cos(angle) * base + math.sin(angle) * across).tolist()
+        return User(username=f"sim_{name}_{suffix}", email=f"sim_{name}_{suffix}@example.com", hashed_password="x",
+                    taste_vector=vector, is_active=is_active)
+
+    me = user("me", 0.0)
+    far, near, mid = user("far", 1.2), user("near", 0.2), user("mid", 0.6)
+    twin = user("twin", 0.0)
+    no_vector, deactivated = user("novector"), user("deactivated", 0.1, is_active=False)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([me, far, near, mid, twin, no_vector, deactivated])
+            await db.commit()
+            return await get_similar_users(me.username, limit=50, ef_search=100, db=db)
+
+    similar = asyncio.run(run())
+    ours = [result for result in similar if result.username.endswith(suffix)]
+    assert [result.username for result in ours] == [twin.username, near.username, mid.username, far.username]
+    assert [result.similarity for result in ours] == [1.0, *(round(math.cos(a), 4) for a in (0.2, 0.6, 1.2))]
+    # me itself, no vector and inactive never come back
+    assert not {me.username, no_vector.username, deactivated.username} & {result.username for result in similar}
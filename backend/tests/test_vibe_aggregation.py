@@ -0,0 +1,152 @@
+import asyncio
+import random
+import uuid
+
+from sqlalchemy import select, delete
+
+from app import scheduler
+from app.models import Anime, MoodTag, MoodTagVoteChange, User, UserAnimeMoodTag
+from app.tag_votes import add_votes, remove_vote
+
+# Against the database. Every test makes its own users, anime and tags, so usage_count only ever
+# counts this test's votes. The aggregation itself runs over the whole shared database.
+
+
+def _seed(n_users, n_anime, n_tags):
+    suffix = uuid.uuid4().hex[:10]
+    users = [User(username=f"vibe_{suffix}_{i}", email=f"vibe_{suffix}_{i}@example.com", hashed_password="x")
+             for i in range(n_users)]
+    anime = [Anime(id=uuid.uuid4(), anilist_id=random.randrange(10**8, 2**31), title=f"Vibe Show {i}")
+             for i in range(n_anime)]
+    tags = [MoodTag(id=uuid.uuid4(), label=f"Vibe {suffix} {i}", slug=f"vibe-{suffix}-{i}") for i in range(n_tags)]
+    return users, anime, tags
+
+
+async def _aggregate(db_sessions, monkeypatch, full=False):
+    monkeypatch.setattr(scheduler, "AsyncSessionLocal", db_sessions)
+    await scheduler.aggregate_vibe_tags(full=full)
+
+
+async def _state(db_sessions, anime, tags):
+    """(cached_vibe_tags per anime, usage_count per tag) for this test's rows."""
+    async with db_sessions() as db:
+        cached = dict((await db.execute(
+            select(Anime.id, Anime.cached_vibe_tags).where(Anime.id.in_([a.id for a in anime]))
+        )).all())
+        usage = dict((await db.execute(
+            select(MoodTag.slug, MoodTag.usage_count).where(MoodTag.id.in_([t.id for t in tags]))
+        )).all())
+    return [cached[a.id] for a in anime], usage
+
+
+async def _vote(db_sessions, user, pairs):
+    async with db_sessions() as db:
+        await add_votes(db, user.id, pairs)
+        await db.commit()
+
+
+async def _unvote(db_sessions, user, anime, tag):
+    async with db_sessions() as db:
+        vote = await db.get(UserAnimeMoodTag, (user.id, anime.id, tag.id))
+        await remove_vote(db, vote)
+        await db.commit()
+
+
+def _cache(tag, count):
+    return {tag.slug: {"label": tag.label, "count": count}}
+
+
+def test_incremental_applies_votes_added_and_removed_and_agrees_with_full(db_sessions, monkeypatch):
+    (u1, u2), (a1, a2), (t1, t2) = _seed(2, 2, 2)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([u1, u2, a1, a2, t1, t2])
+            await db.commit()
+
+        await _vote(db_sessions, u1, [(a1.id, t1.id), (a1.id, t2.id)])
+        await _vote(db_sessions, u2, [(a1.id, t1.id), (a2.id, t2.id)])
+        await _aggregate(db_sessions, monkeypatch)
+        cached, usage = await _state(db_sessions, [a1, a2], [t1, t2])
+        assert cached == [{**_cache(t1, 2), **_cache(t2, 1)}, _cache(t2, 1)]
+        assert usage == {t1.slug: 2, t2.slug: 2}
+
+        # Removed since the last run, plus an add and remove of the same pair that nets to zero
+        await _unvote(db_sessions, u1, a1, t2)
+        await _unvote(db_sessions, u2, a2, t2)
+        await _vote(db_sessions, u2, [(a2.id, t1.id)])
+        await _unvote(db_sessions, u2, a2, t1)
+        await _aggregate(db_sessions, monkeypatch)
+        incremental = await _state(db_sessions, [a1, a2], [t1, t2])
+        assert incremental == ([_cache(t1, 2), {}], {t1.slug: 2, t2.slug: 0})
+        async with db_sessions() as db:
+            logged = (await db.execute(
+                select(MoodTagVoteChange.id).where(MoodTagVoteChange.anime_id.in_([a1.id, a2.id]))
+            )).all()
+        assert logged == []  # Every consumed row deleted
+
+        # The full rebuild recounts from scratch and must land on exactly the same state
+        await _aggregate(db_sessions, monkeypatch, full=True)
+        assert await _state(db_sessions, [a1, a2], [t1, t2]) == incremental
+
+    asyncio.run(run())
+
+
+def test_vote_committed_after_the_snapshot_survives_to_the_next_run(db_sessions, monkeypatch):
+    (u1, u2), (a1, a2), (t1,) = _seed(2, 2, 1)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([u1, u2, a1, a2, t1])
+            await db.commit()
+
+        async with db_sessions() as late:
+            # Takes its change log id now but commits only after the run's snapshot — a lower id
+            # than the vote below that the snapshot does see
+            await add_votes(late, u2.id, [(a2.id, t1.id)])
+            await _vote(db_sessions, u1, [(a1.id, t1.id)])
+
+            write_vibe_tags = scheduler._write_vibe_tags
+
+            async def commit_late_vote_then_write(db, anime_tag_map):
+                if late.in_transaction():
+                    await late.commit()
+                await write_vibe_tags(db, anime_tag_map)
+
+            monkeypatch.setattr(scheduler, "_write_vibe_tags", commit_late_vote_then_write)
+            await _aggregate(db_sessions, monkeypatch)
+            monkeypatch.setattr(scheduler, "_write_vibe_tags", write_vibe_tags)
+
+        cached, usage = await _state(db_sessions, [a1, a2], [t1])
+        assert cached == [_cache(t1, 1), {}] and usage == {t1.slug: 1}
+        async with db_sessions() as db:
+            left = (await db.execute(
+                select(MoodTagVoteChange.delta).where(MoodTagVoteChange.anime_id == a2.id)
+            )).scalars().all()
+        assert left == [1]  # Not deleted with the rows the snapshot read
+
+        await _aggregate(db_sessions, monkeypatch)
+        assert await _state(db_sessions, [a1, a2], [t1]) == ([_cache(t1, 1), _cache(t1, 1)], {t1.slug: 2})
+
+    asyncio.run(run())
+
+
+def test_full_run_resets_anime_and_tags_left_without_votes(db_sessions, monkeypatch):
+    (u1, u2), (a1, a2), (t1, t2) = _seed(2, 2, 2)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add_all([u1, u2, a1, a2, t1, t2])
+            await db.commit()
+        await _vote(db_sessions, u1, [(a1.id, t1.id)])
+        await _vote(db_sessions, u2, [(a2.id, t2.id)])
+        await _aggregate(db_sessions, monkeypatch)
+
+        # Deleting a user cascades their votes away without writing the change log
+        async with db_sessions() as db:
+            await db.execute(delete(User).where(User.id == u2.id))
+            await db.commit()
+        await _aggregate(db_sessions, monkeypatch, full=True)
+        assert await _state(db_sessions, [a1, a2], [t1, t2]) == ([_cache(t1, 1), {}], {t1.slug: 1, t2.slug: 0})
+
+    asyncio.run(run())
@@ -65,6 +65,9 @@ export default async function AnimeDetailPage({
                   <span style={{ color: "var(--text-muted)" }}>Arcanum</span>
                   <span style={{ color: "var(--pill-text)" }} className="font-semibold">
                     {anime.arcanum_score}
+                    <span className="font-normal text-xs ml-1" style={{ color: "var(--text-muted)" }}>
+                      ({anime.arcanum_rating_count})
+                    </span>
                   </span>
                 </div>
               )}
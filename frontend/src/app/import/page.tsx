@@ -1,26 +1,95 @@
 "use client";
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useRouter } from "next/navigation";
 import { getToken, getUsername } from "@/lib/auth";
 
-interface ImportResult {
+interface ImportJob {
+  id: string;
+  status: "queued" | "running" | "completed" | "failed";
+  processed: number;
+  total_in_file: number | null;
+  mode: "skip" | "merge";
   imported: number;
+  updated: number;
   skipped: number;
+  field_changes: Record<string, number> | null;
   unmatched_count: number;
   unmatched_titles: string[];
-  total_in_file: number;
+  error: string | null;
 }
 
 type ImportMethod = "mal" | "anilist";
 
+// Imports run in the background on the server; we only hold on to the job id and poll it.
+// Kept in localStorage so a reload or navigating away and back picks the same job up again.
+const JOB_STORAGE_KEY = "arcanum_import_job";
+const POLL_INTERVAL_MS = 1000;
+
+const FIELD_LABELS: Record<string, string> = {
+  status: "Status",
+  progress: "Progress",
+  date_started: "Start date",
+  date_completed: "Finish date",
+  score: "Score",
+  rewatch_count: "Rewatches",
+};
+
 export default function ImportPage() {
   const router = useRouter();
   const [method, setMethod] = useState<ImportMethod>("anilist");
   const [file, setFile] = useState<File | null>(null);
   const [anilistUsername, setAnilistUsername] = useState("");
+  const [merge, setMerge] = useState(false);
   const [loading, setLoading] = useState(false);
-  const [result, setResult] = useState<ImportResult | null>(null);
+  const [job, setJob] = useState<ImportJob | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const pollTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+  const result = job?.status === "completed" ? job : null;
+
+  const stopPolling = () => {
+    if (pollTimer.current) clearTimeout(pollTimer.current);
+    pollTimer.current = null;
+  };
+
+  const pollJob = async (jobId: string) => {
+    const token = getToken();
+    if (!token) return;
+    try {
+      const res = await fetch(`${apiUrl}/import/jobs/${jobId}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) {
+        // Job gone (or belongs to someone else after a logout/login) — forget it
+        localStorage.removeItem(JOB_STORAGE_KEY);
+        setLoading(false);
+        return;
+      }
+      const data: ImportJob = await res.json();
+      setJob(data);
+      if (data.status === "completed" || data.status === "failed") {
+        localStorage.removeItem(JOB_STORAGE_KEY);
+        if (data.status === "failed") setError(data.error || "Import failed. Please try again.");
+        setLoading(false);
+        return;
+      }
+    } catch {
+      // Transient network blip — keep polling, the job keeps running server-side regardless
+    }
+    pollTimer.current = setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+  };
+
+  // Resume an import that was started before a reload
+  useEffect(() => {
+    const jobId = localStorage.getItem(JOB_STORAGE_KEY);
+    if (jobId && getToken()) {
+      setLoading(true);
+      pollJob(jobId);
+    }
+    return stopPolling;
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
 
   const handleSubmit = async () => {
     const token = getToken();
@@ -29,11 +98,10 @@ export default function ImportPage() {
       return;
     }
 
+    stopPolling();
     setLoading(true);
     setError(null);
-    setResult(null);
-
-    const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+    setJob(null);
 
     try {
       let res: Response;
@@ -47,6 +115,7 @@ export default function ImportPage() {
         }
         const formData = new FormData();
         formData.append("file", file);
+        formData.append("mode", merge ? "merge" : "skip");
         res = await fetch(`${apiUrl}/import/mal`, {
           method: "POST",
           headers: { Authorization: `Bearer ${token}` },
@@ -60,13 +129,17 @@ export default function ImportPage() {
             "Content-Type": "application/json",
             Authorization: `Bearer ${token}`,
           },
-          body: JSON.stringify({ username: anilistUsername.trim() }),
+          body: JSON.stringify({ username: anilistUsername.trim(), mode: merge ? "merge" : "skip" }),
         });
       }
 
       if (res.ok) {
-        const data = await res.json();
-        setResult(data);
+        // 202 — the import is queued; poll it until it finishes
+        const data: ImportJob = await res.json();
+        setJob(data);
+        localStorage.setItem(JOB_STORAGE_KEY, data.id);
+        pollJob(data.id);
+        return;
       } else {
         const data = await res.json();
         setError(data.detail || "Import failed. Please try again.");
@@ -77,6 +150,12 @@ export default function ImportPage() {
     setLoading(false);
   };
 
+  const progressLabel = () => {
+    if (!job || job.status === "queued") return "Queued...";
+    if (job.total_in_file) return `Importing... ${job.processed} / ${job.total_in_file}`;
+    return `Importing... ${job.processed} entries`;
+  };
+
   const canSubmit = method === "mal" ? !!file : !!anilistUsername.trim();
 
   return (
@@ -93,7 +172,7 @@ export default function ImportPage() {
             Bring your list.
           </h1>
           <p className="text-sm" style={{ color: "var(--text-secondary)" }}>
-            Your watch history arrives instantly.
+            Your watch history arrives in the background — you can leave this page.
           </p>
         </div>
 
@@ -105,7 +184,7 @@ export default function ImportPage() {
           {(["anilist", "mal"] as ImportMethod[]).map(m => (
             <button
               key={m}
-              onClick={() => { setMethod(m); setResult(null); setError(null); }}
+              onClick={() => { if (!loading) setJob(null); setMethod(m); setError(null); }}
               className="flex-1 py-2 rounded-md text-sm font-medium transition-all"
               style={{
                 background: method === m ? "var(--accent-purple)" : "transparent",
@@ -213,6 +292,25 @@ export default function ImportPage() {
           </div>
         )}
 
+        {/* Merge toggle */}
+        <label className="flex items-start gap-3 mt-6 cursor-pointer">
+          <input
+            type="checkbox"
+            checked={merge}
+            onChange={e => setMerge(e.target.checked)}
+            className="mt-1"
+            style={{ accentColor: "var(--accent-purple)" }}
+          />
+          <span className="space-y-1">
+            <span className="block text-sm" style={{ color: "var(--text-primary)" }}>
+              Update anime already on my list
+            </span>
+            <span className="block text-xs" style={{ color: "var(--text-muted)" }}>
+              Brings over newer status, progress, dates and scores. Scores you rated on Arcanum&apos;s axes are never overwritten.
+            </span>
+          </span>
+        </label>
+
         <button
           onClick={handleSubmit}
           disabled={!canSubmit || loading}
@@ -222,7 +320,7 @@ export default function ImportPage() {
             color: "var(--text-primary)",
           }}
         >
-          {loading ? "Importing..." : `Import from ${method === "anilist" ? "AniList" : "MAL"}`}
+          {loading ? progressLabel() : `Import from ${method === "anilist" ? "AniList" : "MAL"}`}
         </button>
 
         {/* Error */}
@@ -256,10 +354,17 @@ export default function ImportPage() {
             >
               Import complete.
             </h2>
-            <div className="grid grid-cols-3 gap-4">
+            <div className={`grid ${result.mode === "merge" ? "grid-cols-4" : "grid-cols-3"} gap-4`}>
               {[
                 { label: "Imported", value: result.imported, color: "var(--pill-text)" },
-                { label: "Already in list", value: result.skipped, color: "var(--text-secondary)" },
+                ...(result.mode === "merge"
+                  ? [{ label: "Updated", value: result.updated, color: "var(--pill-text)" }]
+                  : []),
+                {
+                  label: result.mode === "merge" ? "Unchanged" : "Already in list",
+                  value: result.skipped,
+                  color: "var(--text-secondary)",
+                },
                 { label: "Not found", value: result.unmatched_count, color: "var(--text-muted)" },
               ].map(stat => (
                 <div key={stat.label} className="text-center space-y-1">
@@ -272,6 +377,21 @@ export default function ImportPage() {
                 </div>
               ))}
             </div>
+            {result.field_changes && result.updated > 0 && (
+              <div className="flex flex-wrap gap-2">
+                {Object.entries(result.field_changes)
+                  .filter(([, count]) => count > 0)
+                  .map(([field, count]) => (
+                    <span
+                      key={field}
+                      className="text-xs px-2 py-1 rounded"
+                      style={{ background: "var(--bg-secondary)", color: "var(--text-secondary)" }}
+                    >
+                      {FIELD_LABELS[field] ?? field}: {count}
+                    </span>
+                  ))}
+              </div>
+            )}
             {result.unmatched_count > 0 && (
               <div className="space-y-2">
                 <p className="text-xs uppercase tracking-widest" style={{ color: "var(--text-muted)" }}>
@@ -20,6 +20,15 @@ export default function NavBar() {
   }, [pathname]); // Re-check on route change
 
   const handleLogout = () => {
+  // Revoke server-side too — fire and forget, logout must never wait on the network
+  const token = getToken();
+  if (token) {
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+    fetch(`${apiUrl}/auth/logout`, {
+      method: "POST",
+      headers: { Authorization: `Bearer ${token}` },
+    }).catch(() => {});
+  }
   removeToken();
   removeUsername();
   setUsername(null);
@@ -32,7 +32,7 @@ useEffect(() => {
     setLoading(true);
     try {
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
-      const res = await fetch(`${apiUrl}/anime/search?q=${encodeURIComponent(query)}`);
+      const res = await fetch(`${apiUrl}/anime/autocomplete?q=${encodeURIComponent(query)}`);
       if (res.ok) {
         const data = await res.json();
         setResults(data);
@@ -42,7 +42,7 @@ useEffect(() => {
       // Silently fail — search is non-critical
     }
     setLoading(false);
-  }, 300);
+  }, 150); // Autocomplete is served from memory server-side — a short debounce is cheap
 
   return () => clearTimeout(timeout);
 }, [query]);
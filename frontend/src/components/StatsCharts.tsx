@@ -13,6 +13,7 @@ interface Props {
     completed: number;
     watching: number;
     plan_to_watch: number;
+    on_hold: number;
     dropped: number;
     mean_score: number | null;
   };
@@ -37,6 +38,7 @@ export default function StatsCharts({ scoreDistribution, genreBreakdown, stats }
     { label: "Completed", value: stats.completed, color: "#7c3aed" },
     { label: "Watching", value: stats.watching, color: "#0891b2" },
     { label: "Plan to Watch", value: stats.plan_to_watch, color: "#059669" },
+    { label: "On Hold", value: stats.on_hold, color: "#d97706" },
     { label: "Dropped", value: stats.dropped, color: "#dc2626" },
   ].filter(s => s.value > 0);
 